@@ -0,0 +1,65 @@
+"""
+Benchmarks for backend hot paths.
+
+Each module is runnable on its own, e.g.::
+
+    python -m benchmarks.bet_history
+
+Benchmarks run against a throwaway test database created from the
+configured ``DATABASE_URL`` (SQLite or a local Postgres).
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    """Configure Django for a standalone benchmark run"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def bench_database():
+    """Create a disposable test database for the duration of a benchmark"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    if connection.vendor == 'sqlite' and not connection.settings_dict['TEST'].get('NAME'):
+        # A file database lets benchmark threads use their own connections;
+        # shared-cache in-memory SQLite fails with "table is locked" instead of waiting
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'aviator_bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def count_queries(connection):
+    """Count queries executed on ``connection``; yields a one-item list"""
+    counter = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def timed(fn, repeat=5):
+    """Return the best wall time of ``repeat`` calls to ``fn`` in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -0,0 +1,64 @@
+"""
+Compare BetSerializer with the BetHistoryProjection read path.
+
+    python -m benchmarks.bet_history
+"""
+from decimal import Decimal
+
+from benchmarks import bench_database, count_queries, setup_django, timed
+
+ROW_COUNTS = (1000, 10000)
+
+
+def seed(user, rows):
+    """Create ``rows`` bets spread over rounds of 100 bets each"""
+    from games.models import Bet, Round
+
+    Bet.objects.filter(user=user).delete()
+    rounds = Round.objects.bulk_create([
+        Round(server_seed_hash='0' * 64, state='CRASHED', crash_multiplier=Decimal('2.00'))
+        for _ in range(max(1, rows // 100))
+    ])
+    Bet.objects.bulk_create([
+        Bet(
+            user=user,
+            round=rounds[i % len(rounds)],
+            amount_tnd=Decimal('10.00'),
+            cashed_out_multiplier=Decimal('1.50') if i % 2 else None,
+            win_amount_tnd=Decimal('15.00') if i % 2 else None,
+            status='CASHED_OUT' if i % 2 else 'LOST',
+        )
+        for i in range(rows)
+    ], batch_size=1000)
+
+
+def run():
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from games.models import Bet
+    from games.serializers import BetHistoryProjection, BetSerializer
+
+    user = User.objects.create_user(username='bench', email='bench@example.com')
+
+    def serializer_path():
+        queryset = Bet.objects.filter(user=user).select_related('round')
+        return BetSerializer(queryset, many=True).data
+
+    def projection_path():
+        rows = BetHistoryProjection.rows(Bet.objects.filter(user=user).order_by('-placed_at'))
+        return BetHistoryProjection(user).serialize(rows)
+
+    print(f"{'rows':>8} {'path':<12} {'queries':>8} {'best ms':>10}")
+    for rows in ROW_COUNTS:
+        seed(user, rows)
+        for name, fn in (('serializer', serializer_path), ('projection', projection_path)):
+            with count_queries(connection) as queries:
+                fn()
+            best = timed(fn, repeat=3)
+            print(f"{rows:>8} {name:<12} {queries[0]:>8} {best * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    setup_django()
+    with bench_database():
+        run()
@@ -0,0 +1,192 @@
+"""
+End-to-end deposit load test against the NowPayments stand-in.
+
+Serves the backend over HTTP on a throwaway database, points it at a local
+NowPaymentsStandIn, fires concurrent deposit creations and drains the
+webhook inbox in background workers. Reports deposit-create throughput and
+latency, and webhook-to-credit latency (from the stand-in sending the
+'finished' IPN to the DEPOSIT ledger entry being written).
+
+    python -m benchmarks.deposit_load --deposits 200 --concurrency 16 \\
+        --latency 0.05 --error-rate 0.02 --duplicate-rate 0.3
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import requests
+
+from benchmarks import bench_database, setup_django
+from benchmarks.nowpayments_standin import NowPaymentsStandIn, StandInConfig
+
+SECRET = 'deposit_load_secret'
+
+
+def percentiles(samples, points=(50, 90, 95, 99)):
+    if not samples:
+        return {p: None for p in points}
+    ordered = sorted(samples)
+    return {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points}
+
+
+def format_ms(values):
+    return '  '.join(
+        f"p{p}={'-' if v is None else f'{v * 1000:.1f}ms'}" for p, v in values.items()
+    )
+
+
+def serve_backend():
+    """Serve the Django WSGI app on an ephemeral port in a background thread"""
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=True)
+    httpd.set_app(WSGIHandler())
+    threading.Thread(target=httpd.serve_forever, name='backend', daemon=True).start()
+    return httpd, f'http://127.0.0.1:{httpd.server_address[1]}'
+
+
+def drain_forever(stop, workers):
+    from django.db import OperationalError, connection
+    from payments.webhooks import drain_inbox
+
+    def run():
+        try:
+            while not stop.is_set():
+                try:
+                    claimed = drain_inbox(100)
+                except OperationalError:
+                    # SQLite refuses concurrent writers outright; back off and retry
+                    claimed = 0
+                if claimed == 0:
+                    time.sleep(0.01)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, name=f'inbox-{i}', daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run(args):
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+    from django.db.models import Count, Q
+    from games.models import LedgerEntry, UserProfile
+    from payments.models import WebhookInbox
+
+    standin = NowPaymentsStandIn(config=StandInConfig(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        duplicate_rate=args.duplicate_rate, ipn_delay=args.ipn_delay, secret=SECRET, seed=1,
+    )).start()
+    httpd, backend_url = serve_backend()
+
+    settings.NOWPAYMENTS_BASE_URL = standin.base_url
+    settings.NOWPAYMENTS_WEBHOOK_SECRET = SECRET
+    settings.FRONTEND_URL = backend_url
+
+    users = []
+    for i in range(args.users):
+        user = User.objects.create_user(username=f'load{i}', email=f'load{i}@example.com')
+        UserProfile.objects.create(user=user, balance_tnd=Decimal('0.00'))
+        users.append(str(AccessToken.for_user(user)))
+
+    stop = threading.Event()
+    drainers = drain_forever(stop, args.inbox_workers)
+
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    def create(i):
+        started = time.perf_counter()
+        response = session.post(
+            f'{backend_url}/api/deposits/{args.endpoint}/',
+            json={'amount_tnd': '50.00', 'pay_currency': 'btc'},
+            headers={'Authorization': f'Bearer {users[i % len(users)]}'},
+            timeout=30,
+        )
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(create, range(args.deposits)))
+    create_elapsed = time.perf_counter() - started
+
+    created = [elapsed for code, elapsed in results if code == 201]
+    failed = len(results) - len(created)
+
+    # Wait for every created deposit to be credited
+    deadline = time.monotonic() + args.settle_timeout
+    while time.monotonic() < deadline:
+        if LedgerEntry.objects.filter(type='DEPOSIT').count() >= len(created):
+            break
+        time.sleep(0.1)
+
+    stop.set()
+    for thread in drainers:
+        thread.join()
+
+    sent = {
+        invoice_id: sent_at
+        for (invoice_id, payment_status), sent_at in standin.state.ipn_sent.items()
+        if payment_status == 'finished'
+    }
+    credit_latencies = []
+    for meta, timestamp in LedgerEntry.objects.filter(type='DEPOSIT').values_list('meta', 'timestamp'):
+        sent_at = sent.get(str(meta.get('invoice_id')))
+        if sent_at is not None:
+            credit_latencies.append(max(0.0, timestamp.timestamp() - sent_at))
+
+    inbox = WebhookInbox.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(processed_at__isnull=True)),
+    )
+    errors = list(WebhookInbox.objects.exclude(last_error='').values_list('last_error', flat=True).distinct()[:3])
+
+    httpd.shutdown()
+    standin.shutdown()
+
+    print(f"deposits: {len(created)} created, {failed} failed in {create_elapsed:.2f}s "
+          f"({len(created) / create_elapsed:.1f}/s at concurrency {args.concurrency})")
+    print(f"create latency:    {format_ms(percentiles(created))}"
+          + (f"  mean={statistics.mean(created) * 1000:.1f}ms" if created else ''))
+    print(f"webhook->credit:   {format_ms(percentiles(credit_latencies))}  "
+          f"({len(credit_latencies)}/{len(created)} credited)")
+    print(f"ipn deliveries:    {standin.state.ipn_deliveries} sent, {standin.state.ipn_failures} rejected, "
+          f"{inbox['total']} inbox events, {inbox['pending']} unprocessed")
+    if errors:
+        print(f"inbox errors:      {'; '.join(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deposits', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoint', default='create', choices=['create', 'create-async'],
+                        help="Deposit endpoint to load (create-async is served sync here; use an ASGI server to compare)")
+    parser.add_argument('--inbox-workers', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    parser.add_argument('--ipn-delay', type=float, default=0.05)
+    parser.add_argument('--settle-timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    setup_django()
+    with bench_database():
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
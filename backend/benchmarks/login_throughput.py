@@ -0,0 +1,94 @@
+"""
+Login throughput with the production password hasher.
+
+Compares the old synchronous ``authenticate()`` path (one login at a time,
+as on a sync worker) with the async login view at several hashing pool
+sizes, and reports logins per second overall and per pool thread.
+
+    python -m benchmarks.login_throughput --logins 64 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks import bench_database, setup_django
+
+PASSWORD = 'bench-password-123'
+
+
+def sync_baseline(usernames):
+    from django.contrib.auth import authenticate
+
+    started = time.perf_counter()
+    for username in usernames:
+        assert authenticate(username=username, password=PASSWORD) is not None
+    return time.perf_counter() - started
+
+
+async def async_run(usernames, concurrency):
+    from django.test import AsyncRequestFactory
+    from core.views import login
+
+    factory = AsyncRequestFactory()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(username):
+        async with slots:
+            request = factory.post(
+                '/api/auth/login/',
+                json.dumps({'username': username, 'password': PASSWORD}),
+                content_type='application/json'
+            )
+            response = await login(request)
+            assert response.status_code == 200, response.content
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(username) for username in usernames))
+    return time.perf_counter() - started
+
+
+def run(logins, concurrency, pool_sizes):
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.test import override_settings
+    from core import auth
+    from games.models import UserProfile
+
+    encoded = make_password(PASSWORD)
+    users = User.objects.bulk_create([
+        User(username=f'bench{i}', email=f'bench{i}@example.com', password=encoded)
+        for i in range(logins)
+    ])
+    UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+    usernames = [user.username for user in users]
+
+    print(f"{'path':<16} {'threads':>8} {'logins/s':>10} {'per thread':>11}")
+    elapsed = sync_baseline(usernames)
+    print(f"{'sync':<16} {1:>8} {logins / elapsed:>10.1f} {logins / elapsed:>11.1f}")
+
+    for workers in pool_sizes:
+        with override_settings(PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_MAX_PENDING=logins):
+            auth.reset_pool()
+            elapsed = asyncio.run(async_run(usernames, concurrency))
+            auth.reset_pool()
+        rate = logins / elapsed
+        print(f"{'async':<16} {workers:>8} {rate:>10.1f} {rate / workers:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--pool-sizes', type=int, nargs='+',
+                        default=sorted({1, 2, max(1, (os.cpu_count() or 1) // 2), os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    setup_django()
+    with bench_database():
+        run(args.logins, args.concurrency, args.pool_sizes)
+
+
+if __name__ == '__main__':
+    main()
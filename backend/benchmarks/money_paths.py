@@ -0,0 +1,279 @@
+"""
+Query-count and latency suite for the money paths.
+
+Seeds users, a ledger history and rounds of bets at a given volume, then
+measures each path: placing a bet, cashing out, activating a round,
+auto-cashouts, settlement, stats and the ledger listing. The ``flight_*``
+paths measure the round loop's live flight (games/flight.py): a cashout
+claimed from the view, a tick with auto-cashouts, and the bulk settlement
+at the crash; the others are the database paths it falls back to. Every path is
+compared against ``baselines/money_paths.json``:
+
+* query counts must not exceed the baseline (plus ``--query-tolerance``);
+* the best wall time must stay within ``--time-tolerance`` times the
+  baseline, plus ``--time-slack`` milliseconds for timer noise.
+
+Baselines are stored per database vendor and data volume, so SQLite and a
+local Postgres keep their own numbers::
+
+    python -m benchmarks.money_paths
+    python -m benchmarks.money_paths --users 200 --bets-per-round 500 --ledger-depth 2000
+    python -m benchmarks.money_paths --update-baseline
+
+Exits with status 1 when a path regresses. tests/test_query_budgets.py
+checks the query counts of the default volume in the regular test run.
+"""
+import argparse
+import json
+import os
+import sys
+from dataclasses import dataclass
+from decimal import Decimal
+
+from benchmarks import bench_database, count_queries, setup_django, timed
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines', 'money_paths.json')
+
+
+@dataclass(frozen=True)
+class Volume:
+    users: int = 20
+    bets_per_round: int = 50
+    ledger_depth: int = 200
+
+    @property
+    def key(self):
+        return f'users={self.users},bets={self.bets_per_round},ledger={self.ledger_depth}'
+
+
+class MoneyPaths:
+    """Seeded data plus one setup/operation pair per measured path"""
+
+    def __init__(self, volume):
+        self.volume = volume
+
+    def seed(self):
+        from django.contrib.auth.models import User
+        from games.models import LedgerEntry, UserProfile
+        from core.authentication import tokens_for
+
+        self.users = User.objects.bulk_create([
+            User(username=f'bench{i}', email=f'bench{i}@example.com')
+            for i in range(self.volume.users)
+        ])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, balance_tnd=Decimal('1000000.00')) for user in self.users
+        ])
+        self.user = self.users[0]
+        self.token = tokens_for(self.user)['access']
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(user=self.user, type='DEPOSIT', amount_tnd=Decimal('10.00'),
+                        balance_before=Decimal('0.00'), balance_after=Decimal('10.00'))
+            for _ in range(self.volume.ledger_depth)
+        ], batch_size=1000)
+
+    def client(self):
+        from django.test import Client
+
+        return Client(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def new_round(self, state, crash_multiplier=Decimal('2.00'), bet_status=None, auto_cashout=None):
+        """Close open rounds and start one in ``state`` with a bet from every seat"""
+        from django.utils import timezone
+        from games.models import Bet, Round
+        from games.services import RoundsEngine
+
+        Round.objects.filter(state__in=['PRE_ROUND', 'FLYING']).update(state='CRASHED')
+        seed = RoundsEngine.generate_server_seed()
+        round_obj = Round.objects.create(
+            server_seed_hash=RoundsEngine.compute_hash(seed),
+            server_seed_revealed=seed,
+            crash_multiplier=crash_multiplier,
+            state=state,
+            start_time=timezone.now() if state != 'PRE_ROUND' else None,
+        )
+        if bet_status:
+            Bet.objects.bulk_create([
+                Bet(user=self.users[i % len(self.users)], round=round_obj, amount_tnd=Decimal('10.00'),
+                    auto_cashout_multiplier=auto_cashout, status=bet_status)
+                for i in range(self.volume.bets_per_round)
+            ], batch_size=1000)
+        return round_obj
+
+    # Each path returns its operation; setup runs before every repetition
+
+    def place_bet(self):
+        self.new_round('PRE_ROUND', bet_status='PENDING')
+        client = self.client()
+        return lambda: client.post('/api/games/bets/', {'amount_tnd': '10.00'},
+                                   content_type='application/json')
+
+    def cashout(self):
+        from games.models import Bet
+
+        round_obj = self.new_round('FLYING', bet_status='ACTIVE')
+        bet = Bet.objects.filter(round=round_obj, user=self.user).first()
+        client = self.client()
+        return lambda: client.post(f'/api/games/bets/{bet.id}/cashout/', {'current_multiplier': '1.50'},
+                                   content_type='application/json')
+
+    def activate_round(self):
+        from games.models import Round
+        from games.tasks import activate_round_bets
+
+        round_obj = self.new_round('PRE_ROUND', bet_status='PENDING')
+        Round.objects.filter(id=round_obj.id).update(state='FLYING')
+        return lambda: activate_round_bets(round_obj.id)
+
+    def auto_cashouts(self):
+        from games.tasks import process_auto_cashouts
+
+        round_obj = self.new_round('FLYING', bet_status='ACTIVE', auto_cashout=Decimal('1.20'))
+        return lambda: process_auto_cashouts(round_obj.id, Decimal('1.50'))
+
+    def settlement(self):
+        from games.tasks import settle_round_bets
+
+        round_obj = self.new_round('CRASHED', bet_status='ACTIVE')
+        return lambda: settle_round_bets(round_obj.id)
+
+    def _flight(self, auto_cashout=None):
+        from games.flight import Flight
+
+        return Flight.load(self.new_round('FLYING', bet_status='ACTIVE', auto_cashout=auto_cashout))
+
+    def flight_cashout(self):
+        from games.models import Bet
+
+        flight = self._flight()
+        flight.tick(Decimal('1.50'))
+        bet = Bet.objects.filter(round_id=flight.round.id, user=self.user).first()
+        client = self.client()
+        return lambda: client.post(f'/api/games/bets/{bet.id}/cashout/', {'current_multiplier': '1.50'},
+                                   content_type='application/json')
+
+    def flight_tick(self):
+        flight = self._flight(auto_cashout=Decimal('1.20'))
+        return lambda: flight.tick(Decimal('1.50'))
+
+    def flight_settlement(self):
+        from games.models import Round
+
+        flight = self._flight(auto_cashout=Decimal('1.20'))
+        flight.tick(Decimal('1.50'))
+        Round.objects.filter(id=flight.round.id).update(state='CRASHED')
+        return flight.settle
+
+    def stats(self):
+        client = self.client()
+        return lambda: client.get('/api/stats/')
+
+    def ledger(self):
+        client = self.client()
+        return lambda: client.get('/api/games/ledger/')
+
+    PATHS = ('place_bet', 'cashout', 'activate_round', 'auto_cashouts', 'settlement',
+             'flight_cashout', 'flight_tick', 'flight_settlement', 'stats', 'ledger')
+
+
+def measure(volume, repeat=5, paths=MoneyPaths.PATHS):
+    """Seed ``volume`` and return {path: {'queries': n, 'ms': best}}"""
+    from django.core.cache import cache, caches
+    from django.db import connection
+
+    suite = MoneyPaths(volume)
+    suite.seed()
+    results = {}
+    for name in paths:
+        queries = 0
+        best = None
+        for _ in range(repeat):
+            cache.clear()
+            caches['flight'].clear()
+            operation = getattr(suite, name)()
+            with count_queries(connection) as counted:
+                elapsed = timed(operation, repeat=1)
+            queries = max(queries, counted[0])
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {'queries': queries, 'ms': round(best * 1000, 2)}
+    return results
+
+
+def compare(results, baseline, query_tolerance=0, time_tolerance=1.5, time_slack=2.0):
+    """Return (regressions, notes) comparing ``results`` with a baseline entry"""
+    regressions, notes = [], []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            notes.append(f'{name}: no baseline')
+            continue
+        if result['queries'] > expected['queries'] + query_tolerance:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {expected['queries']}")
+        elif result['queries'] < expected['queries']:
+            notes.append(f"{name}: {result['queries']} queries, baseline {expected['queries']}; "
+                         "update the baseline")
+        limit = expected['ms'] * time_tolerance + time_slack
+        if result['ms'] > limit:
+            regressions.append(f"{name}: {result['ms']:.1f} ms, baseline {expected['ms']:.1f} ms "
+                               f"(limit {limit:.1f} ms)")
+    return regressions, notes
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def save_baseline(baselines):
+    os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+    with open(BASELINE_PATH, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=Volume.users)
+    parser.add_argument('--bets-per-round', type=int, default=Volume.bets_per_round)
+    parser.add_argument('--ledger-depth', type=int, default=Volume.ledger_depth)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--query-tolerance', type=int, default=0)
+    parser.add_argument('--time-tolerance', type=float, default=1.5)
+    parser.add_argument('--time-slack', type=float, default=2.0, help="milliseconds")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    setup_django()
+    volume = Volume(args.users, args.bets_per_round, args.ledger_depth)
+    with bench_database() as connection:
+        vendor = connection.vendor
+        results = measure(volume, repeat=args.repeat)
+
+    print(f'{vendor} {volume.key}')
+    print(f"{'path':<16} {'queries':>8} {'best ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<16} {result['queries']:>8} {result['ms']:>10.2f}")
+
+    baselines = load_baseline()
+    if args.update_baseline:
+        baselines.setdefault(vendor, {})[volume.key] = results
+        save_baseline(baselines)
+        print(f'Baseline written to {BASELINE_PATH}')
+        return 0
+
+    baseline = baselines.get(vendor, {}).get(volume.key)
+    if baseline is None:
+        print('No baseline for this vendor and volume; run with --update-baseline')
+        return 0
+    regressions, notes = compare(results, baseline, args.query_tolerance, args.time_tolerance, args.time_slack)
+    for line in notes:
+        print(f'note: {line}')
+    for line in regressions:
+        print(f'REGRESSION: {line}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Local stand-in for the NowPayments API.
+
+Implements the endpoints NowPaymentsClient uses (``/estimate``,
+``/invoice``, ``/invoice/{id}``, ``/currencies``) and delivers signed IPN
+callbacks for every invoice, with configurable latency, error rate and
+duplicate deliveries. Point the backend at it with NOWPAYMENTS_BASE_URL.
+
+    python -m benchmarks.nowpayments_standin --port 8099 --latency 0.05 \\
+        --error-rate 0.02 --duplicate-rate 0.3 --secret dev_secret
+"""
+import argparse
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+# Per-unit rates quoted by /estimate (crypto per 1 USD)
+RATES = {'btc': 0.000016, 'eth': 0.00031, 'usdt': 1.0, 'ltc': 0.012, 'trx': 8.3}
+
+# IPN sequence sent for every invoice: (payment_status, confirmations)
+IPN_SEQUENCE = [('waiting', 0), ('confirming', 1), ('finished', 3)]
+
+
+class StandInConfig:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, duplicate_rate=0.0,
+                 ipn_delay=0.05, secret='', deliver_ipn=True, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.duplicate_rate = duplicate_rate
+        self.ipn_delay = ipn_delay
+        self.secret = secret
+        self.deliver_ipn = deliver_ipn
+        self.random = random.Random(seed)
+
+
+class StandInState:
+    """Invoices issued by the stand-in and IPN delivery timestamps"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(5000000000)
+        self.invoices = {}
+        self.ipn_sent = {}  # (invoice_id, payment_status) -> first delivery time.time()
+        self.ipn_deliveries = 0
+        self.ipn_failures = 0
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = 'NowPaymentsStandIn/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _reply(self, status_code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _simulate(self):
+        """Apply latency and injected failures; returns True if a 5xx was sent"""
+        config = self.config
+        delay = config.latency + config.random.uniform(0, config.jitter)
+        if delay:
+            time.sleep(delay)
+        if config.random.random() < config.error_rate:
+            self._reply(503, {'message': 'Service temporarily unavailable'})
+            return True
+        return False
+
+    def do_GET(self):
+        if self._simulate():
+            return
+        url = urlparse(self.path)
+        path = url.path.rstrip('/')
+        if path.endswith('/currencies'):
+            return self._reply(200, {'currencies': sorted(RATES)})
+        if path.endswith('/estimate'):
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            currency = params.get('currency_to', '').lower()
+            if currency not in RATES:
+                return self._reply(400, {'message': f'Unsupported currency {currency}'})
+            amount = float(params.get('amount', 0))
+            return self._reply(200, {
+                'currency_from': params.get('currency_from', 'usd'),
+                'amount_from': amount,
+                'currency_to': currency,
+                'estimated_amount': round(amount * RATES[currency], 8),
+            })
+        if '/invoice/' in path:
+            invoice_id = path.rsplit('/', 1)[-1]
+            with self.state.lock:
+                invoice = self.state.invoices.get(invoice_id)
+            if invoice is None:
+                return self._reply(404, {'message': 'Invoice not found'})
+            return self._reply(200, invoice)
+        self._reply(404, {'message': 'Not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if self._simulate():
+            return
+        if not urlparse(self.path).path.rstrip('/').endswith('/invoice'):
+            return self._reply(404, {'message': 'Not found'})
+
+        invoice_id = str(next(self.state.ids))
+        currency = body.get('pay_currency', 'btc')
+        invoice = {
+            'id': invoice_id,
+            'invoice_id': invoice_id,
+            'order_id': body.get('order_id'),
+            'price_amount': body.get('price_amount'),
+            'price_currency': body.get('price_currency'),
+            'pay_currency': currency,
+            'pay_address': f'standin_{currency}_{invoice_id}',
+            'invoice_url': f'http://standin/invoice/{invoice_id}',
+            'payment_status': 'waiting',
+            'confirmations': 0,
+            'required_confirmations': 1,
+        }
+        with self.state.lock:
+            self.state.invoices[invoice_id] = invoice
+
+        callback = body.get('ipn_callback_url')
+        if callback and self.config.deliver_ipn:
+            threading.Thread(target=self.server.deliver_ipns, args=(invoice_id, callback), daemon=True).start()
+        self._reply(200, invoice)
+
+
+class NowPaymentsStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), config=None):
+        super().__init__(address, StandInHandler)
+        self.config = config or StandInConfig()
+        self.state = StandInState()
+        self.session = requests.Session()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def sign(self, payload: bytes) -> str:
+        return hmac.new(self.config.secret.encode(), payload, hashlib.sha512).hexdigest()
+
+    def deliver_ipns(self, invoice_id, callback_url):
+        """Walk the invoice through IPN_SEQUENCE, posting each signed status"""
+        for payment_status, confirmations in IPN_SEQUENCE:
+            time.sleep(self.config.ipn_delay)
+            with self.state.lock:
+                invoice = self.state.invoices[invoice_id]
+                invoice.update(payment_status=payment_status, confirmations=confirmations)
+                body = {
+                    'invoice_id': invoice_id,
+                    'order_id': invoice['order_id'],
+                    'payment_status': payment_status,
+                    'confirmations': confirmations,
+                    'pay_currency': invoice['pay_currency'],
+                }
+            deliveries = 2 if self.config.random.random() < self.config.duplicate_rate else 1
+            for _ in range(deliveries):
+                self._post_ipn(invoice_id, payment_status, callback_url, body)
+
+    def _post_ipn(self, invoice_id, payment_status, callback_url, body):
+        payload = json.dumps(body).encode()
+        with self.state.lock:
+            self.state.ipn_sent.setdefault((invoice_id, payment_status), time.time())
+            self.state.ipn_deliveries += 1
+        try:
+            response = self.session.post(
+                callback_url,
+                data=payload,
+                headers={'Content-Type': 'application/json', 'x-nowpayments-sig': self.sign(payload)},
+                timeout=10,
+            )
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        if not ok:
+            with self.state.lock:
+                self.state.ipn_failures += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='nowpayments-standin', daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.0, help="Base response latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra uniform random latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help="Fraction of IPNs delivered twice")
+    parser.add_argument('--ipn-delay', type=float, default=0.5, help="Seconds between IPN status steps")
+    parser.add_argument('--secret', default='', help="IPN signing secret (NOWPAYMENTS_WEBHOOK_SECRET)")
+    args = parser.parse_args()
+
+    server = NowPaymentsStandIn((args.host, args.port), StandInConfig(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        duplicate_rate=args.duplicate_rate, ipn_delay=args.ipn_delay, secret=args.secret,
+    ))
+    print(f"NowPayments stand-in listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Time batch verification of 10k rounds through the API.
+
+    python -m benchmarks.verify_batch --rounds 10000
+"""
+import argparse
+import time
+
+from benchmarks import bench_database, count_queries, setup_django
+
+
+def seed(count):
+    from games.models import Round
+    from games.services import RoundsEngine
+
+    rounds = []
+    for _ in range(count):
+        server_seed = RoundsEngine.generate_server_seed()
+        rounds.append(Round(
+            server_seed_hash=RoundsEngine.compute_hash(server_seed),
+            server_seed_revealed=server_seed,
+            crash_multiplier=RoundsEngine.compute_crash_multiplier(server_seed),
+            state='CRASHED',
+        ))
+    return Round.objects.bulk_create(rounds, batch_size=1000)
+
+
+def run(count):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+
+    rounds = seed(count)
+    client = Client()
+    cache.clear()
+
+    cases = (
+        ('range, cold cache', {'from_round': rounds[0].id, 'to_round': rounds[-1].id}),
+        ('range, warm cache', {'from_round': rounds[0].id, 'to_round': rounds[-1].id}),
+        ('client seeds', {'rounds': [
+            {'server_seed': r.server_seed_revealed, 'server_seed_hash': r.server_seed_hash,
+             'crash_multiplier': str(r.crash_multiplier)}
+            for r in rounds
+        ]}),
+    )
+
+    print(f"{'case':<20} {'rounds':>8} {'valid':>8} {'queries':>8} {'ms':>8}")
+    for name, body in cases:
+        with count_queries(connection) as queries:
+            started = time.perf_counter()
+            response = client.post('/api/games/rounds/verify/', body, content_type='application/json')
+            elapsed = time.perf_counter() - started
+        summary = response.json()['summary']
+        print(f"{name:<20} {summary['total']:>8} {summary['valid']:>8} {queries[0]:>8} {elapsed * 1000:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_django()
+    with bench_database():
+        run(args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Startup profile of the full ASGI entry point against the websocket-only one.
+
+Imports each entry point in a fresh interpreter with ``-X importtime`` and
+reports the median wall time, the number of modules loaded and the
+slowest top-level imports by cumulative time, which is where trimming
+INSTALLED_APPS pays off.
+
+    python -m benchmarks.ws_startup --runs 5 --top 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = (
+    ('full', 'config.settings', 'config.asgi'),
+    ('websocket', 'config.settings_ws', 'config.asgi_ws'),
+)
+HEAVY_MODULES = ('payments', 'requests', 'django.contrib.admin', 'rest_framework.serializers', 'twisted')
+
+PROBE = (
+    "import sys\n"
+    "import {module}\n"
+    "heavy = {heavy!r}\n"
+    "print(len(sys.modules))\n"
+    "print(','.join(m for m in heavy if m in sys.modules))\n"
+)
+
+
+def import_once(settings_module, module):
+    """Return (wall seconds, module count, heavy modules loaded, importtime lines)"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module, PYTHONWARNINGS='ignore')
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    elapsed = time.perf_counter() - start
+    count, heavy = result.stdout.splitlines()[-2:]
+    return elapsed, int(count), heavy, result.stderr.splitlines()
+
+
+def top_level_imports(lines, top):
+    """Slowest imports directly below the entry point, by cumulative microseconds"""
+    rows = []
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line.split(':', 1)[1].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def run(runs, top):
+    for label, settings_module, module in ENTRY_POINTS:
+        samples = [import_once(settings_module, module) for _ in range(runs)]
+        wall = statistics.median(sample[0] for sample in samples)
+        _, count, heavy, lines = samples[-1]
+        print(f"{label} ({module}): {wall * 1000:.0f} ms median process start, {count} modules")
+        print(f"  heavy modules loaded: {heavy or 'none'}")
+        for cumulative, name in top_level_imports(lines, top):
+            print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and websocket-only worker startup")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    run(args.runs, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,17 +9,20 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 
-import core.routing
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+# Set up Django before importing consumers and auth, which load models
+django_asgi_app = get_asgi_application()
+
+import core.routing  # noqa: E402
+from core.ws_auth import JWTAuthMiddlewareStack  # noqa: E402
+
 application = ProtocolTypeRouter({
-  "http": get_asgi_application(),
-  "websocket": AuthMiddlewareStack(
+  "http": django_asgi_app,
+  "websocket": JWTAuthMiddlewareStack(
         URLRouter(
             core.routing.websocket_urlpatterns
         )
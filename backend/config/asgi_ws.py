@@ -0,0 +1,43 @@
+"""
+ASGI entry point for websocket-only workers.
+
+Serves ``ws/rounds/`` with JWT auth and answers HTTP only for the load
+balancer health check, without loading Django's HTTP stack::
+
+    DJANGO_SETTINGS_MODULE=config.settings_ws daphne config.asgi_ws:application
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_ws')
+django.setup(set_prefix=False)
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+import games.routing  # noqa: E402
+from core.ws_auth import JWTAuthMiddlewareStack  # noqa: E402
+
+HEALTH_PATH = '/api/health/'
+
+
+async def health_check(scope, receive, send):
+    """Minimal HTTP app: 200 on the health path, 404 elsewhere"""
+    found = scope['path'] == HEALTH_PATH
+    body = b'{"status":"ok"}' if found else b'{"error":"Not found"}'
+    await send({
+        'type': 'http.response.start',
+        'status': 200 if found else 404,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+application = ProtocolTypeRouter({
+    "http": health_check,
+    "websocket": JWTAuthMiddlewareStack(
+        URLRouter(
+            games.routing.websocket_urlpatterns
+        )
+    ),
+})
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 import environ
 from pathlib import Path
 
@@ -55,6 +56,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',  # First, so it times the whole stack; inert unless METRICS_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -96,12 +98,36 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache
+# Shared by rate caching and leaderboards; point CACHE_URL at a shared backend in production
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+    # Live flight view (games/flight.py): holds cashouts until the crash pays them,
+    # so it must be shared by every process and must never evict keys (Redis maxmemory-policy noeviction)
+    'flight': env.cache('FLIGHT_CACHE_URL', default='locmemcache://flight?max_entries=1000000'),
+}
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 DATABASES = {
     'default': env.db(),
 }
+# Under ASGI each request's sync code runs in a new thread context, so a persistent
+# connection is never reused and idle ones pile up: the web process closes them after
+# each request. Round-loop and websocket workers, whose DB pool threads live as long as
+# the process, keep theirs for DB_WORKER_CONN_MAX_AGE (see core.db.keep_connections_open)
+DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=0)
+DB_WORKER_CONN_MAX_AGE = env.int('DB_WORKER_CONN_MAX_AGE', default=60)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+# Behind a transaction-mode pooler (pgbouncer), named cursors do not survive between transactions
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = env.bool('DB_TRANSACTION_POOLER', default=False)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].setdefault('OPTIONS', {}).setdefault('connect_timeout', env.int('DB_CONNECT_TIMEOUT', default=5))
+
+# Threads (and so connections) for database calls made from async code, see core/db.py
+DB_THREAD_POOL_SIZE = env.int('DB_THREAD_POOL_SIZE', default=10)
 
 
 # Password validation
@@ -122,6 +148,10 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing runs off the event loop in a bounded pool (see core/auth.py)
+PASSWORD_HASH_WORKERS = env.int('PASSWORD_HASH_WORKERS', default=os.cpu_count() or 1)  # Concurrent hashes per process
+PASSWORD_HASH_MAX_PENDING = env.int('PASSWORD_HASH_MAX_PENDING', default=64)  # Queued hashes before logins get a 503
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -149,7 +179,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -164,8 +194,10 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    'UPDATE_LAST_LOGIN': False,  # Would add a write per token; auth is stateless (core/authentication.py)
+    'TOKEN_REFRESH_SERIALIZER': 'core.serializers.RevocationCheckedTokenRefreshSerializer',
 }
+AUTH_REVOCATION_TTL = env.int('AUTH_REVOCATION_TTL', default=30)  # Seconds a process may serve a cached revocation check
 
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=[
@@ -179,3 +211,32 @@ CORS_ALLOW_CREDENTIALS = True
 NOWPAYMENTS_API_KEY = env('NOWPAYMENTS_API_KEY', default='')
 NOWPAYMENTS_WEBHOOK_SECRET = env('NOWPAYMENTS_WEBHOOK_SECRET', default='')
 NOWPAYMENTS_SANDBOX = env('DEBUG', default=True)  # Use sandbox in development
+NOWPAYMENTS_BASE_URL = env('NOWPAYMENTS_BASE_URL', default='')  # Overrides the sandbox/production URL
+NOWPAYMENTS_MAX_CONCURRENCY = env.int('NOWPAYMENTS_MAX_CONCURRENCY', default=20)  # Concurrent async provider calls per process
+NOWPAYMENTS_QUEUE_TIMEOUT = env.float('NOWPAYMENTS_QUEUE_TIMEOUT', default=2.0)  # Seconds to wait for a free provider slot
+
+FRONTEND_URL = env('FRONTEND_URL', default='http://localhost:3000')
+
+# Exchange rates (see payments/rates.py)
+RATES_TTL = env.int('RATES_TTL', default=60)  # seconds before a background refresh
+RATES_STALE_TTL = env.int('RATES_STALE_TTL', default=900)  # seconds a stale rate may still be served
+
+# Leaderboards
+LEADERBOARD_CACHE_TTL = env.int('LEADERBOARD_CACHE_TTL', default=5)  # seconds
+LEADERBOARD_RANK_INTERVAL = env.int('LEADERBOARD_RANK_INTERVAL', default=30)  # seconds between rank refreshes
+LEADERBOARD_DAILY_KEEP_DAYS = env.int('LEADERBOARD_DAILY_KEEP_DAYS', default=7)  # daily periods kept before pruning
+LEADERBOARD_WEEKLY_KEEP_WEEKS = env.int('LEADERBOARD_WEEKLY_KEEP_WEEKS', default=8)  # weekly periods kept before pruning
+
+# Round history and proofs (see games/history.py)
+ROUND_HISTORY_MAX_AGE = env.int('ROUND_HISTORY_MAX_AGE', default=2)  # seconds browsers may reuse the history list
+ROUND_PROOF_CACHE_TTL = env.int('ROUND_PROOF_CACHE_TTL', default=3600)  # seconds a serialized proof stays in the cache
+
+# Game rooms (see games/rooms.py and games/supervisor.py)
+GAME_ROOMS = env.list('GAME_ROOMS', default=['main'])  # Rooms that each run their own round loop
+GAME_LOOP_PROCESSES = env.int('GAME_LOOP_PROCESSES', default=1)  # Processes run_game_loops spreads the rooms over
+ROUND_LOOP_LEASE_TTL = env.int('ROUND_LOOP_LEASE_TTL', default=5)  # Seconds a dead leader holds a room; keep below the pre-round window
+ROUND_LOOP_LEASE_POLL = env.float('ROUND_LOOP_LEASE_POLL', default=1.0)  # Seconds between standby takeover attempts
+
+# Metrics (see core/metrics.py)
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=False)  # Record HTTP metrics and serve /metrics
+METRICS_TOKEN = env('METRICS_TOKEN', default='')  # Bearer token required to scrape /metrics, if set
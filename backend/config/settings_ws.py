@@ -0,0 +1,32 @@
+"""
+Settings for websocket-only workers, served by config.asgi_ws.
+
+These workers only fan rounds out on ``ws/rounds/``, so they load the
+apps RoundsConsumer and JWT websocket auth need and nothing else:
+
+* no admin, sessions, messages or staticfiles, so admin autodiscovery
+  never imports the payments app or ``requests``;
+* no DRF, simplejwt or corsheaders apps and no HTTP middleware. Token
+  checks still use simplejwt's token classes, which need no app entry;
+* no ``channels`` app. Its ready() only imports daphne's twisted server,
+  which daphne has already loaded when it runs this worker and which
+  other ASGI servers do not need.
+
+Everything else, including the database, cache and channel layer, comes
+from config.settings, except that the DB pool threads keep their
+connections for DB_WORKER_CONN_MAX_AGE rather than closing them. Profile startup with ``python -m benchmarks.ws_startup``.
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'core',
+    'games',
+]
+
+MIDDLEWARE = []
+
+ASGI_APPLICATION = 'config.asgi_ws.application'
+
+DATABASES = {**DATABASES, 'default': {**DATABASES['default'], 'CONN_MAX_AGE': DB_WORKER_CONN_MAX_AGE}}  # noqa: F405
@@ -17,9 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.contrib import admin
 from django.urls import path, include
+from core.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('api/', include('core.urls')),
     path('api/games/', include('games.urls')),
     path('api/deposits/', include('payments.urls')),
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Connects the token revocation, connection counting and query metrics signal handlers
+        from . import authentication, db, metrics  # noqa: F401
@@ -0,0 +1,89 @@
+"""
+Password hashing off the event loop.
+
+PBKDF2 at Django's default iteration count costs tens of milliseconds of
+CPU per hash. The async login and register views hand every hash to a
+bounded thread pool (hashlib releases the GIL while hashing, so the pool
+threads use separate cores), and shed load with HasherBusy once
+PASSWORD_HASH_MAX_PENDING hashes are in flight, so a login burst queues
+behind its own pool instead of occupying every request worker.
+
+This relies on the web process running config.asgi under uvicorn workers
+(Procfile, Dockerfile): each worker serves every request on one event
+loop, so an awaited hash frees the worker for other requests. The pool
+is process-wide and bounds hashing CPU either way.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+
+class HasherBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+
+_pool = None
+_pending = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _pending
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pending = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix='password-hash'
+                )
+    return _pool, _pending
+
+
+def reset_pool():
+    """Shut the pool down so the next hash rebuilds it from current settings"""
+    global _pool, _pending
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool = _pending = None
+
+
+async def run_hasher(func, *args):
+    """Run ``func(*args)`` in the hashing pool, or raise HasherBusy if it is full"""
+    pool, pending = _get_pool()
+    if not pending.acquire(blocking=False):
+        raise HasherBusy()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+    finally:
+        pending.release()
+
+
+def _verify(encoded, password):
+    """
+    Return (matches, rehashed). ``rehashed`` is a new encoded password when
+    the stored one uses outdated hasher settings, else None. Never touches
+    the database, so it is safe to run on pool threads.
+    """
+    if encoded is None:
+        # Hash once anyway so unknown usernames take as long as wrong passwords
+        make_password(password)
+        return False, None
+    # check_password calls the setter when the hash needs upgrading
+    outdated = []
+    if not check_password(password, encoded, setter=outdated.append):
+        return False, None
+    return True, make_password(password) if outdated else None
+
+
+async def verify_password(encoded, password):
+    """Check ``password`` against ``encoded`` (None for an unknown user) off the loop"""
+    return await run_hasher(_verify, encoded, password)
+
+
+async def hash_password(password):
+    """Hash ``password`` with the default hasher off the loop"""
+    return await run_hasher(make_password, password)
@@ -0,0 +1,146 @@
+"""
+Stateless JWT authentication.
+
+Tokens issued by ``tokens_for`` carry the user's id, username and email
+as claims, so ClaimsJWTAuthentication builds ``request.user`` from the
+token instead of loading the User row on every request. The result is an
+unsaved-looking ``User`` instance with only those fields set: it works for
+``filter(user=request.user)`` and foreign key assignment, but must never
+be saved, and views that need other fields (names, permissions) should
+load the row themselves. The claims are fixed at login. Tokens issued
+before the claims existed fall back to the usual database lookup.
+
+Revocation is cache-based: ``revoke_user`` and ``revoke_token`` write
+markers to the shared cache, and each process checks them through a small
+local TTL cache, so a revocation reaches every worker within
+AUTH_REVOCATION_TTL seconds without a database query per request.
+A user revocation rejects tokens issued strictly before it. simplejwt's
+``iat`` has whole-second resolution, so ``tokens_for`` also stamps an
+``issued_at`` claim with sub-second precision (copied into the access
+tokens minted from the refresh token): a token issued later in the same
+second as a revocation, e.g. on password change, stays valid.
+"""
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+USER_REVOKED_KEY = 'auth:revoked-user:{user_id}'
+TOKEN_REVOKED_KEY = 'auth:revoked-token:{jti}'
+
+
+CLAIMS = ('username', 'email')
+
+ISSUED_AT_CLAIM = 'issued_at'
+
+
+def tokens_for(user):
+    """Issue a refresh/access pair carrying the claims ClaimsJWTAuthentication needs"""
+    refresh = RefreshToken.for_user(user)
+    refresh[ISSUED_AT_CLAIM] = time.time()
+    refresh['username'] = user.username
+    refresh['email'] = user.email
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+
+def _revocation_timeout():
+    # Markers only need to outlive every token issued before them
+    return int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+
+def revoke_user(user_id):
+    """Revoke every token issued to ``user_id`` up to now"""
+    cache.set(USER_REVOKED_KEY.format(user_id=user_id), time.time(), _revocation_timeout())
+
+
+def revoke_token(token):
+    """Revoke a single validated token by its jti"""
+    cache.set(TOKEN_REVOKED_KEY.format(jti=token[api_settings.JTI_CLAIM]), True, _revocation_timeout())
+
+
+class RevocationCache:
+    """Process-local TTL cache in front of the shared revocation markers"""
+
+    def __init__(self, ttl=None, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def is_revoked(self, token):
+        user_id = token[api_settings.USER_ID_CLAIM]
+        jti = token.get(api_settings.JTI_CLAIM)
+        key = (user_id, jti)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        user_key = USER_REVOKED_KEY.format(user_id=user_id)
+        token_key = TOKEN_REVOKED_KEY.format(jti=jti)
+        markers = cache.get_many([user_key, token_key])
+        revoked_at = markers.get(user_key)
+        issued_at = token.get(ISSUED_AT_CLAIM, token.get('iat', 0))
+        revoked = token_key in markers or (revoked_at is not None and issued_at < revoked_at)
+
+        ttl = self.ttl if self.ttl is not None else settings.AUTH_REVOCATION_TTL
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                self._entries.clear()
+            self._entries[key] = (now + ttl, revoked)
+        return revoked
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+revocations = RevocationCache()
+
+
+def claims_user(token):
+    """Build a lightweight User from token claims, without a query"""
+    user = User(
+        id=token[api_settings.USER_ID_CLAIM],
+        username=token['username'],
+        email=token['email'],
+        is_active=True,
+    )
+    user._state.adding = False
+    user.from_claims = True
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that trusts token claims instead of loading the user"""
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        if revocations.is_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+
+        if any(claim not in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)
+        return claims_user(validated_token)
+
+
+@receiver(post_save, sender=User)
+def revoke_on_credential_change(sender, instance, created, **kwargs):
+    """Deactivation and password changes revoke outstanding tokens"""
+    if created:
+        return
+    if not instance.is_active or getattr(instance, '_password', None) is not None:
+        revoke_user(instance.pk)
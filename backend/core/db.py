@@ -0,0 +1,109 @@
+"""
+Database access from async code.
+
+Channels' ``database_sync_to_async`` is thread-sensitive: outside an HTTP
+request every call in the process queues on asgiref's single sync thread.
+``db_sync_to_async`` runs calls on a dedicated pool of DB_THREAD_POOL_SIZE
+threads instead. Each thread keeps its own health-checked connection,
+so the pool size also caps the connections this process opens for async
+callers. The connections are persistent only in processes that call
+``keep_connections_open`` (round loops, websocket workers): the web
+process runs with CONN_MAX_AGE 0, as ASGI requests never reuse a
+persistent connection.
+
+``pool_stats`` reports per-process counts for the pool: connections open,
+calls active on a pool thread and queued for one, idle connections, and
+connections opened since start, which should stay flat once connections
+are persistent. The counts are kept by PooledDatabaseSyncToAsync itself
+and are only exposed through the token-gated ``/metrics`` endpoint.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from channels.db import DatabaseSyncToAsync
+from django.conf import settings
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_executor = None
+_size = 0
+_calls = 0  # calls submitted and not yet returned
+_active = 0  # calls running on a pool thread
+_open = {}  # pool thread ident -> whether it holds an open connection
+_opened_total = 0
+
+
+def get_executor():
+    global _executor, _size
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _size = settings.DB_THREAD_POOL_SIZE
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DB_THREAD_POOL_SIZE,
+                    thread_name_prefix='db'
+                )
+    return _executor
+
+
+class PooledDatabaseSyncToAsync(DatabaseSyncToAsync):
+    """database_sync_to_async on the shared DB thread pool"""
+
+    def __init__(self, func):
+        super().__init__(func, thread_sensitive=False, executor=get_executor())
+
+    async def __call__(self, *args, **kwargs):
+        global _calls
+        with _lock:
+            _calls += 1
+        try:
+            return await super().__call__(*args, **kwargs)
+        finally:
+            with _lock:
+                _calls -= 1
+
+    def thread_handler(self, loop, *args, **kwargs):
+        global _active
+        with _lock:
+            _active += 1
+        try:
+            return super().thread_handler(loop, *args, **kwargs)
+        finally:
+            with _lock:
+                _active -= 1
+                _open[threading.get_ident()] = connection.connection is not None
+
+
+db_sync_to_async = PooledDatabaseSyncToAsync
+
+
+def keep_connections_open():
+    """
+    Keep this process's connections open for DB_WORKER_CONN_MAX_AGE seconds.
+    Call it once at startup, before any query, in long-running processes.
+    """
+    for alias in connections:
+        connections[alias].settings_dict['CONN_MAX_AGE'] = settings.DB_WORKER_CONN_MAX_AGE
+
+
+@receiver(connection_created)
+def _count_connection(sender, connection, **kwargs):
+    global _opened_total
+    with _lock:
+        _opened_total += 1
+
+
+def pool_stats():
+    """Per-process connection counts for the DB thread pool"""
+    get_executor()
+    with _lock:
+        open_count = sum(_open.values())
+        return {
+            'size': _size,
+            'open': open_count,
+            'active': _active,
+            'queued': max(0, _calls - _active),
+            'idle': max(0, open_count - _active),
+            'opened_total': _opened_total,
+        }
@@ -0,0 +1,278 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+A deliberately small registry (counters, gauges, fixed-bucket histograms)
+so instrumenting a hot path costs a lock and a bisect, with no extra
+dependency. Values are per process: Prometheus scrapes every web worker
+and the round loop (``run_round_loop --metrics-port``) separately.
+
+HTTP latency and query counts are recorded by MetricsMiddleware, which is
+only installed when METRICS_ENABLED is set; the same setting exposes
+``/metrics``. Queries are counted through a wrapper added to every new
+database connection, keyed by a context variable, so queries run in
+``sync_to_async`` threads are attributed to their request.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 377, 610, 1000)
+PHASE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in zip(names, values)
+    )
+    return '{%s}' % pairs
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels, value):
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}']
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _samples(self, labels, state):
+        counts, total = state
+        names = self.labelnames + ('le',)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_format_labels(names, labels + (_format_value(float(bound)),))} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}')
+        lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """``collector()`` returns metrics built at scrape time"""
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            for metric in collector():
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by view', ('view', 'method', 'status')
+))
+HTTP_QUERIES = REGISTRY.register(Histogram(
+    'http_request_queries', 'Database queries per HTTP request by view', ('view', 'method'), COUNT_BUCKETS
+))
+ROUND_PHASE = REGISTRY.register(Histogram(
+    'round_phase_duration_seconds', 'Time spent in each round phase', ('room', 'phase'), PHASE_BUCKETS
+))
+TICK_LAG = REGISTRY.register(Histogram(
+    'round_tick_lag_seconds', 'Delay of each tick broadcast past its schedule', ('room',)
+))
+CHANNEL_SEND = REGISTRY.register(Histogram(
+    'channel_layer_send_seconds', 'Channel layer group_send latency by event', ('room', 'event')
+))
+SETTLEMENT_BETS = REGISTRY.register(Histogram(
+    'round_settlement_bets', 'Bets settled per crashed round', ('room',), COUNT_BUCKETS
+))
+SETTLEMENT_SECONDS = REGISTRY.register(Histogram(
+    'round_settlement_seconds', 'Time to settle a crashed round', ('room',)
+))
+AUTO_CASHOUT_BETS = REGISTRY.register(Histogram(
+    'auto_cashout_batch_bets', 'Bets auto-cashed out per tick', ('room',), COUNT_BUCKETS
+))
+AUTO_CASHOUT_SECONDS = REGISTRY.register(Histogram(
+    'auto_cashout_batch_seconds', 'Time to process auto-cashouts per tick', ('room',)
+))
+WEBSOCKET_CONNECTIONS = REGISTRY.register(Gauge(
+    'websocket_connections', 'Open WebSocket connections in this process', ('room',)
+))
+
+
+def _db_pool_metrics():
+    from .db import pool_stats
+
+    gauge = Gauge('db_pool_connections', 'Async DB thread pool connections by state', ('state',))
+    stats = pool_stats()
+    for state in ('open', 'active', 'idle', 'queued'):
+        gauge.set(stats[state], state)
+    opened = Counter('db_connections_opened_total', 'Database connections opened by this process')
+    opened.inc(amount=stats['opened_total'])
+    return [gauge, opened]
+
+
+REGISTRY.add_collector(_db_pool_metrics)
+
+
+_request_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_query_counter(sender, connection, **kwargs):
+    if settings.METRICS_ENABLED and _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class MetricsMiddleware:
+    """Records latency and query count per view; works for sync and async stacks"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark this instance as a coroutine function, as Django's MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        counter = [0]
+        token = _request_queries.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._observe(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    async def __acall__(self, request):
+        counter = [0]
+        token = _request_queries.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._observe(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    @staticmethod
+    def _observe(request, response, elapsed, queries):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        HTTP_LATENCY.observe(elapsed, view, request.method, f'{response.status_code // 100}xx')
+        HTTP_QUERIES.observe(queries, view, request.method)
+
+
+def serve_metrics(port, address=''):
+    """Expose the registry on ``port`` from a background thread, for non-web processes"""
+    # Imported here so web and websocket workers do not pay for http.server at startup
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -1,7 +1,15 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
-from games.models import UserProfile
+from django.db import transaction
+from decimal import Decimal
+from games.models import LedgerEntry, UserProfile
+from .authentication import revocations
+
+SIGNUP_GRANT = Decimal('5000.00')  # Demo balance every new account starts with
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -27,21 +35,36 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        validated_data.pop('password2')
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            first_name=validated_data.get('first_name', ''),
-            last_name=validated_data.get('last_name', '')
-        )
-        user.set_password(validated_data['password'])
-        user.save()
-        
-        # Create user profile with initial demo balance
-        UserProfile.objects.create(
-            user=user,
-            balance_tnd=5000.00  # Initial demo balance
-        )
+        return self.create_with_password_hash(validated_data, make_password(validated_data['password']))
+
+    def create_with_password_hash(self, validated_data, encoded_password):
+        """
+        Insert the user with an already hashed password, its profile and
+        the SIGNUP_GRANT ledger entry that opens its balance chain in one
+        transaction; ``user.profile`` is populated without a query
+        """
+        with transaction.atomic():
+            user = User.objects.create(
+                username=User.normalize_username(validated_data['username']),
+                email=User.objects.normalize_email(validated_data['email']),
+                first_name=validated_data.get('first_name', ''),
+                last_name=validated_data.get('last_name', ''),
+                password=encoded_password
+            )
+            
+            # Create user profile with initial demo balance
+            opening = UserProfile._meta.get_field('balance_tnd').default
+            UserProfile.objects.create(
+                user=user,
+                balance_tnd=opening + SIGNUP_GRANT
+            )
+            LedgerEntry.objects.create(
+                user=user,
+                type='SIGNUP_GRANT',
+                amount_tnd=SIGNUP_GRANT,
+                balance_before=opening,
+                balance_after=opening + SIGNUP_GRANT,
+            )
         
         return user
 
@@ -69,3 +92,13 @@ class UserStatsSerializer(serializers.Serializer):
     average_bet = serializers.DecimalField(max_digits=10, decimal_places=2)
     current_streak = serializers.IntegerField()
     best_streak = serializers.IntegerField()
+
+
+class RevocationCheckedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuse to mint new access tokens from a revoked refresh token"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revocations.is_revoked(refresh):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return super().validate(attrs)
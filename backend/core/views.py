@@ -3,92 +3,177 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
-from django.db.models import Sum, Count, Avg, Max, Q
-from decimal import Decimal
-from games.models import Bet, UserProfile
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from asgiref.sync import sync_to_async
+import json
+from games.models import UserProfile, UserStats
 from .serializers import UserRegistrationSerializer, UserProfileSerializer, UserStatsSerializer
+from .auth import HasherBusy, hash_password, verify_password
+from .authentication import tokens_for
+from .metrics import CONTENT_TYPE, REGISTRY
 
 
 class HealthCheckView(APIView):
+    # Probed by load balancers without credentials
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    
     def get(self, request, *args, **kwargs):
         return Response({"status": "ok"}, status=status.HTTP_200_OK)
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def register(request):
+def metrics(request):
+    """
+    Prometheus exposition of this process's metrics; 404 unless METRICS_ENABLED
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    
+    if settings.METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        if not constant_time_compare(header, f'Bearer {settings.METRICS_TOKEN}'):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+def _json_body(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+
+
+def _hasher_busy():
+    response = JsonResponse(
+        {'error': 'Too many sign-in attempts in progress, please retry shortly'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = '1'
+    return response
+
+
+
+async def register(request):
     """
     Register a new user
+    
+    Async so the password hash runs in the hashing pool (core/auth.py)
+    rather than on a request worker; the user and profile are then
+    inserted in one transaction with the finished hash.
     """
-    serializer = UserRegistrationSerializer(data=request.data)
-    if serializer.is_valid():
-        user = serializer.save()
-        
-        # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
-        
-        return Response({
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-            },
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            },
-            'message': 'Registration successful'
-        }, status=status.HTTP_201_CREATED)
-    
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def login(request):
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = UserRegistrationSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        encoded_password = await hash_password(serializer.validated_data['password'])
+    except HasherBusy:
+        return _hasher_busy()
+    
+    user = await sync_to_async(serializer.create_with_password_hash)(
+        serializer.validated_data, encoded_password
+    )
+    
+    return JsonResponse({
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+        },
+        'tokens': tokens_for(user),
+        'message': 'Registration successful'
+    }, status=status.HTTP_201_CREATED)
+
+
+def _load_login_user(username):
+    """Fetch an active user and their profile in one query, or None"""
+    return User.objects.select_related('profile').filter(
+        username=username, is_active=True
+    ).first()
+
+
+def _finish_login(user, rehashed):
+    """Store an upgraded password hash and create a missing profile"""
+    if rehashed:
+        User.objects.filter(pk=user.pk).update(password=rehashed)
+    try:
+        return user.profile
+    except UserProfile.DoesNotExist:
+        profile, _ = UserProfile.objects.get_or_create(user=user)
+        return profile
+
+
+async def login(request):
     """
     Login user
+    
+    One query loads the user with their profile; the password check runs
+    in the hashing pool (core/auth.py), so logins never block the loop.
     """
-    username = request.data.get('username')
-    password = request.data.get('password')
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    username = data.get('username')
+    password = data.get('password')
     
     if not username or not password:
-        return Response(
+        return JsonResponse(
             {'error': 'Please provide both username and password'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    user = authenticate(username=username, password=password)
+    user = await sync_to_async(_load_login_user)(username)
     
-    if user is None:
-        return Response(
+    try:
+        matches, rehashed = await verify_password(user.password if user else None, password)
+    except HasherBusy:
+        return _hasher_busy()
+    
+    if not matches:
+        return JsonResponse(
             {'error': 'Invalid credentials'},
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    # Generate JWT tokens
-    refresh = RefreshToken.for_user(user)
-    
-    # Get user profile
-    profile, _ = UserProfile.objects.get_or_create(user=user)
+    try:
+        profile = user.profile
+    except UserProfile.DoesNotExist:
+        profile = None
+    if profile is None or rehashed:
+        profile = await sync_to_async(_finish_login)(user, rehashed)
     
-    return Response({
+    return JsonResponse({
         'user': {
             'id': user.id,
             'username': user.username,
             'email': user.email,
             'balance_tnd': float(profile.balance_tnd),
         },
-        'tokens': {
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
-        },
+        'tokens': tokens_for(user),
         'message': f'Welcome back, {user.username}!'
     }, status=status.HTTP_200_OK)
 
 
+# Plain async views: mark CSRF-exempt directly, csrf_exempt() would wrap them in a sync function
+register.csrf_exempt = True
+login.csrf_exempt = True
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_profile(request):
@@ -96,7 +181,7 @@ def get_profile(request):
     Get user profile
     """
     try:
-        profile = UserProfile.objects.get(user=request.user)
+        profile = UserProfile.objects.select_related('user').get(user_id=request.user.id)
         serializer = UserProfileSerializer(profile)
         return Response(serializer.data)
     except UserProfile.DoesNotExist:
@@ -112,81 +197,11 @@ def get_stats(request):
     """
     Get user statistics
     """
-    user = request.user
-    
-    # Get all bets
-    all_bets = Bet.objects.filter(user=user)
-    
-    # Calculate statistics
-    total_bets = all_bets.count()
-    
-    if total_bets == 0:
-        # Return empty stats for new users
-        stats = {
-            'total_bets': 0,
-            'total_wagered': Decimal('0.00'),
-            'total_won': Decimal('0.00'),
-            'total_profit': Decimal('0.00'),
-            'win_rate': 0.0,
-            'biggest_win': Decimal('0.00'),
-            'biggest_multiplier': Decimal('0.00'),
-            'average_bet': Decimal('0.00'),
-            'current_streak': 0,
-            'best_streak': 0,
-        }
-    else:
-        # Total wagered
-        total_wagered = all_bets.aggregate(Sum('amount_tnd'))['amount_tnd__sum'] or Decimal('0.00')
-        
-        # Total won (only cashed out bets)
-        won_bets = all_bets.filter(status='CASHED_OUT')
-        total_won = won_bets.aggregate(Sum('win_amount_tnd'))['win_amount_tnd__sum'] or Decimal('0.00')
-        
-        # Profit/Loss
-        total_profit = total_won - total_wagered
-        
-        # Win rate
-        wins = won_bets.count()
-        win_rate = (wins / total_bets * 100) if total_bets > 0 else 0.0
-        
-        # Biggest win
-        biggest_win = won_bets.aggregate(Max('win_amount_tnd'))['win_amount_tnd__max'] or Decimal('0.00')
-        
-        # Biggest multiplier
-        biggest_multiplier = won_bets.aggregate(Max('cashed_out_multiplier'))['cashed_out_multiplier__max'] or Decimal('0.00')
-        
-        # Average bet
-        average_bet = all_bets.aggregate(Avg('amount_tnd'))['amount_tnd__avg'] or Decimal('0.00')
-        
-        # Calculate streaks
-        recent_bets = all_bets.order_by('-placed_at')[:50]
-        current_streak = 0
-        best_streak = 0
-        temp_streak = 0
-        
-        for bet in recent_bets:
-            if bet.status == 'CASHED_OUT':
-                temp_streak += 1
-                best_streak = max(best_streak, temp_streak)
-                if current_streak == 0:  # First streak we encounter is current
-                    current_streak = temp_streak
-            else:
-                if current_streak == 0:  # Still looking for current streak
-                    current_streak = temp_streak
-                temp_streak = 0
-        
-        stats = {
-            'total_bets': total_bets,
-            'total_wagered': total_wagered,
-            'total_won': total_won,
-            'total_profit': total_profit,
-            'win_rate': round(win_rate, 2),
-            'biggest_win': biggest_win,
-            'biggest_multiplier': biggest_multiplier,
-            'average_bet': average_bet,
-            'current_streak': current_streak,
-            'best_streak': best_streak,
-        }
+    stats = UserStats.objects.filter(pk=request.user.id).first()
+    
+    if stats is None:
+        # New users have no rollup row yet
+        stats = UserStats(user_id=request.user.id)
     
     serializer = UserStatsSerializer(stats)
     return Response(serializer.data)
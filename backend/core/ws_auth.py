@@ -0,0 +1,79 @@
+"""
+JWT authentication for WebSocket connections.
+
+Browsers cannot set an Authorization header on a WebSocket handshake, so
+the access token is taken from the ``bearer`` subprotocol
+(``new WebSocket(url, ['bearer', token])``) or a ``token`` query
+parameter. The signature and expiry are checked locally and the user is
+built from the token claims (core/authentication.py), so connect storms
+never reach the database. Missing or invalid tokens leave an
+AnonymousUser in the scope; public feeds still work, per-user features
+should check ``scope['user'].is_authenticated``.
+
+When the token came as a subprotocol the client requires the server to
+select one, so consumers should accept with
+``subprotocol=self.scope.get('auth_subprotocol')``.
+"""
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from .authentication import ClaimsJWTAuthentication, claims_user, revocations
+from .db import db_sync_to_async
+
+SUBPROTOCOL = 'bearer'
+QUERY_PARAM = 'token'
+
+_fallback_authentication = ClaimsJWTAuthentication()
+
+
+def get_raw_token(scope):
+    """Return the raw JWT from the subprotocols or query string, and the subprotocol to accept"""
+    subprotocols = list(scope.get('subprotocols') or [])
+    if SUBPROTOCOL in subprotocols:
+        index = subprotocols.index(SUBPROTOCOL)
+        if index + 1 < len(subprotocols):
+            return subprotocols[index + 1], SUBPROTOCOL
+
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    values = query.get(QUERY_PARAM)
+    if values:
+        return values[0], None
+    return None, None
+
+
+async def get_user(raw_token):
+    """Resolve a raw access token to a user, or AnonymousUser"""
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return AnonymousUser()
+
+    if await sync_to_async(revocations.is_revoked, thread_sensitive=False)(token):
+        return AnonymousUser()
+
+    if 'username' in token:
+        return claims_user(token)
+
+    # Tokens issued before the claims existed
+    try:
+        return await db_sync_to_async(_fallback_authentication.get_user)(token)
+    except (InvalidToken, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Populates ``scope['user']`` from a JWT on the handshake"""
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        raw_token, subprotocol = get_raw_token(scope)
+        scope['user'] = await get_user(raw_token) if raw_token else AnonymousUser()
+        scope['auth_subprotocol'] = subprotocol
+        return await self.inner(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    return JWTAuthMiddleware(inner)
@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.utils.html import format_html, format_html_join
+from core.changelists import LargeTableAdminMixin, RecentDateFieldListFilter
 from .models import UserProfile, Round, Bet, LedgerEntry
+from .trace import timeline_rows
 
 
 @admin.register(UserProfile)
@@ -13,21 +16,44 @@ class UserProfileAdmin(admin.ModelAdmin):
 class RoundAdmin(admin.ModelAdmin):
     list_display = ['id', 'state', 'crash_multiplier', 'start_time', 'created_at']
     list_filter = ['state', 'created_at']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'timeline_table']
+    exclude = ['timeline']
     search_fields = ['id', 'server_seed_hash']
 
+    @admin.display(description='Timeline')
+    def timeline_table(self, obj):
+        rows = timeline_rows(obj.timeline)
+        if not rows:
+            return '-'
+        body = format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>', (
+            (event, f'{offset:.1f}', '' if gap is None else f'+{gap:.1f}', '' if count is None else count)
+            for event, offset, gap, count in rows
+        ))
+        return format_html(
+            '<p>Offsets in ms from {}</p><table><thead><tr><th>Event</th><th>At (ms)</th>'
+            '<th>Gap (ms)</th><th>Count</th></tr></thead><tbody>{}</tbody></table>',
+            obj.timeline.get('origin', ''), body
+        )
+
 
 @admin.register(Bet)
-class BetAdmin(admin.ModelAdmin):
+class BetAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'user', 'round', 'amount_tnd', 'status', 'cashed_out_multiplier', 'win_amount_tnd', 'placed_at']
-    list_filter = ['status', 'placed_at']
-    search_fields = ['user__username', 'round__id']
+    list_filter = ['status', ('placed_at', RecentDateFieldListFilter)]
+    list_select_related = ['user', 'round']
+    search_fields = ['user__username', 'id', 'round_id']
+    search_id_fields = ['id', 'round_id']
+    search_help_text = 'Exact username, bet id or round id'
+    raw_id_fields = ['user', 'round']
     readonly_fields = ['placed_at', 'cashed_out_at']
 
 
 @admin.register(LedgerEntry)
-class LedgerEntryAdmin(admin.ModelAdmin):
+class LedgerEntryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'user', 'type', 'amount_tnd', 'balance_before', 'balance_after', 'timestamp']
-    list_filter = ['type', 'timestamp']
-    search_fields = ['user__username']
+    list_filter = ['type', ('timestamp', RecentDateFieldListFilter)]
+    list_select_related = ['user']
+    search_fields = ['user__username', 'id']
+    search_help_text = 'Exact username or entry id'
+    raw_id_fields = ['user']
     readonly_fields = ['timestamp']
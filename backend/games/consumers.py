@@ -1,10 +1,13 @@
 import json
 import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
+from core import metrics
+from core.db import db_sync_to_async
 from django.utils import timezone
 from decimal import Decimal
 from .models import Round
+from . import flight
+from .rooms import DEFAULT_ROOM, group_name, is_room
 from .services import RoundsEngine, RoundSimulator
 
 
@@ -12,9 +15,15 @@ class RoundsConsumer(AsyncWebsocketConsumer):
     """
     WebSocket consumer for broadcasting round events
     """
+    counted = False  # Whether this connection is in the websocket_connections gauge
     
     async def connect(self):
-        self.room_group_name = 'rounds'
+        self.room = self.scope['url_route']['kwargs'].get('room', DEFAULT_ROOM)
+        if not is_room(self.room):
+            # Rejects the handshake
+            await self.close()
+            return
+        self.room_group_name = group_name(self.room)
         
         # Join room group
         await self.channel_layer.group_add(
@@ -22,12 +31,22 @@ class RoundsConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        await self.accept()
+        # Echo the auth subprotocol if the client sent its JWT that way
+        await self.accept(subprotocol=self.scope.get('auth_subprotocol'))
+        metrics.WEBSOCKET_CONNECTIONS.inc(self.room)
+        self.counted = True
         
         # Send current round state to newly connected client
         await self.send_current_round_state()
     
     async def disconnect(self, close_code):
+        if self.counted:
+            metrics.WEBSOCKET_CONNECTIONS.dec(self.room)
+            self.counted = False
+        
+        if not hasattr(self, 'room_group_name'):
+            return
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -47,6 +66,19 @@ class RoundsConsumer(AsyncWebsocketConsumer):
     
     async def send_current_round_state(self):
         """Send current round state to client"""
+        view = await db_sync_to_async(flight.current)(self.room)
+        if view is not None:
+            # Live flight: answer from the loop's published view, not the database
+            await self.send(text_data=json.dumps({
+                'type': 'round:tick',
+                'data': {
+                    'round_id': view['round_id'],
+                    'multiplier': float(view['multiplier']),
+                    'timestamp': timezone.now().isoformat()
+                }
+            }))
+            return
+        
         round_obj = await self.get_current_round()
         
         if round_obj.state == 'PRE_ROUND':
@@ -102,12 +134,12 @@ class RoundsConsumer(AsyncWebsocketConsumer):
             'data': event['data']
         }))
     
-    @database_sync_to_async
+    @db_sync_to_async
     def get_current_round(self):
         """Get current round from database"""
-        return RoundsEngine.get_current_round()
+        return RoundsEngine.get_current_round(self.room)
     
-    @database_sync_to_async
+    @db_sync_to_async
     def calculate_multiplier(self, round_obj):
         """Calculate current multiplier"""
         if round_obj.start_time:
@@ -0,0 +1,260 @@
+"""
+Live flight state.
+
+While a round is FLYING its state lives in the round loop's memory, with
+the shared cache (Redis in production) as the view the web and websocket
+processes read, so a flight does not touch the primary database:
+
+* ``flight:room:<room>``: ``{round_id, multiplier}``, the last multiplier
+  the loop reached, published before every tick is broadcast. New
+  websocket connections are sent this view.
+* ``flight:bet:<bet_id>``: the bet's round, room, owner, amount and
+  auto-cashout target, written for every active bet at take-off.
+* ``flight:claim:<bet_id>``: how the bet ended, written once with
+  ``cache.add`` (SET NX in Redis): a cashout by the player or by the
+  loop's auto-cashout, or LOST, which the loop writes for every undecided
+  bet at the crash. The first writer wins, so a cashout racing the crash
+  is either honoured or refused, never both.
+
+The view lives in the ``flight`` cache, which must not evict keys: a
+lost claim is a cashout the crash does not pay. The crash multiplier
+never leaves the loop. A player's cashout is capped
+at the published multiplier instead, which is always below the crash
+point, so every claim the cache accepts is a valid one.
+
+At the crash the loop reads every claim in one ``get_many`` and writes
+bets, balances, ledger rows and stats in bulk inside the crash
+transaction: balances are credited at the crash, not at the cashout. A
+bet that is not in the view (cache miss, bet of another round) falls back
+to the database cashout in BetViewSet, and settlement only touches bets
+that are still ACTIVE, so the two paths cannot both pay a bet. A leader
+that resumes a FLYING round reloads the active bets; claims already in
+the cache are kept.
+"""
+from decimal import Decimal
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.connection import ConnectionProxy
+from .models import Bet, LedgerEntry, UserProfile
+from .stats import record_bets_won, record_round_streaks
+from . import leaderboards
+
+ROOM_KEY = 'flight:room:{room}'
+BET_KEY = 'flight:bet:{bet_id}'
+CLAIM_KEY = 'flight:claim:{bet_id}'
+FLIGHT_TTL = 3600  # seconds; claims must outlive any flight and its settlement
+
+CENTS = Decimal('0.01')
+
+cache = ConnectionProxy(caches, 'flight')
+
+
+def current(room):
+    """The published view of ``room``'s flight, or None when it is not FLYING"""
+    return cache.get(ROOM_KEY.format(room=room))
+
+
+def claim_cashout(bet_id, user_id, multiplier, now=None):
+    """
+    Cash out a bet of a live flight from the shared view.
+
+    Returns None when the bet is not in the view (the caller falls back to
+    the database), a claim dict on success, or ``{'error': ...}``.
+    """
+    entry = cache.get(BET_KEY.format(bet_id=bet_id))
+    if entry is None or entry['user_id'] != user_id:
+        return None
+
+    view = current(entry['room'])
+    if view is None or view['round_id'] != entry['round_id']:
+        return {'error': 'Round is not in flying state'}
+
+    multiplier = min(multiplier, view['multiplier'])
+    claim = {
+        'bet_id': entry['bet_id'],
+        'round_id': entry['round_id'],
+        'room': entry['room'],
+        'status': 'CASHED_OUT',
+        'amount_tnd': entry['amount_tnd'],
+        'auto_cashout_multiplier': entry['auto_cashout_multiplier'],
+        'multiplier': multiplier,
+        'win_amount_tnd': (entry['amount_tnd'] * multiplier).quantize(CENTS),
+        'at': now or timezone.now(),
+        'auto': False,
+    }
+    key = CLAIM_KEY.format(bet_id=entry['bet_id'])
+    if cache.add(key, claim, FLIGHT_TTL):
+        return claim
+
+    # Already decided: repeat an earlier cashout, refuse after the crash
+    existing = cache.get(key)
+    if existing is not None and existing['status'] == 'CASHED_OUT':
+        return existing
+    return {'error': 'Invalid multiplier (round has crashed)'}
+
+
+def claim_payload(claim):
+    """Response body for a cashout claimed from the view, shaped like BetSerializer's fields"""
+    return {
+        'id': claim['bet_id'],
+        'round_id': claim['round_id'],
+        'room': claim['room'],
+        'amount_tnd': str(claim['amount_tnd']),
+        'auto_cashout_multiplier': (
+            None if claim['auto_cashout_multiplier'] is None else str(claim['auto_cashout_multiplier'])
+        ),
+        'cashed_out_at': claim['at'].isoformat(),
+        'cashed_out_multiplier': str(claim['multiplier']),
+        'win_amount_tnd': str(claim['win_amount_tnd']),
+        'status': claim['status'],
+    }
+
+
+class Flight:
+    """The round loop's state of one FLYING round"""
+
+    def __init__(self, round_obj, bets):
+        self.round = round_obj
+        self.room = round_obj.room
+        self.bets = {bet.id: bet for bet in bets}
+        # Bets still waiting for their auto-cashout target, lowest first
+        self.pending = sorted(
+            (bet for bet in bets if bet.auto_cashout_multiplier is not None),
+            key=lambda bet: bet.auto_cashout_multiplier,
+        )
+
+    @classmethod
+    def load(cls, round_obj):
+        """Read the round's active bets once and publish them to the view"""
+        bets = list(Bet.objects.filter(round_id=round_obj.id, status='ACTIVE').only(
+            'id', 'user_id', 'round_id', 'room', 'amount_tnd', 'auto_cashout_multiplier'
+        ))
+        flight = cls(round_obj, bets)
+        cache.set_many({
+            BET_KEY.format(bet_id=bet.id): {
+                'bet_id': bet.id,
+                'round_id': round_obj.id,
+                'room': flight.room,
+                'user_id': bet.user_id,
+                'amount_tnd': bet.amount_tnd,
+                'auto_cashout_multiplier': bet.auto_cashout_multiplier,
+            }
+            for bet in bets
+        }, FLIGHT_TTL)
+        flight.publish(Decimal('1.00'))
+        return flight
+
+    def publish(self, multiplier):
+        cache.set(ROOM_KEY.format(room=self.room), {
+            'round_id': self.round.id,
+            'multiplier': multiplier,
+        }, FLIGHT_TTL)
+
+    def tick(self, multiplier, now=None):
+        """Publish ``multiplier`` and claim the auto-cashouts it reached; returns how many"""
+        self.publish(multiplier)
+        cashed_out = 0
+        while self.pending and self.pending[0].auto_cashout_multiplier <= multiplier:
+            bet = self.pending.pop(0)
+            target = bet.auto_cashout_multiplier
+            claimed = cache.add(CLAIM_KEY.format(bet_id=bet.id), {
+                'bet_id': bet.id,
+                'round_id': self.round.id,
+                'room': self.room,
+                'status': 'CASHED_OUT',
+                'amount_tnd': bet.amount_tnd,
+                'auto_cashout_multiplier': target,
+                'multiplier': target,
+                'win_amount_tnd': (bet.amount_tnd * target).quantize(CENTS),
+                'at': now or timezone.now(),
+                'auto': True,
+            }, FLIGHT_TTL)
+            cashed_out += int(claimed)
+        return cashed_out
+
+    def _close(self):
+        """Mark every undecided bet LOST and return {bet_id: claim} for all bets"""
+        for bet_id in self.bets:
+            cache.add(CLAIM_KEY.format(bet_id=bet_id), {'bet_id': bet_id, 'status': 'LOST'}, FLIGHT_TTL)
+        claims = cache.get_many([CLAIM_KEY.format(bet_id=bet_id) for bet_id in self.bets])
+        return {claim['bet_id']: claim for claim in claims.values()}
+
+    def settle(self, now=None):
+        """
+        Persist the flight's outcome in bulk. Call inside the crash
+        transaction, after the round has been marked CRASHED.
+        """
+        now = now or timezone.now()
+        claims = self._close()
+        bets = list(Bet.objects.select_for_update().filter(
+            round_id=self.round.id, status='ACTIVE'
+        ).order_by('id'))
+        profiles = {
+            profile.user_id: profile
+            for profile in UserProfile.objects.select_for_update().filter(
+                user_id__in={bet.user_id for bet in bets}
+            )
+        }
+
+        won, lost, entries, credited = [], [], [], {}
+        for bet in bets:
+            profile = profiles[bet.user_id]
+            balance_before = profile.balance_tnd
+            claim = claims.get(bet.id)
+            if claim is not None and claim['status'] == 'CASHED_OUT':
+                bet.status = 'CASHED_OUT'
+                bet.cashed_out_at = claim['at']
+                bet.cashed_out_multiplier = claim['multiplier']
+                bet.win_amount_tnd = claim['win_amount_tnd']
+                profile.balance_tnd += claim['win_amount_tnd']
+                profile.updated_at = now
+                credited[profile.user_id] = profile
+                meta = {
+                    'bet_id': bet.id,
+                    'round_id': self.round.id,
+                    'multiplier': float(claim['multiplier']),
+                }
+                if claim['auto']:
+                    meta['auto_cashout'] = True
+                else:
+                    meta['profit'] = float(claim['win_amount_tnd'] - bet.amount_tnd)
+                entries.append(LedgerEntry(
+                    user_id=bet.user_id, type='BET_WON', amount_tnd=claim['win_amount_tnd'],
+                    balance_before=balance_before, balance_after=profile.balance_tnd, meta=meta,
+                ))
+                won.append(bet)
+            else:
+                bet.status = 'LOST'
+                entries.append(LedgerEntry(
+                    user_id=bet.user_id, type='BET_LOST', amount_tnd=Decimal('0.00'),
+                    balance_before=balance_before, balance_after=balance_before,
+                    meta={
+                        'bet_id': bet.id,
+                        'round_id': self.round.id,
+                        'crash_multiplier': float(self.round.crash_multiplier),
+                    },
+                ))
+                lost.append(bet)
+
+        if won:
+            Bet.objects.bulk_update(won, ['status', 'cashed_out_at', 'cashed_out_multiplier', 'win_amount_tnd'])
+            UserProfile.objects.bulk_update(list(credited.values()), ['balance_tnd', 'updated_at'])
+        if lost:
+            Bet.objects.filter(id__in=[bet.id for bet in lost]).update(status='LOST')
+        LedgerEntry.objects.bulk_create(entries)
+
+        record_bets_won([(bet.user_id, bet.win_amount_tnd, bet.cashed_out_multiplier) for bet in won])
+        record_round_streaks(self.round.id)
+        leaderboards.record_results(
+            [(bet.user_id, bet.amount_tnd, bet.win_amount_tnd, bet.cashed_out_multiplier) for bet in won],
+            [(bet.user_id, bet.amount_tnd) for bet in lost],
+            now,
+        )
+
+        return {'settled_count': len(bets), 'cashed_out_count': len(won)}
+
+    def clear(self):
+        """Drop the view once the crash is committed; claims expire on their own"""
+        cache.delete_many(
+            [ROOM_KEY.format(room=self.room)] + [BET_KEY.format(bet_id=bet_id) for bet_id in self.bets]
+        )
@@ -0,0 +1,106 @@
+"""
+Crashed-round history and proofs.
+
+A round never changes once it has CRASHED, so both views are serialized
+once and served as bytes. The game loop calls ``RoundHistory.record`` at
+every crash: it prepends the round to a rolling buffer of pre-serialized
+JSON fragments and stores the buffer, and the round's proof document, in
+the shared cache. Web processes only join cached fragments; the database
+is read only to rebuild after a cache miss.
+
+Each room has its own history buffer; proofs are keyed by round id only.
+Proofs include the revealed server seed, so they are only ever built for
+CRASHED rounds.
+"""
+import hashlib
+import json
+from collections import deque
+from django.conf import settings
+from django.core.cache import cache
+from .models import Round
+from .rooms import DEFAULT_ROOM
+
+HISTORY_KEY = 'rounds:history:{room}'
+PROOF_KEY = 'rounds:proof:{round_id}'
+HISTORY_SIZE = 100
+CLIENT_SALT = 'default'  # Salt RoundsEngine.compute_crash_multiplier uses for every round
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'), sort_keys=True)
+
+
+def history_fragment(round_obj):
+    """Pre-serialized history entry for one crashed round"""
+    return _dumps({
+        'round_id': round_obj.id,
+        'crash_multiplier': float(round_obj.crash_multiplier),
+        'crashed_at': round_obj.updated_at.isoformat(),
+    })
+
+
+def proof_document(round_obj):
+    """Pre-serialized proof for one crashed round"""
+    return _dumps({
+        'round_id': round_obj.id,
+        'server_seed_hash': round_obj.server_seed_hash,
+        'server_seed': round_obj.server_seed_revealed,
+        'client_salt': CLIENT_SALT,
+        'crash_multiplier': str(round_obj.crash_multiplier),
+        'started_at': round_obj.start_time.isoformat() if round_obj.start_time else None,
+        'crashed_at': round_obj.updated_at.isoformat(),
+    })
+
+
+def etag_for(body):
+    """Strong ETag for a serialized body"""
+    return '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:32]
+
+
+def _cache_proof(round_obj):
+    body = proof_document(round_obj)
+    cache.set(PROOF_KEY.format(round_id=round_obj.id), body, settings.ROUND_PROOF_CACHE_TTL)
+    return body
+
+
+class RoundHistory:
+    """Rolling buffer of the latest crashed rounds, owned by the game loop"""
+
+    def __init__(self, room=DEFAULT_ROOM, size=HISTORY_SIZE):
+        self.room = room
+        self.key = HISTORY_KEY.format(room=room)
+        self.fragments = deque(maxlen=size)
+
+    def load(self):
+        """Seed the buffer from the database, newest first"""
+        rounds = Round.objects.filter(room=self.room, state='CRASHED').order_by('-id')[:self.fragments.maxlen]
+        self.fragments.clear()
+        self.fragments.extend(history_fragment(round_obj) for round_obj in rounds)
+        cache.set(self.key, list(self.fragments), None)
+
+    def record(self, round_obj):
+        """Add a just-crashed round and publish the buffer and its proof"""
+        self.fragments.appendleft(history_fragment(round_obj))
+        cache.set(self.key, list(self.fragments), None)
+        _cache_proof(round_obj)
+
+
+def get_history(limit=HISTORY_SIZE, room=DEFAULT_ROOM):
+    """JSON array of a room's latest ``limit`` crashed rounds, newest first"""
+    fragments = cache.get(HISTORY_KEY.format(room=room))
+    if fragments is None:
+        history = RoundHistory(room)
+        history.load()
+        fragments = history.fragments
+    return '[' + ','.join(list(fragments)[:limit]) + ']'
+
+
+def get_proof(round_id):
+    """Proof JSON for a crashed round, or None if it has not crashed"""
+    body = cache.get(PROOF_KEY.format(round_id=round_id))
+    if body is None:
+        round_obj = Round.objects.filter(id=round_id, state='CRASHED').first()
+        if round_obj is None:
+            return None
+        body = _cache_proof(round_obj)
+    return body
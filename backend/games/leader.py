@@ -0,0 +1,135 @@
+"""
+Leader election for round loops.
+
+Every node may run ``run_game_loops``; for each room only the holder of
+that room's LoopLease drives rounds, the others stand by and poll.
+
+The lease is a row per room, taken over with a conditional UPDATE once it
+has expired, so it works the same on Postgres and SQLite. Each takeover
+increments the row's fencing token. The leader renews the lease every
+third of ROUND_LOOP_LEASE_TTL and stops its loop as soon as a renewal
+fails; standbys retry every ROUND_LOOP_LEASE_POLL seconds. A leader that stalls (GC pause, network partition) and wakes up
+after losing the lease cannot corrupt the new leader's round: the
+take-off and crash writes first check the token inside the same
+transaction (``LeaderLease.ensure``) and raise NotLeader if it changed.
+
+ROUND_LOOP_LEASE_TTL is kept below the pre-round window, so a dead
+leader's room is picked up before players notice a missing round; a
+clean shutdown releases the lease for immediate handover. The new leader
+resumes from the persisted round state (RoundLoop resumes a FLYING round
+from its start time), and the one-open-round-per-room constraint on
+Round keeps a stale process or a bet request from opening a second round.
+Expiry uses each node's clock, so node clocks must agree to well within
+the TTL.
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from core.db import db_sync_to_async
+from .models import LoopLease
+
+
+class NotLeader(Exception):
+    """Raised when a fenced write finds that the lease has moved on"""
+
+
+def default_holder():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    def __init__(self, room, holder=None, ttl=None, now=timezone.now):
+        self.room = room
+        self.holder = holder or default_holder()
+        self.ttl = timedelta(seconds=ttl if ttl is not None else settings.ROUND_LOOP_LEASE_TTL)
+        self.now = now
+        self.token = None
+
+    @property
+    def is_leader(self):
+        return self.token is not None
+
+    def try_acquire(self):
+        """Take the lease if it is free or expired; returns whether we hold it"""
+        if self.is_leader:
+            return self.renew()
+
+        LoopLease.objects.get_or_create(room=self.room)
+        now = self.now()
+        taken = LoopLease.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__lte=now), room=self.room
+        ).update(holder=self.holder, token=F('token') + 1, expires_at=now + self.ttl)
+        if not taken:
+            return False
+
+        self.token = LoopLease.objects.filter(room=self.room, holder=self.holder).values_list(
+            'token', flat=True
+        ).first()
+        return self.is_leader
+
+    def renew(self):
+        """Extend the lease; returns False, and forgets it, if it was lost"""
+        if not self.is_leader:
+            return False
+        renewed = LoopLease.objects.filter(room=self.room, holder=self.holder, token=self.token).update(
+            expires_at=self.now() + self.ttl
+        )
+        if not renewed:
+            self.token = None
+        return bool(renewed)
+
+    def ensure(self):
+        """Fence a write: renew the lease or raise NotLeader. Call inside the write's transaction."""
+        if not self.renew():
+            raise NotLeader(f"Lost round loop leadership for room {self.room}")
+
+    def release(self):
+        """Give the lease up so a standby can take over at once"""
+        if self.is_leader:
+            LoopLease.objects.filter(room=self.room, holder=self.holder, token=self.token).update(
+                expires_at=None
+            )
+            self.token = None
+
+
+async def lead(room, rounds=None, lease=None, poll_interval=None, renew_interval=None, loop_factory=None):
+    """
+    Stand by until elected for ``room``, then run its RoundLoop while the
+    lease holds. Returns after ``rounds`` rounds, or never.
+    """
+    from .loop import RoundLoop
+
+    lease = lease or LeaderLease(room)
+    poll_interval = poll_interval if poll_interval is not None else settings.ROUND_LOOP_LEASE_POLL
+    renew_interval = renew_interval if renew_interval is not None else settings.ROUND_LOOP_LEASE_TTL / 3
+    loop_factory = loop_factory or RoundLoop
+
+    while True:
+        if not await db_sync_to_async(lease.try_acquire)():
+            await asyncio.sleep(poll_interval)
+            continue
+
+        print(f"Room {room}: {lease.holder} is leader (token {lease.token})")
+        task = asyncio.ensure_future(loop_factory(room, lease=lease).run(rounds=rounds))
+        try:
+            while not task.done():
+                await asyncio.wait([task], timeout=renew_interval)
+                if not task.done() and not await db_sync_to_async(lease.renew)():
+                    print(f"Room {room}: lost leadership, stopping the round loop")
+                    task.cancel()
+            await task
+            return
+        except (asyncio.CancelledError, NotLeader):
+            if not task.done():
+                # This coroutine itself was cancelled: stop the loop too
+                task.cancel()
+                raise
+            print(f"Room {room}: standing by")
+        finally:
+            # No-op once the lease is lost; otherwise hands over without waiting for expiry
+            await db_sync_to_async(lease.release)()
@@ -0,0 +1,252 @@
+"""
+Leaderboard rollups.
+
+Settlement feeds LeaderboardStat rows per user and window. A round's
+results are aggregated per user and written with one INSERT of the
+missing rows (ignoring conflicts), one locking read and one upsert of
+the new totals per WRITE_CHUNK users, so the crash transaction's cost
+does not grow by queries per bettor.
+
+``rank`` reads a rank column from the user's row through the unique
+(window, period_start, user) index: O(log n) at any depth. The columns
+are rewritten for the current periods by ``refresh_ranks`` (the
+``refresh_leaderboards`` command, every LEADERBOARD_RANK_INTERVAL
+seconds) with one RANK() window query per window, so a rank lags the
+score by up to that interval. Rows not ranked yet fall back to an
+index-only count of the rows ahead. ``prune`` deletes daily and weekly
+rows past their retention.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from .models import LeaderboardStat
+
+# Board name -> LeaderboardStat column it ranks by
+BOARDS = {
+    'wins': 'total_won',
+    'multiplier': 'best_multiplier',
+    'profit': 'profit',
+}
+
+# Board name -> LeaderboardStat column holding its last refreshed rank
+RANK_COLUMNS = {
+    'wins': 'wins_rank',
+    'multiplier': 'multiplier_rank',
+    'profit': 'profit_rank',
+}
+
+WINDOWS = ('daily', 'weekly', 'all_time')
+
+ALL_TIME_START = date(1970, 1, 1)
+
+MAX_TOP_N = 100
+
+WRITE_CHUNK = 250  # Users per locking read and upsert; keeps the statements' parameters bounded
+
+
+def period_start(window, when=None):
+    """Return the first day of the period containing ``when`` for ``window``"""
+    day = timezone.localdate(when or timezone.now())
+    if window == 'daily':
+        return day
+    if window == 'weekly':
+        return day - timedelta(days=day.weekday())
+    return ALL_TIME_START
+
+
+def _apply(deltas, when):
+    """
+    Add ``{user_id: (won, best_multiplier or None, profit)}`` to the
+    users' rows in every window. Must be called inside the transaction
+    that settles the bets.
+    """
+    periods = [(window, period_start(window, when)) for window in WINDOWS]
+    in_periods = Q()
+    for window, start in periods:
+        in_periods |= Q(window=window, period_start=start)
+
+    user_ids = sorted(deltas)
+    for offset in range(0, len(user_ids), WRITE_CHUNK):
+        chunk = user_ids[offset:offset + WRITE_CHUNK]
+        LeaderboardStat.objects.bulk_create([
+            LeaderboardStat(window=window, period_start=start, user_id=user_id)
+            for user_id in chunk
+            for window, start in periods
+        ], ignore_conflicts=True)
+
+        # The rows are locked before they are read, so the totals written back cannot lose a concurrent update
+        rows = list(LeaderboardStat.objects.select_for_update().filter(in_periods, user_id__in=chunk).order_by('id'))
+        for row in rows:
+            won, best, profit = deltas[row.user_id]
+            row.total_won += won
+            if best is not None:
+                row.best_multiplier = max(row.best_multiplier, best)
+            row.profit += profit
+        LeaderboardStat.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['window', 'period_start', 'user'],
+            update_fields=['total_won', 'best_multiplier', 'profit', 'updated_at'],
+        )
+
+
+def record_results(cashouts, losses, when=None):
+    """
+    Feed a settlement's bets into the boards in bulk.
+    ``cashouts`` is an iterable of (user_id, amount_tnd, win_amount,
+    multiplier) tuples, ``losses`` of (user_id, amount_tnd) pairs.
+    """
+    deltas = {}
+    for user_id, amount_tnd, win_amount, multiplier in cashouts:
+        won, best, profit = deltas.get(user_id, (Decimal('0.00'), None, Decimal('0.00')))
+        best = multiplier if best is None else max(best, multiplier)
+        deltas[user_id] = (won + win_amount, best, profit + (win_amount - amount_tnd))
+    for user_id, amount_tnd in losses:
+        won, best, profit = deltas.get(user_id, (Decimal('0.00'), None, Decimal('0.00')))
+        deltas[user_id] = (won, best, profit - amount_tnd)
+
+    if deltas:
+        _apply(deltas, when)
+
+
+def record_cashout(user_id, amount_tnd, win_amount, multiplier, when=None):
+    """Feed a cashed-out bet into the wins, multiplier and profit boards"""
+    record_results([(user_id, amount_tnd, win_amount, multiplier)], [], when)
+
+
+def record_cashouts(cashouts, when=None):
+    """
+    Feed many cashed-out bets into the boards.
+    ``cashouts`` is an iterable of (user_id, amount_tnd, win_amount, multiplier) tuples.
+    """
+    record_results(cashouts, [], when)
+
+
+def record_losses(losses, when=None):
+    """
+    Feed settled losing bets into the profit board.
+    ``losses`` is an iterable of (user_id, amount_tnd) pairs.
+    """
+    record_results([], losses, when)
+
+
+def refresh_ranks(when=None):
+    """
+    Rewrite the rank columns of every window's current period, one
+    UPDATE per window. Ties share a rank, as in ``top``.
+    Returns the number of rows ranked.
+    """
+    qn = connection.ops.quote_name
+    table = qn(LeaderboardStat._meta.db_table)
+    ranks = ', '.join(
+        f'RANK() OVER (ORDER BY {qn(column)} DESC) AS {qn(RANK_COLUMNS[board])}'
+        for board, column in BOARDS.items()
+    )
+    assignments = ', '.join(f'{qn(column)} = ranked.{qn(column)}' for column in RANK_COLUMNS.values())
+    sql = (
+        f'UPDATE {table} SET {assignments} '
+        f'FROM (SELECT {qn("id")}, {ranks} FROM {table} '
+        f'WHERE {qn("window")} = %s AND {qn("period_start")} = %s) AS ranked '
+        f'WHERE {table}.{qn("id")} = ranked.{qn("id")}'
+    )
+
+    ranked = 0
+    with connection.cursor() as cursor:
+        for window in WINDOWS:
+            cursor.execute(sql, [window, period_start(window, when)])
+            ranked += cursor.rowcount
+    return ranked
+
+
+def prune(when=None):
+    """
+    Delete daily rows older than LEADERBOARD_DAILY_KEEP_DAYS and weekly
+    rows older than LEADERBOARD_WEEKLY_KEEP_WEEKS. Returns the number deleted.
+    """
+    today = timezone.localdate(when or timezone.now())
+    daily_keep = getattr(settings, 'LEADERBOARD_DAILY_KEEP_DAYS', 7)
+    weekly_keep = getattr(settings, 'LEADERBOARD_WEEKLY_KEEP_WEEKS', 8)
+    deleted, _ = LeaderboardStat.objects.filter(
+        Q(window='daily', period_start__lt=today - timedelta(days=daily_keep))
+        | Q(window='weekly', period_start__lt=period_start('weekly', when) - timedelta(weeks=weekly_keep))
+    ).delete()
+    return deleted
+
+
+def _cache_key(board, window, start, limit):
+    return f"leaderboard:{board}:{window}:{start.isoformat()}:{limit}"
+
+
+def top(board, window, limit=10):
+    """
+    Return the cached top ``limit`` entries for a board and window.
+    Served from the (window, period_start, -score) index and cached for
+    LEADERBOARD_CACHE_TTL seconds.
+    """
+    column = BOARDS[board]
+    start = period_start(window)
+    key = _cache_key(board, window, start, limit)
+
+    entries = cache.get(key)
+    if entries is None:
+        rows = LeaderboardStat.objects.filter(
+            window=window,
+            period_start=start,
+            **{f'{column}__gt': 0}
+        ).order_by(f'-{column}', 'user_id').values_list('user_id', 'user__username', column)[:limit]
+
+        entries = []
+        previous = None
+        for position, (user_id, username, score) in enumerate(rows, start=1):
+            # Tied scores share a rank, matching rank()
+            if previous is None or score != previous[1]:
+                previous = (position, score)
+            entries.append({
+                'rank': previous[0],
+                'user_id': user_id,
+                'username': username,
+                'score': str(score),
+            })
+        cache.set(key, entries, getattr(settings, 'LEADERBOARD_CACHE_TTL', 5))
+
+    return entries
+
+
+def ahead_of(board, window, start, score):
+    """
+    Rows of the period that outrank ``score``, answered from the
+    (window, period_start, -score) index without reading the table.
+    """
+    column = BOARDS[board]
+    return LeaderboardStat.objects.filter(window=window, period_start=start, **{f'{column}__gt': score})
+
+
+def rank(user_id, board, window):
+    """
+    Return the user's score and 1-based rank for a board and window, or
+    None if they have no row in the current period.
+
+    One lookup of the user's row returns the rank ``refresh_ranks`` last
+    stored; a row that has not been ranked yet counts the rows ahead.
+    """
+    column = BOARDS[board]
+    start = period_start(window)
+
+    row = LeaderboardStat.objects.filter(
+        window=window, period_start=start, user_id=user_id
+    ).values_list(column, RANK_COLUMNS[board]).first()
+    if row is None:
+        return None
+
+    score, stored_rank = row
+    if stored_rank is None:
+        stored_rank = ahead_of(board, window, start, score).count() + 1
+    return {
+        'rank': stored_rank,
+        'user_id': user_id,
+        'score': str(score),
+    }
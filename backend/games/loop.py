@@ -0,0 +1,176 @@
+"""
+Round loop.
+
+Drives one room's game through PRE_ROUND -> FLYING -> CRASHED, one round
+after another, and broadcasts every phase to the room's group served by
+RoundsConsumer:
+
+* PRE_ROUND: broadcast ``round:pre`` and wait for bets.
+* FLYING: activate pending bets and publish them to the flight view
+  (games/flight.py), then every tick publish and broadcast the current
+  multiplier and claim auto-cashouts until the crash point is reached.
+  Cashouts and auto-cashouts go to the shared cache, not the database.
+* CRASHED: mark the round, persist its cashouts and losses in bulk,
+  record it in the round history (games/history.py) and broadcast
+  ``round:crash`` with the revealed seed.
+
+A round left FLYING by a previous process resumes from its start time,
+and the next round is opened in the crash transaction so bet requests
+never have to create one. With a LeaderLease (games/leader.py), the
+take-off and crash writes are fenced by its token.
+Run exactly one loop per room: ``python manage.py run_round_loop --room
+main`` for one room, or ``python manage.py run_game_loops`` to run every
+configured room (games/supervisor.py).
+
+Phase durations, tick lag, channel-layer send latency and settlement and
+auto-cashout batches are recorded in core.metrics, and each round's own
+timeline is stored on the round (games/trace.py).
+"""
+import asyncio
+import time
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+from core import metrics
+from core.db import db_sync_to_async
+from .flight import Flight
+from .history import RoundHistory
+from .models import Round
+from .rooms import DEFAULT_ROOM, group_name
+from .services import RoundsEngine, RoundSimulator
+from .trace import RoundTrace
+from .tasks import activate_round_bets
+
+TICK_INTERVAL = 0.1  # seconds
+CRASH_PAUSE = 3.0  # seconds between the crash and the next round
+
+
+class RoundLoop:
+    def __init__(self, room=DEFAULT_ROOM, channel_layer=None, now=timezone.now, sleep=asyncio.sleep,
+                 pre_round_duration=RoundsEngine.PRE_ROUND_DURATION,
+                 tick_interval=TICK_INTERVAL, crash_pause=CRASH_PAUSE, lease=None):
+        self.room = room
+        self.lease = lease
+        self.group = group_name(room)
+        self.channel_layer = channel_layer or get_channel_layer()
+        self.now = now
+        self.sleep = sleep
+        self.pre_round_duration = pre_round_duration
+        self.tick_interval = tick_interval
+        self.crash_pause = crash_pause
+        self.history = RoundHistory(room)
+
+    async def broadcast(self, event_type, data):
+        started = time.perf_counter()
+        await self.channel_layer.group_send(self.group, {
+            'type': event_type,
+            'data': {**data, 'timestamp': self.now().isoformat()},
+        })
+        metrics.CHANNEL_SEND.observe(time.perf_counter() - started, self.room, event_type)
+
+    async def run(self, rounds=None):
+        """Play ``rounds`` rounds, or forever"""
+        await db_sync_to_async(self.history.load)()
+        played = 0
+        while rounds is None or played < rounds:
+            await self.play_round()
+            played += 1
+
+    async def play_round(self):
+        round_obj = await db_sync_to_async(RoundsEngine.get_current_round)(self.room)
+        trace = RoundTrace(round_obj, self.now())
+
+        started = time.perf_counter()
+        if round_obj.state == 'PRE_ROUND':
+            await self.broadcast('round.pre', {
+                'round_id': round_obj.id,
+                'server_hash': round_obj.server_seed_hash,
+                'countdown': self.pre_round_duration,
+            })
+            await self.sleep(self.pre_round_duration)
+            trace.mark('betting_closed')
+            await db_sync_to_async(self._take_off)(round_obj, trace)
+            started = self._phase_done('pre_round', started)
+
+        flight = await db_sync_to_async(Flight.load)(round_obj)
+        await self.fly(round_obj, flight, trace)
+        started = self._phase_done('flying', started)
+
+        await db_sync_to_async(self._crash)(round_obj, flight, trace)
+        trace.mark('crash_frame_first')
+        await self.broadcast('round.crash', {
+            'round_id': round_obj.id,
+            'crash_multiplier': float(round_obj.crash_multiplier),
+            'server_seed': round_obj.server_seed_revealed,
+        })
+        trace.mark('crash_frame_last')
+        self._phase_done('crashed', started)
+        await db_sync_to_async(trace.save)()
+        await self.sleep(self.crash_pause)
+        return round_obj
+
+    async def fly(self, round_obj, flight, trace):
+        """Tick until the multiplier reaches the crash point"""
+        crash_multiplier = round_obj.crash_multiplier
+        due = None
+        ticks = 0
+        while True:
+            if due is not None:
+                metrics.TICK_LAG.observe(max(0.0, time.perf_counter() - due), self.room)
+            elapsed = (self.now() - round_obj.start_time).total_seconds()
+            multiplier = RoundSimulator.multiplier_at(elapsed, crash_multiplier)
+            if multiplier >= crash_multiplier:
+                trace.mark('crash_reached', ticks)
+                return
+
+            # Published before the broadcast, so no player sees a multiplier the view would cap
+            await db_sync_to_async(self._tick)(flight, multiplier, trace)
+            await self.broadcast('round.tick', {
+                'round_id': round_obj.id,
+                'multiplier': float(multiplier),
+            })
+            ticks += 1
+            due = time.perf_counter() + self.tick_interval
+            await self.sleep(self.tick_interval)
+
+    def _phase_done(self, phase, started):
+        finished = time.perf_counter()
+        metrics.ROUND_PHASE.observe(finished - started, self.room, phase)
+        return finished
+
+    def _fence(self):
+        if self.lease is not None:
+            self.lease.ensure()
+
+    def _take_off(self, round_obj, trace):
+        with transaction.atomic():
+            self._fence()
+            # Bets placed under the round lock either commit first and are activated here, or see FLYING
+            Round.objects.select_for_update().get(id=round_obj.id)
+            RoundsEngine.start_round(round_obj, started_at=self.now())
+            result = activate_round_bets(round_obj.id)
+        trace.mark('flying', result.get('activated_count', 0))
+
+    def _tick(self, flight, multiplier, trace):
+        started = time.perf_counter()
+        cashed_out = flight.tick(multiplier, self.now())
+        metrics.AUTO_CASHOUT_SECONDS.observe(time.perf_counter() - started, self.room)
+        metrics.AUTO_CASHOUT_BETS.observe(cashed_out, self.room)
+        if cashed_out:
+            trace.mark('auto_cashout', cashed_out)
+
+    def _crash(self, round_obj, flight, trace):
+        with transaction.atomic():
+            self._fence()
+            RoundsEngine.crash_round(round_obj)
+            trace.mark('crashed')
+            started = time.perf_counter()
+            trace.mark('settlement_start')
+            result = flight.settle(self.now())
+            metrics.SETTLEMENT_SECONDS.observe(time.perf_counter() - started, self.room)
+            settled = result.get('settled_count', 0)
+            trace.mark('settlement_end', settled)
+            metrics.SETTLEMENT_BETS.observe(settled, self.room)
+            RoundsEngine.create_round(self.room)
+        flight.clear()
+        self.history.record(round_obj)
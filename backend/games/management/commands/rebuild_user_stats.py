@@ -0,0 +1,82 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from games.models import Bet, UserStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the UserStats rollup from the Bet table"
+
+    STAT_FIELDS = [
+        'total_bets', 'total_wagered', 'total_won', 'wins', 'biggest_win',
+        'biggest_multiplier', 'current_streak', 'best_streak',
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only rebuild the given user id (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        bets = Bet.objects.all()
+        if options['user_ids']:
+            bets = bets.filter(user_id__in=options['user_ids'])
+
+        won = Q(status='CASHED_OUT')
+        totals = bets.values('user_id').annotate(
+            total_bets=Count('id'),
+            total_wagered=Sum('amount_tnd'),
+            wins=Count('id', filter=won),
+            total_won=Sum('win_amount_tnd', filter=won),
+            biggest_win=Max('win_amount_tnd', filter=won),
+            biggest_multiplier=Max('cashed_out_multiplier', filter=won),
+        ).order_by()
+
+        streaks = self.compute_streaks(bets)
+
+        rows = []
+        for row in totals.iterator():
+            current_streak, best_streak = streaks.get(row['user_id'], (0, 0))
+            rows.append(UserStats(
+                user_id=row['user_id'],
+                total_bets=row['total_bets'],
+                total_wagered=row['total_wagered'] or Decimal('0.00'),
+                total_won=row['total_won'] or Decimal('0.00'),
+                wins=row['wins'],
+                biggest_win=row['biggest_win'] or Decimal('0.00'),
+                biggest_multiplier=row['biggest_multiplier'] or Decimal('0.00'),
+                current_streak=current_streak,
+                best_streak=best_streak,
+            ))
+
+        batch_size = options['batch_size']
+        for start in range(0, len(rows), batch_size):
+            with transaction.atomic():
+                UserStats.objects.bulk_create(
+                    rows[start:start + batch_size],
+                    update_conflicts=True,
+                    unique_fields=['user'],
+                    update_fields=self.STAT_FIELDS,
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {len(rows)} users"))
+
+    @staticmethod
+    def compute_streaks(bets):
+        """Scan settled bets per user in placement order to derive streaks"""
+        streaks = {}
+        settled = bets.filter(status__in=['CASHED_OUT', 'LOST']).order_by(
+            'user_id', 'placed_at', 'id'
+        ).values_list('user_id', 'status')
+
+        for user_id, bet_status in settled.iterator(chunk_size=5000):
+            current_streak, best_streak = streaks.get(user_id, (0, 0))
+            if bet_status == 'CASHED_OUT':
+                current_streak += 1
+                best_streak = max(best_streak, current_streak)
+            else:
+                current_streak = 0
+            streaks[user_id] = (current_streak, best_streak)
+
+        return streaks
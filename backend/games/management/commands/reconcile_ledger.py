@@ -0,0 +1,114 @@
+import json
+import multiprocessing
+import os
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from games.reconciliation import reconcile_batch
+
+
+def _init_worker():
+    """Drop connections inherited from the parent so each worker opens its own"""
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile LedgerEntry chains against UserProfile balances, bets and deposits. "
+        "Drift is written as JSON lines as soon as each batch finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (0 runs in-process)")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Users per work unit")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Rows fetched per server-side cursor round trip")
+        parser.add_argument('--checkpoint', help="Path of a JSON checkpoint file to resume from and update")
+        parser.add_argument('--output', help="Write drift JSON lines here instead of stdout")
+
+    def handle(self, *args, **options):
+        checkpoint_path = options['checkpoint']
+        start_after = self.load_checkpoint(checkpoint_path)
+        out = open(options['output'], 'a') if options['output'] else self.stdout
+
+        batches = self.iter_batches(start_after, options['batch_size'], options['chunk_size'])
+
+        started = time.monotonic()
+        watermark = start_after
+        finished = {}
+        next_index = 0
+        users = entries = drift_count = 0
+
+        if options['workers'] > 0:
+            connections.close_all()
+            pool = multiprocessing.Pool(options['workers'], initializer=_init_worker)
+            results = pool.imap_unordered(reconcile_batch, batches)
+        else:
+            pool = None
+            results = map(reconcile_batch, batches)
+
+        try:
+            for batch_index, last_user_id, batch_users, entry_count, drifts in results:
+                users += batch_users
+                entries += entry_count
+                drift_count += len(drifts)
+                for drift in drifts:
+                    out.write(json.dumps(drift) + '\n')
+                out.flush()
+
+                # Only advance the checkpoint over a contiguous prefix of batches
+                finished[batch_index] = last_user_id
+                while next_index in finished:
+                    watermark = finished.pop(next_index)
+                    next_index += 1
+                self.save_checkpoint(checkpoint_path, watermark)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if out is not self.stdout:
+                out.close()
+
+        elapsed = time.monotonic() - started
+        rate = entries / elapsed if elapsed else 0
+        summary = (
+            f"Reconciled {users} users / {entries} entries in {elapsed:.1f}s "
+            f"({rate:.0f} entries/s), {drift_count} drift findings"
+        )
+        if drift_count:
+            raise CommandError(summary)
+        self.stderr.write(summary)
+
+    @staticmethod
+    def iter_batches(start_after, batch_size, chunk_size):
+        """Yield contiguous batches of user ids in ascending order"""
+        user_ids = User.objects.filter(id__gt=start_after).order_by('id').values_list('id', flat=True)
+        batch = []
+        index = 0
+        for user_id in user_ids.iterator(chunk_size=batch_size * 10):
+            batch.append(user_id)
+            if len(batch) == batch_size:
+                yield index, batch, chunk_size
+                index += 1
+                batch = []
+        if batch:
+            yield index, batch, chunk_size
+
+    @staticmethod
+    def load_checkpoint(path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as fh:
+            return json.load(fh).get('last_user_id', 0)
+
+    @staticmethod
+    def save_checkpoint(path, last_user_id):
+        if not path:
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as fh:
+            json.dump({'last_user_id': last_user_id}, fh)
+        os.replace(tmp_path, path)
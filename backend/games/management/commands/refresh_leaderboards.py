@@ -0,0 +1,26 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from games import leaderboards
+
+
+class Command(BaseCommand):
+    help = "Refresh stored leaderboard ranks and prune expired daily/weekly rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep refreshing on a schedule instead of running once")
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Seconds between refreshes (default: LEADERBOARD_RANK_INTERVAL)")
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'LEADERBOARD_RANK_INTERVAL', 30)
+
+        while True:
+            started = time.monotonic()
+            ranked = leaderboards.refresh_ranks()
+            pruned = leaderboards.prune()
+            self.stdout.write(f"Ranked {ranked} rows, pruned {pruned} expired rows")
+            if not options['loop']:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
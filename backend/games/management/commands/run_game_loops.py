@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from games.rooms import validate_rooms
+from games.supervisor import Supervisor
+
+
+class Command(BaseCommand):
+    help = "Run a round loop for every game room, spread over several processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.GAME_LOOP_PROCESSES,
+                            help="Worker processes to spread the rooms over (default: GAME_LOOP_PROCESSES)")
+        parser.add_argument('--rooms', nargs='+', default=None,
+                            help="Rooms to run (default: GAME_ROOMS)")
+        parser.add_argument('--metrics-port', type=int, default=None,
+                            help="Serve each worker's metrics on this port plus its index")
+
+    def handle(self, *args, **options):
+        rooms = options['rooms'] or list(settings.GAME_ROOMS)
+        unknown = [room for room in rooms if room not in settings.GAME_ROOMS]
+        if unknown:
+            raise CommandError(f"Rooms not in GAME_ROOMS: {', '.join(unknown)}")
+        try:
+            validate_rooms(rooms)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        supervisor = Supervisor(rooms, options['processes'], metrics_port=options['metrics_port'])
+        for index, group in enumerate(supervisor.groups):
+            self.stdout.write(f"Worker {index}: {', '.join(group)}")
+        supervisor.run()
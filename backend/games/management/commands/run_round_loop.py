@@ -0,0 +1,29 @@
+import asyncio
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.db import keep_connections_open
+from core.metrics import serve_metrics
+from games.leader import lead
+from games.rooms import DEFAULT_ROOM
+
+
+class Command(BaseCommand):
+    help = "Run one room's round loop once elected leader for it (see run_game_loops)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room', default=DEFAULT_ROOM,
+                            help="Room to play (default: %(default)s)")
+        parser.add_argument('--rounds', type=int, default=None,
+                            help="Stop after this many rounds (default: run forever)")
+        parser.add_argument('--metrics-port', type=int, default=None,
+                            help="Serve Prometheus metrics for this process on this port")
+
+    def handle(self, *args, **options):
+        if options['room'] not in settings.GAME_ROOMS:
+            raise CommandError(f"Room {options['room']} is not in GAME_ROOMS")
+        keep_connections_open()
+        if options['metrics_port']:
+            serve_metrics(options['metrics_port'])
+            self.stdout.write(f"Serving metrics on port {options['metrics_port']}")
+        self.stdout.write(f"Starting round loop for room {options['room']}")
+        asyncio.run(lead(options['room'], rounds=options['rounds']))
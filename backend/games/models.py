@@ -32,11 +32,13 @@ class Round(models.Model):
     ]
 
     id = models.AutoField(primary_key=True)
+    room = models.CharField(max_length=32, default='main', help_text="Game room (games/rooms.py)")
     server_seed_hash = models.CharField(max_length=64, help_text="HMAC-SHA256 hash of server seed")
     server_seed_revealed = models.CharField(max_length=64, null=True, blank=True, help_text="Revealed after crash")
     start_time = models.DateTimeField(null=True, blank=True)
     state = models.CharField(max_length=20, choices=STATE_CHOICES, default='PRE_ROUND')
     crash_multiplier = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    timeline = models.JSONField(default=dict, blank=True, help_text="Server-side timeline written by the round loop (games/trace.py)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -45,10 +47,32 @@ class Round(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['state']),
+            models.Index(fields=['room', 'state']),
         ]
+        constraints = [
+            # Only one round per room may be open; concurrent creators lose the race (games/leader.py)
+            models.UniqueConstraint(
+                fields=['room'],
+                condition=models.Q(state__in=['PRE_ROUND', 'FLYING']),
+                name='one_open_round_per_room',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Round {self.id} ({self.room}) - {self.state} - {self.crash_multiplier}x"
+
+
+class LoopLease(models.Model):
+    """
+    Round loop leadership for one room (games/leader.py)
+    """
+    room = models.CharField(max_length=32, primary_key=True)
+    holder = models.CharField(max_length=128, blank=True)
+    token = models.PositiveBigIntegerField(default=0, help_text="Fencing token, incremented on every takeover")
+    expires_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"Round {self.id} - {self.state} - {self.crash_multiplier}x"
+        return f"{self.room} - {self.holder or 'free'} - token {self.token}"
 
 
 class Bet(models.Model):
@@ -65,6 +89,7 @@ class Bet(models.Model):
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bets')
     round = models.ForeignKey(Round, on_delete=models.CASCADE, related_name='bets')
+    room = models.CharField(max_length=32, default='main', help_text="Room of the round, copied for room-scoped queries")
     amount_tnd = models.DecimalField(max_digits=10, decimal_places=2)
     placed_at = models.DateTimeField(auto_now_add=True)
     auto_cashout_multiplier = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
@@ -79,6 +104,7 @@ class Bet(models.Model):
         indexes = [
             models.Index(fields=['user', '-placed_at']),
             models.Index(fields=['round', 'status']),
+            models.Index(fields=['room', '-placed_at']),
         ]
 
     def __str__(self):
@@ -96,6 +122,7 @@ class LedgerEntry(models.Model):
         ('BET_WON', 'Bet Won'),
         ('BET_LOST', 'Bet Lost'),
         ('REFUND', 'Refund'),
+        ('SIGNUP_GRANT', 'Signup Grant'),
     ]
 
     id = models.AutoField(primary_key=True)
@@ -115,3 +142,79 @@ class LedgerEntry(models.Model):
 
     def __str__(self):
         return f"{self.type} - {self.user.username} - {self.amount_tnd} TND"
+
+
+class UserStats(models.Model):
+    """
+    Per-user betting statistics rollup, maintained incrementally by the
+    same transactions that place, cash out and settle bets
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_bets = models.PositiveIntegerField(default=0)
+    total_wagered = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_won = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    wins = models.PositiveIntegerField(default=0)
+    biggest_win = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    biggest_multiplier = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    current_streak = models.PositiveIntegerField(default=0)
+    best_streak = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for user {self.user_id} - {self.total_bets} bets"
+
+    @property
+    def total_profit(self):
+        return self.total_won - self.total_wagered
+
+    @property
+    def win_rate(self):
+        if not self.total_bets:
+            return 0.0
+        return round(self.wins / self.total_bets * 100, 2)
+
+    @property
+    def average_bet(self):
+        if not self.total_bets:
+            return Decimal('0.00')
+        return self.total_wagered / self.total_bets
+
+
+class LeaderboardStat(models.Model):
+    """
+    Ranked leaderboard rollup per user and time window, fed by cashout and
+    settlement events. One row per (window, period_start, user); rows for
+    past periods stop being read when the window rolls over and are
+    deleted by games.leaderboards.prune. The *_rank columns hold each
+    board's rank as of the last games.leaderboards.refresh_ranks.
+    """
+    WINDOW_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('all_time', 'All time'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_stats')
+    window = models.CharField(max_length=10, choices=WINDOW_CHOICES)
+    period_start = models.DateField()
+    total_won = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    best_multiplier = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    wins_rank = models.PositiveIntegerField(null=True, blank=True)
+    multiplier_rank = models.PositiveIntegerField(null=True, blank=True)
+    profit_rank = models.PositiveIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'period_start', 'user'], name='leaderboard_unique_user_period'),
+        ]
+        indexes = [
+            models.Index(fields=['window', 'period_start', '-total_won']),
+            models.Index(fields=['window', 'period_start', '-best_multiplier']),
+            models.Index(fields=['window', 'period_start', '-profit']),
+        ]
+
+    def __str__(self):
+        return f"{self.window} {self.period_start} - user {self.user_id}"
@@ -0,0 +1,118 @@
+"""
+Ledger reconciliation.
+
+Streams each user's LedgerEntry rows in timestamp order and checks that:
+
+* the chain starts at the opening balance (the UserProfile default);
+  registration writes a SIGNUP_GRANT entry from there to the demo balance,
+* the balance_before / balance_after chain is continuous,
+* every entry's amount matches its balance delta,
+* the chain ends at UserProfile.balance_tnd, and a user without entries
+  still holds the opening balance,
+* every Bet has a BET_PLACED entry, every cashed-out Bet a BET_WON entry,
+  and every completed Deposit a DEPOSIT entry.
+
+Used by the ``reconcile_ledger`` management command, which fans batches of
+user ids out across a worker pool.
+"""
+from .models import Bet, LedgerEntry, UserProfile
+
+OPENING_BALANCE = UserProfile._meta.get_field('balance_tnd').default
+
+
+def _drift(user_id, kind, **details):
+    return {'user_id': user_id, 'kind': kind, **details}
+
+
+def reconcile_user(user_id, balance_tnd, chunk_size=2000):
+    """
+    Reconcile one user's ledger. Returns (entry_count, drifts).
+    ``balance_tnd`` is the user's current profile balance, or None if the
+    user has no profile.
+    """
+    # Deposits live in the payments app; import lazily to keep games standalone
+    from payments.models import Deposit
+
+    drifts = []
+    entries = LedgerEntry.objects.filter(user_id=user_id).order_by(
+        'timestamp', 'id'
+    ).values_list('id', 'type', 'amount_tnd', 'balance_before', 'balance_after', 'meta')
+
+    count = 0
+    previous_after = None
+    placed_bets = set()
+    won_bets = set()
+    deposits = set()
+
+    for entry_id, entry_type, amount, before, after, meta in entries.iterator(chunk_size=chunk_size):
+        count += 1
+
+        if previous_after is None and before != OPENING_BALANCE:
+            drifts.append(_drift(
+                user_id, 'opening_mismatch', entry_id=entry_id,
+                expected=str(OPENING_BALANCE), found=str(before),
+            ))
+        if previous_after is not None and before != previous_after:
+            drifts.append(_drift(
+                user_id, 'chain_break', entry_id=entry_id,
+                expected=str(previous_after), found=str(before),
+            ))
+        if before + amount != after:
+            drifts.append(_drift(
+                user_id, 'amount_mismatch', entry_id=entry_id,
+                expected=str(before + amount), found=str(after),
+            ))
+        previous_after = after
+
+        meta = meta or {}
+        if entry_type == 'BET_PLACED' and 'bet_id' in meta:
+            placed_bets.add(meta['bet_id'])
+        elif entry_type == 'BET_WON' and 'bet_id' in meta:
+            won_bets.add(meta['bet_id'])
+        elif entry_type == 'DEPOSIT' and 'deposit_id' in meta:
+            deposits.add(meta['deposit_id'])
+
+    if previous_after is not None and balance_tnd is not None and previous_after != balance_tnd:
+        drifts.append(_drift(
+            user_id, 'balance_mismatch',
+            expected=str(previous_after), found=str(balance_tnd),
+        ))
+    if previous_after is None and balance_tnd is not None and balance_tnd != OPENING_BALANCE:
+        drifts.append(_drift(
+            user_id, 'missing_ledger',
+            expected=str(OPENING_BALANCE), found=str(balance_tnd),
+        ))
+
+    for bet_id, bet_status in Bet.objects.filter(user_id=user_id).values_list('id', 'status').iterator():
+        if bet_id not in placed_bets:
+            drifts.append(_drift(user_id, 'missing_bet_placed', bet_id=bet_id))
+        if bet_status == 'CASHED_OUT' and bet_id not in won_bets:
+            drifts.append(_drift(user_id, 'missing_bet_won', bet_id=bet_id))
+
+    completed = Deposit.objects.filter(user_id=user_id, status='completed').values_list('id', flat=True)
+    for deposit_id in completed.iterator():
+        if deposit_id not in deposits:
+            drifts.append(_drift(user_id, 'missing_deposit', deposit_id=deposit_id))
+
+    return count, drifts
+
+
+def reconcile_batch(batch):
+    """
+    Reconcile a contiguous batch of user ids.
+    ``batch`` is (batch_index, user_ids, chunk_size); returns
+    (batch_index, last_user_id, user_count, entry_count, drifts).
+    """
+    batch_index, user_ids, chunk_size = batch
+    balances = dict(
+        UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'balance_tnd')
+    )
+
+    total = 0
+    drifts = []
+    for user_id in user_ids:
+        count, user_drifts = reconcile_user(user_id, balances.get(user_id), chunk_size)
+        total += count
+        drifts.extend(user_drifts)
+
+    return batch_index, user_ids[-1], len(user_ids), total, drifts
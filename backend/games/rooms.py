@@ -0,0 +1,38 @@
+"""
+Game rooms.
+
+Each room plays its own independent sequence of rounds (VIP, low-stakes,
+regional tables...). Rounds and bets carry a ``room`` key, every room has
+its own round loop and channel-layer group, and clients pick a room with
+``ws/rounds/<room>/`` and the ``room`` field when betting. The configured
+rooms come from GAME_ROOMS; ``main`` is the room clients that predate
+rooms use, served on ``ws/rounds/`` and the ``rounds`` group.
+"""
+import re
+from django.conf import settings
+
+DEFAULT_ROOM = 'main'
+ROOM_PATTERN = r'[a-z0-9][a-z0-9_-]{0,31}'  # Also valid in channel-layer group names
+
+_room_re = re.compile(ROOM_PATTERN)
+
+
+def configured_rooms():
+    return list(settings.GAME_ROOMS)
+
+
+def is_room(room):
+    return room in settings.GAME_ROOMS
+
+
+def group_name(room):
+    """Channel-layer group a room's events are broadcast to"""
+    return 'rounds' if room == DEFAULT_ROOM else f'rounds.{room}'
+
+
+def validate_rooms(rooms):
+    """Raise ValueError for room keys that cannot be used in URLs and group names"""
+    invalid = [room for room in rooms if not _room_re.fullmatch(room)]
+    if invalid:
+        raise ValueError(f"Invalid room keys: {', '.join(invalid)}")
+    return rooms
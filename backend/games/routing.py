@@ -1,6 +1,8 @@
 from django.urls import re_path
 from . import consumers
+from .rooms import ROOM_PATTERN
 
 websocket_urlpatterns = [
     re_path(r'ws/rounds/$', consumers.RoundsConsumer.as_asgi()),
+    re_path(rf'ws/rounds/(?P<room>{ROOM_PATTERN})/$', consumers.RoundsConsumer.as_asgi()),
 ]
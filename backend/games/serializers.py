@@ -1,6 +1,8 @@
+from decimal import Decimal, ROUND_HALF_UP
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Bet, Round, LedgerEntry
+from .rooms import DEFAULT_ROOM, is_room
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -13,6 +15,13 @@ class RoundSerializer(serializers.ModelSerializer):
     class Meta:
         model = Round
         fields = ['id', 'server_seed_hash', 'state', 'crash_multiplier', 'created_at']
+    
+    def to_representation(self, instance):
+        """The crash point is only revealed once the round has crashed"""
+        data = super().to_representation(instance)
+        if instance.state != 'CRASHED':
+            data['crash_multiplier'] = None
+        return data
 
 
 class BetSerializer(serializers.ModelSerializer):
@@ -22,16 +31,94 @@ class BetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Bet
         fields = [
-            'id', 'user', 'round', 'amount_tnd', 'placed_at',
+            'id', 'user', 'round', 'room', 'amount_tnd', 'placed_at',
             'auto_cashout_multiplier', 'cashed_out_at',
             'cashed_out_multiplier', 'win_amount_tnd', 'status'
         ]
         read_only_fields = [
-            'id', 'placed_at', 'cashed_out_at',
+            'id', 'room', 'placed_at', 'cashed_out_at',
             'cashed_out_multiplier', 'win_amount_tnd', 'status'
         ]
 
 
+class BetHistoryProjection:
+    """
+    Lean read path for bet history.
+
+    Selects only the columns rendered by BetSerializer with ``.values()``
+    and builds the same payload with plain dicts, skipping model instances
+    and DRF field machinery. The requesting user is serialized once and
+    shared by every row. Like RoundSerializer, it hides the crash point of
+    rounds that have not crashed.
+    """
+
+    FIELDS = (
+        'id', 'room', 'amount_tnd', 'placed_at', 'auto_cashout_multiplier',
+        'cashed_out_at', 'cashed_out_multiplier', 'win_amount_tnd', 'status',
+        'round_id', 'round__server_seed_hash', 'round__state',
+        'round__crash_multiplier', 'round__created_at',
+    )
+
+    TWO_PLACES = Decimal('0.01')
+
+    def __init__(self, user):
+        self.user = {'id': user.id, 'username': user.username, 'email': user.email}
+
+    @classmethod
+    def rows(cls, queryset):
+        """Project a Bet queryset down to the columns needed for history"""
+        return queryset.values_list(*cls.FIELDS)
+
+    @classmethod
+    def decimal(cls, value):
+        """Render a decimal the way DecimalField(decimal_places=2) does"""
+        if value is None:
+            return None
+        return '{:f}'.format(value.quantize(cls.TWO_PLACES, rounding=ROUND_HALF_UP))
+
+    @staticmethod
+    def datetime(value):
+        """Render a datetime the way DRF's DateTimeField does"""
+        if value is None:
+            return None
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    def serialize(self, rows):
+        """Serialize projected rows into BetSerializer-compatible dicts"""
+        decimal = self.decimal
+        datetime = self.datetime
+        user = self.user
+        return [
+            {
+                'id': bet_id,
+                'user': user,
+                'round': {
+                    'id': round_id,
+                    'server_seed_hash': server_seed_hash,
+                    'state': state,
+                    'crash_multiplier': decimal(crash_multiplier) if state == 'CRASHED' else None,
+                    'created_at': datetime(round_created_at),
+                },
+                'room': room,
+                'amount_tnd': decimal(amount_tnd),
+                'placed_at': datetime(placed_at),
+                'auto_cashout_multiplier': decimal(auto_cashout_multiplier),
+                'cashed_out_at': datetime(cashed_out_at),
+                'cashed_out_multiplier': decimal(cashed_out_multiplier),
+                'win_amount_tnd': decimal(win_amount_tnd),
+                'status': bet_status,
+            }
+            for (
+                bet_id, room, amount_tnd, placed_at, auto_cashout_multiplier,
+                cashed_out_at, cashed_out_multiplier, win_amount_tnd, bet_status,
+                round_id, server_seed_hash, state, crash_multiplier, round_created_at,
+            ) in rows
+        ]
+
+
 class PlaceBetSerializer(serializers.Serializer):
     amount_tnd = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=1.0)
     auto_cashout_multiplier = serializers.DecimalField(
@@ -42,6 +129,13 @@ class PlaceBetSerializer(serializers.Serializer):
         min_value=1.01
     )
     idempotency_key = serializers.CharField(max_length=64, required=False, allow_null=True)
+    room = serializers.CharField(max_length=32, required=False, default=DEFAULT_ROOM)
+    
+    def validate_room(self, value):
+        """Only configured rooms take bets"""
+        if not is_room(value):
+            raise serializers.ValidationError(f"Unknown room: {value}")
+        return value
     
     def validate_amount_tnd(self, value):
         """Validate bet amount is within limits"""
@@ -4,8 +4,10 @@ import secrets
 import time
 from decimal import Decimal
 from datetime import datetime, timedelta
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from .models import Round
+from .rooms import DEFAULT_ROOM
 
 
 class RoundsEngine:
@@ -46,6 +48,14 @@ class RoundsEngine:
         # Generate hash
         hash_value = hashlib.sha256(combined.encode()).hexdigest()
         
+        return Decimal(str(RoundsEngine.crash_point_from_hash(hash_value)))
+    
+    @staticmethod
+    def crash_point_from_hash(hash_value: str) -> float:
+        """
+        Crash point, rounded to 2 places, from the hex SHA-256 of seed:salt
+        Shared by single and batch verification so both compute identically
+        """
         # Convert first 8 hex characters to integer
         hex_int = int(hash_value[:8], 16)
         
@@ -65,7 +75,7 @@ class RoundsEngine:
         # Clamp between 1.00x and 100.00x
         crash_point = max(1.00, min(100.00, crash_point))
         
-        return Decimal(str(round(crash_point, 2)))
+        return round(crash_point, 2)
     
     @staticmethod
     def verify_round(server_seed: str, server_hash: str, crash_multiplier: Decimal) -> bool:
@@ -87,7 +97,7 @@ class RoundsEngine:
         return True
     
     @staticmethod
-    def create_round() -> Round:
+    def create_round(room: str = DEFAULT_ROOM) -> Round:
         """Create a new round with pre-computed hash"""
         server_seed = RoundsEngine.generate_server_seed()
         server_hash = RoundsEngine.compute_hash(server_seed)
@@ -97,16 +107,17 @@ class RoundsEngine:
             server_seed_hash=server_hash,
             server_seed_revealed=server_seed,  # Store but don't reveal until crash
             crash_multiplier=crash_multiplier,
-            state='PRE_ROUND'
+            state='PRE_ROUND',
+            room=room
         )
         
         return round_obj
     
     @staticmethod
-    def start_round(round_obj: Round):
+    def start_round(round_obj: Round, started_at: datetime = None):
         """Transition round to FLYING state"""
         round_obj.state = 'FLYING'
-        round_obj.start_time = timezone.now()
+        round_obj.start_time = started_at or timezone.now()
         round_obj.save()
     
     @staticmethod
@@ -117,16 +128,21 @@ class RoundsEngine:
         # Seed is already stored, just needs to be sent to clients
     
     @staticmethod
-    def get_current_round() -> Round:
-        """Get or create the current active round"""
+    def get_current_round(room: str = DEFAULT_ROOM) -> Round:
+        """Get or create the current active round of a room"""
         # Try to get the most recent round
         round_obj = Round.objects.filter(
+            room=room,
             state__in=['PRE_ROUND', 'FLYING']
         ).first()
         
         if not round_obj:
-            # Create new round if none exists
-            round_obj = RoundsEngine.create_round()
+            # Create new round if none exists; if another process won the race, use its round
+            try:
+                with transaction.atomic():
+                    round_obj = RoundsEngine.create_round(room)
+            except IntegrityError:
+                round_obj = Round.objects.get(room=room, state__in=['PRE_ROUND', 'FLYING'])
         
         return round_obj
 
@@ -143,6 +159,12 @@ class RoundSimulator:
         Uses exponential growth curve
         """
         elapsed = (timezone.now() - start_time).total_seconds()
+        return RoundSimulator.multiplier_at(elapsed, crash_multiplier)
+    
+    @staticmethod
+    def multiplier_at(elapsed: float, crash_multiplier: Decimal) -> Decimal:
+        """Multiplier ``elapsed`` seconds into the flight, capped at the crash point"""
+        elapsed = max(0.0, elapsed)
         
         # Exponential growth: multiplier = 1.0 + (elapsed^1.5) * growth_rate
         growth_rate = 0.1
@@ -0,0 +1,112 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from .models import Bet, UserStats
+
+WRITE_CHUNK = 250  # Users per locking read and upsert; keeps the statements' parameters bounded
+
+
+def _apply(user_id, **updates):
+    """
+    Apply F-expression updates to a user's stats row, creating it on first use.
+    Must be called inside the transaction that changes the bet.
+    """
+    if not UserStats.objects.filter(user_id=user_id).update(**updates):
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def record_bet_placed(user_id, amount_tnd):
+    """Count a newly placed bet"""
+    _apply(
+        user_id,
+        total_bets=F('total_bets') + 1,
+        total_wagered=F('total_wagered') + amount_tnd,
+    )
+
+
+def record_bet_won(user_id, win_amount, multiplier):
+    """Count a cashed-out bet; streaks are updated when its round settles"""
+    _apply(
+        user_id,
+        wins=F('wins') + 1,
+        total_won=F('total_won') + win_amount,
+        biggest_win=Greatest(F('biggest_win'), win_amount),
+        biggest_multiplier=Greatest(F('biggest_multiplier'), multiplier),
+    )
+
+
+def record_bets_won(wins):
+    """
+    Count many cashed-out bets with one INSERT of missing rows, then a
+    locking read and one upsert of the new totals per WRITE_CHUNK users.
+    ``wins`` is an iterable of (user_id, win_amount, multiplier) triples.
+    """
+    per_user = {}
+    for user_id, win_amount, multiplier in wins:
+        count, total, biggest, best = per_user.get(user_id, (0, 0, win_amount, multiplier))
+        per_user[user_id] = (count + 1, total + win_amount, max(biggest, win_amount), max(best, multiplier))
+    if not per_user:
+        return
+
+    user_ids = sorted(per_user)
+    UserStats.objects.bulk_create([UserStats(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+    for offset in range(0, len(user_ids), WRITE_CHUNK):
+        rows = list(UserStats.objects.select_for_update().filter(
+            user_id__in=user_ids[offset:offset + WRITE_CHUNK]
+        ).order_by('user_id'))
+        for row in rows:
+            count, total, biggest, best = per_user[row.user_id]
+            row.wins += count
+            row.total_won += total
+            row.biggest_win = max(row.biggest_win, biggest)
+            row.biggest_multiplier = max(row.biggest_multiplier, best)
+        UserStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['wins', 'total_won', 'biggest_win', 'biggest_multiplier', 'updated_at'],
+        )
+
+
+def record_round_streaks(round_id):
+    """
+    Apply a settled round to the winning streaks. The round's bets are
+    replayed in (placed_at, id) order, the order rebuild_user_stats uses,
+    so several bets in one round give the same streaks either way. Users
+    whose bets change their streaks alike share one UPDATE.
+    """
+    per_user = {}
+    settled = Bet.objects.filter(round_id=round_id, status__in=['CASHED_OUT', 'LOST']).order_by(
+        'placed_at', 'id'
+    ).values_list('user_id', 'status')
+    for user_id, bet_status in settled:
+        per_user.setdefault(user_id, []).append(bet_status == 'CASHED_OUT')
+    if not per_user:
+        return
+
+    groups = {}
+    for user_id, results in per_user.items():
+        if all(results):
+            key = (len(results), None, None)
+        else:
+            # Wins before the first loss extend the running streak; wins after the last loss start the next one
+            longest = run = 0
+            for won in results:
+                run = run + 1 if won else 0
+                longest = max(longest, run)
+            key = (results.index(False), longest, run)
+        groups.setdefault(key, []).append(user_id)
+
+    UserStats.objects.bulk_create([UserStats(user_id=user_id) for user_id in per_user], ignore_conflicts=True)
+    for (leading, longest, trailing), user_ids in groups.items():
+        rows = UserStats.objects.filter(user_id__in=user_ids)
+        if longest is None:
+            rows.update(
+                current_streak=F('current_streak') + leading,
+                best_streak=Greatest(F('best_streak'), F('current_streak') + leading),
+            )
+        else:
+            rows.update(
+                best_streak=Greatest(F('best_streak'), F('current_streak') + leading, longest),
+                current_streak=trailing,
+            )
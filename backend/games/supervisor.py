@@ -0,0 +1,113 @@
+"""
+Game loop supervisor.
+
+Runs one RoundLoop per configured room and spreads the rooms round-robin
+over GAME_LOOP_PROCESSES worker processes, so busy rooms do not contend
+for one event loop or one core. Every node can run the supervisor: a room
+is only played by the node holding its lease (games/leader.py). Within a worker, each room's loop is
+restarted on its own if it raises, so one room's failure does not stop
+the others; the supervisor restarts a worker process that exits.
+
+Workers are started with the ``spawn`` method: a forked child would
+inherit the parent's database connections and event loop state.
+
+    python manage.py run_game_loops --processes 4
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+
+RESTART_DELAY = 1.0  # seconds before a failed room loop or worker is restarted
+
+
+def assign_rooms(rooms, processes):
+    """Split ``rooms`` round-robin into at most ``processes`` non-empty groups"""
+    processes = max(1, min(processes, len(rooms)))
+    groups = [[] for _ in range(processes)]
+    for index, room in enumerate(rooms):
+        groups[index % processes].append(room)
+    return groups
+
+
+async def run_room(room, rounds=None, restart_delay=RESTART_DELAY):
+    """Lead one room's loop when elected, restarting after an unexpected error"""
+    from .leader import lead
+
+    while True:
+        try:
+            await lead(room, rounds=rounds)
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Round loop for room {room} failed, restarting: {e}")
+            await asyncio.sleep(restart_delay)
+
+
+async def run_rooms(rooms, rounds=None):
+    await asyncio.gather(*(run_room(room, rounds=rounds) for room in rooms))
+
+
+def _worker(rooms, metrics_port):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from core.db import keep_connections_open
+    keep_connections_open()
+
+    if metrics_port:
+        from core.metrics import serve_metrics
+        serve_metrics(metrics_port)
+    asyncio.run(run_rooms(rooms))
+
+
+class Supervisor:
+    def __init__(self, rooms, processes, metrics_port=None, restart_delay=RESTART_DELAY, context=None):
+        self.groups = assign_rooms(rooms, processes)
+        self.metrics_port = metrics_port
+        self.restart_delay = restart_delay
+        self.context = context or multiprocessing.get_context('spawn')
+        self.workers = [None] * len(self.groups)
+
+    def _spawn(self, index):
+        # Each worker serves its own registry on consecutive ports
+        port = self.metrics_port + index if self.metrics_port else None
+        worker = self.context.Process(
+            target=_worker, args=(self.groups[index], port), name=f'game-loop-{index}'
+        )
+        worker.start()
+        self.workers[index] = worker
+        return worker
+
+    def start(self):
+        for index in range(len(self.groups)):
+            self._spawn(index)
+
+    def check(self):
+        """Restart workers that have exited; returns the restarted indexes"""
+        restarted = []
+        for index, worker in enumerate(self.workers):
+            if worker is not None and not worker.is_alive():
+                print(f"Game loop worker {index} ({', '.join(self.groups[index])}) exited "
+                      f"with code {worker.exitcode}, restarting")
+                self._spawn(index)
+                restarted.append(index)
+        return restarted
+
+    def stop(self):
+        for worker in self.workers:
+            if worker is not None and worker.is_alive():
+                worker.terminate()
+        for worker in self.workers:
+            if worker is not None:
+                worker.join()
+
+    def run(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(self.restart_delay)
+                self.check()
+        finally:
+            self.stop()
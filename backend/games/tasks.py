@@ -2,6 +2,8 @@ from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
 from .models import Bet, Round, LedgerEntry, UserProfile
+from .stats import record_bet_won, record_round_streaks
+from . import leaderboards
 
 
 def settle_round_bets(round_id):
@@ -23,6 +25,7 @@ def settle_round_bets(round_id):
             ).select_related('user')
             
             settled_count = 0
+            losses = []
             
             for bet in active_bets:
                 # These bets didn't cash out in time - they lose
@@ -44,8 +47,12 @@ def settle_round_bets(round_id):
                     }
                 )
                 
+                losses.append((bet.user_id, bet.amount_tnd))
                 settled_count += 1
             
+            record_round_streaks(round_obj.id)
+            leaderboards.record_losses(losses)
+            
             return {
                 'success': True,
                 'round_id': round_id,
@@ -107,6 +114,7 @@ def process_auto_cashouts(round_id, current_multiplier):
             ).select_related('user')
             
             cashed_out_count = 0
+            cashouts = []
             
             for bet in auto_cashout_bets:
                 # Calculate payout at auto-cashout multiplier
@@ -143,8 +151,13 @@ def process_auto_cashouts(round_id, current_multiplier):
                     }
                 )
                 
+                record_bet_won(bet.user_id, win_amount, cashout_multiplier)
+                cashouts.append((bet.user_id, bet.amount_tnd, win_amount, cashout_multiplier))
+                
                 cashed_out_count += 1
             
+            leaderboards.record_cashouts(cashouts)
+            
             return {
                 'success': True,
                 'round_id': round_id,
@@ -0,0 +1,64 @@
+"""
+Per-round performance timelines.
+
+The round loop keeps a RoundTrace for every round it plays and marks each
+step with a monotonic offset from when it picked the round up: betting
+closed, FLYING, every non-empty auto-cashout batch, the crash, settlement
+start and end, and the first and last crash frame handed to the channel
+layer. The trace is written to ``Round.timeline`` in one UPDATE after the
+crash broadcast, off the critical path, as::
+
+    {"origin": "<wall clock ISO time of offset 0>",
+     "events": [[offset_ms, "event"], [offset_ms, "event", count], ...]}
+
+``created`` is the only event with a wall-clock source (``created_at``), so
+it is usually negative: the time the round waited before the loop reached
+it. RoundAdmin renders the timeline with the gap before every event.
+"""
+import time
+from .models import Round
+
+MAX_EVENTS = 500  # Later events are dropped and counted under "truncated"
+
+
+class RoundTrace:
+    def __init__(self, round_obj, now, clock=time.monotonic):
+        self.round_id = round_obj.id
+        self.clock = clock
+        self.origin_at = now
+        self.origin = clock()
+        self.events = []
+        self.dropped = 0
+        created = round((round_obj.created_at - now).total_seconds() * 1000, 1)
+        self.events.append([created, 'created'])
+
+    def mark(self, event, count=None):
+        if len(self.events) >= MAX_EVENTS:
+            self.dropped += 1
+            return
+        entry = [round((self.clock() - self.origin) * 1000, 1), event]
+        if count is not None:
+            entry.append(count)
+        self.events.append(entry)
+
+    def as_dict(self):
+        events = list(self.events)
+        if self.dropped:
+            events.append([events[-1][0], 'truncated', self.dropped])
+        return {'origin': self.origin_at.isoformat(), 'events': events}
+
+    def save(self):
+        Round.objects.filter(id=self.round_id).update(timeline=self.as_dict())
+
+
+def timeline_rows(timeline):
+    """(event, offset_ms, gap_ms, count) rows for display, in time order"""
+    rows = []
+    previous = None
+    for entry in sorted((timeline or {}).get('events', []), key=lambda e: e[0]):
+        offset, event = entry[0], entry[1]
+        count = entry[2] if len(entry) > 2 else None
+        gap = None if previous is None else round(offset - previous, 1)
+        rows.append((event, offset, gap, count))
+        previous = offset
+    return rows
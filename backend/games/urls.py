@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BetViewSet, get_balance, get_ledger
+from .views import (
+    BetViewSet, get_balance, get_ledger, get_leaderboard, get_my_rank,
+    get_round_history, get_round_proof, verify_rounds,
+)
 
 router = DefaultRouter()
 router.register(r'bets', BetViewSet, basename='bet')
@@ -9,4 +12,9 @@ urlpatterns = [
     path('', include(router.urls)),
     path('balance/', get_balance, name='balance'),
     path('ledger/', get_ledger, name='ledger'),
+    path('rounds/history/', get_round_history, name='round-history'),
+    path('rounds/<int:round_id>/proof/', get_round_proof, name='round-proof'),
+    path('rounds/verify/', verify_rounds, name='verify-rounds'),
+    path('leaderboards/<str:board>/<str:window>/', get_leaderboard, name='leaderboard'),
+    path('leaderboards/<str:board>/<str:window>/me/', get_my_rank, name='leaderboard-me'),
 ]
@@ -1,16 +1,24 @@
 from rest_framework import status, viewsets
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.conf import settings
 from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
 from django.utils import timezone
 from decimal import Decimal
 from .models import Bet, Round, LedgerEntry, UserProfile
 from .serializers import (
-    BetSerializer, PlaceBetSerializer, CashoutSerializer,
+    BetSerializer, BetHistoryProjection, PlaceBetSerializer, CashoutSerializer,
     BalanceSerializer, LedgerEntrySerializer
 )
-from .services import RoundsEngine
+from .rooms import DEFAULT_ROOM, is_room
+from .services import RoundsEngine, RoundSimulator
+from payments import rates
+from .stats import record_bet_placed, record_bet_won
+from . import flight, history, leaderboards, verification
 
 
 class BetViewSet(viewsets.ModelViewSet):
@@ -22,7 +30,17 @@ class BetViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Return bets for the current user"""
-        return Bet.objects.filter(user=self.request.user).select_related('round')
+        return Bet.objects.filter(user=self.request.user).select_related('user', 'round')
+    
+    def list(self, request):
+        """
+        List bet history through the lean projection path
+        """
+        projection = BetHistoryProjection(request.user)
+        rows = BetHistoryProjection.rows(
+            Bet.objects.filter(user=request.user).order_by('-placed_at')
+        )
+        return Response(projection.serialize(rows))
     
     def create(self, request):
         """
@@ -34,6 +52,7 @@ class BetViewSet(viewsets.ModelViewSet):
         amount_tnd = serializer.validated_data['amount_tnd']
         auto_cashout = serializer.validated_data.get('auto_cashout_multiplier')
         idempotency_key = serializer.validated_data.get('idempotency_key')
+        room = serializer.validated_data['room']
         
         # Check for duplicate idempotency key
         if idempotency_key:
@@ -61,8 +80,11 @@ class BetViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                # Get current round
-                current_round = RoundsEngine.get_current_round()
+                # Get the room's current round and lock it: take-off (games/loop.py)
+                # waits for this bet, so it is activated with the round or refused
+                current_round = Round.objects.select_for_update().get(
+                    id=RoundsEngine.get_current_round(room).id
+                )
                 
                 # Can only bet during PRE_ROUND
                 if current_round.state != 'PRE_ROUND':
@@ -80,6 +102,7 @@ class BetViewSet(viewsets.ModelViewSet):
                 bet = Bet.objects.create(
                     user=request.user,
                     round=current_round,
+                    room=room,
                     amount_tnd=amount_tnd,
                     auto_cashout_multiplier=auto_cashout,
                     status='PENDING'
@@ -95,10 +118,13 @@ class BetViewSet(viewsets.ModelViewSet):
                     meta={
                         'bet_id': bet.id,
                         'round_id': current_round.id,
+                        'room': room,
                         'idempotency_key': idempotency_key
                     }
                 )
                 
+                record_bet_placed(request.user.id, amount_tnd)
+                
                 # TODO: Emit WebSocket event for balance update
                 
                 return Response(
@@ -115,13 +141,25 @@ class BetViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def cashout(self, request, pk=None):
         """
-        Cash out an active bet with atomic transaction
+        Cash out an active bet.
+        During a live flight the cashout is claimed in the flight view
+        (games/flight.py) and paid at the crash; otherwise it is applied
+        to the database with an atomic transaction.
         """
         serializer = CashoutSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         current_multiplier = serializer.validated_data['current_multiplier']
         
+        claim = flight.claim_cashout(pk, request.user.id, current_multiplier)
+        if claim is not None:
+            if 'error' in claim:
+                return Response(
+                    {'error': claim['error']},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response(flight.claim_payload(claim), status=status.HTTP_200_OK)
+        
         try:
             with transaction.atomic():
                 # Get bet with lock
@@ -143,12 +181,16 @@ class BetViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                # Validate multiplier
-                if current_multiplier > bet.round.crash_multiplier:
+                # Validate multiplier against the one the server reaches at this moment
+                reached = RoundSimulator.calculate_current_multiplier(
+                    bet.round.start_time or timezone.now(), bet.round.crash_multiplier
+                )
+                if current_multiplier > bet.round.crash_multiplier or reached >= bet.round.crash_multiplier:
                     return Response(
                         {'error': 'Invalid multiplier (round has crashed)'},
                         status=status.HTTP_400_BAD_REQUEST
                     )
+                current_multiplier = min(current_multiplier, reached)
                 
                 # Check if already cashed out (idempotency)
                 if bet.cashed_out_at:
@@ -191,6 +233,9 @@ class BetViewSet(viewsets.ModelViewSet):
                     }
                 )
                 
+                record_bet_won(request.user.id, win_amount, current_multiplier)
+                leaderboards.record_cashout(request.user.id, bet.amount_tnd, win_amount, current_multiplier)
+                
                 # TODO: Emit WebSocket event for balance update
                 
                 return Response(
@@ -222,7 +267,7 @@ def get_balance(request):
         balance_data = {
             'balance_tnd': profile.balance_tnd,
             'balance_minor_units': int(profile.balance_tnd * 100),
-            'crypto_equivalents': []  # TODO: Add crypto conversion rates
+            'crypto_equivalents': rates.crypto_equivalents(profile.balance_tnd)
         }
         
         serializer = BalanceSerializer(balance_data)
@@ -251,3 +296,188 @@ def get_ledger(request):
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+def _leaderboard_args(board, window):
+    """Return an error Response for an unknown board or window, else None"""
+    if board not in leaderboards.BOARDS:
+        return Response(
+            {'error': f"Unknown board. Available: {', '.join(leaderboards.BOARDS)}"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if window not in leaderboards.WINDOWS:
+        return Response(
+            {'error': f"Unknown window. Available: {', '.join(leaderboards.WINDOWS)}"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_leaderboard(request, board, window):
+    """
+    Get the top-N entries of a leaderboard
+    """
+    error = _leaderboard_args(board, window)
+    if error:
+        return error
+    
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), leaderboards.MAX_TOP_N)
+    except ValueError:
+        limit = 10
+    
+    return Response({
+        'board': board,
+        'window': window,
+        'period_start': leaderboards.period_start(window),
+        'entries': leaderboards.top(board, window, max(limit, 1)),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_my_rank(request, board, window):
+    """
+    Get the current user's rank on a leaderboard
+    """
+    error = _leaderboard_args(board, window)
+    if error:
+        return error
+    
+    return Response({
+        'board': board,
+        'window': window,
+        'period_start': leaderboards.period_start(window),
+        'entry': leaderboards.rank(request.user.id, board, window),
+    })
+
+
+def _cached_json(request, body, cache_control):
+    """Serve a pre-serialized body with a strong ETag, answering 304 on a match"""
+    etag = history.etag_for(body)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+@require_GET
+def get_round_history(request):
+    """
+    Get the latest crashed rounds, newest first
+    
+    Public and served from the buffer the round loop keeps serialized,
+    so it costs no query and no serialization per viewer.
+    """
+    room = request.GET.get('room', DEFAULT_ROOM)
+    if not is_room(room):
+        return JsonResponse({'error': f'Unknown room: {room}'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        limit = int(request.GET.get('limit', history.HISTORY_SIZE))
+    except ValueError:
+        limit = history.HISTORY_SIZE
+    limit = max(1, min(limit, history.HISTORY_SIZE))
+    
+    return _cached_json(
+        request,
+        history.get_history(limit, room),
+        f'public, max-age={settings.ROUND_HISTORY_MAX_AGE}'
+    )
+
+
+@require_GET
+def get_round_proof(request, round_id):
+    """
+    Get the provably-fair proof of a crashed round
+    
+    Crashed rounds never change, so proofs are cacheable forever.
+    """
+    body = history.get_proof(round_id)
+    if body is None:
+        response = JsonResponse(
+            {'error': 'Round not found or not crashed yet'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+        response['Cache-Control'] = 'no-store'
+        return response
+    
+    return _cached_json(request, body, 'public, max-age=31536000, immutable')
+
+
+def _parse_verification(data):
+    """Return ('rounds', dicts) or ('ids', round ids) from a verify request, or raise ValueError"""
+    if 'rounds' in data:
+        rounds = data['rounds']
+        if not isinstance(rounds, list):
+            raise ValueError('rounds must be a list')
+        for item in rounds:
+            if not isinstance(item, dict) or not all(
+                isinstance(item.get(field), str) for field in ('server_seed', 'server_seed_hash')
+            ):
+                raise ValueError('each round needs server_seed, server_seed_hash and crash_multiplier')
+            try:
+                multiplier = Decimal(str(item.get('crash_multiplier')))
+            except ArithmeticError:
+                multiplier = None
+            if multiplier is None or not multiplier.is_finite():
+                raise ValueError('crash_multiplier must be a number')
+            if not verification.MIN_MULTIPLIER <= multiplier <= verification.MAX_MULTIPLIER:
+                raise ValueError(
+                    f'crash_multiplier must be between {verification.MIN_MULTIPLIER} '
+                    f'and {verification.MAX_MULTIPLIER}'
+                )
+        return 'rounds', rounds
+    
+    if 'round_ids' in data:
+        round_ids = data['round_ids']
+        if not isinstance(round_ids, list):
+            raise ValueError('round_ids must be a list')
+        return 'ids', [int(round_id) for round_id in round_ids]
+    
+    if 'from_round' in data and 'to_round' in data:
+        start, end = int(data['from_round']), int(data['to_round'])
+        if end < start:
+            raise ValueError('to_round must not be before from_round')
+        if end - start + 1 > verification.MAX_BATCH:
+            raise ValueError(f'At most {verification.MAX_BATCH} rounds per request')
+        return 'ids', list(range(start, end + 1))
+    
+    raise ValueError('Provide round_ids, from_round and to_round, or rounds')
+
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def verify_rounds(request):
+    """
+    Verify up to MAX_BATCH rounds in one request
+    
+    Accepts round_ids, an inclusive from_round/to_round range, or
+    client-supplied rounds (server_seed, server_seed_hash,
+    crash_multiplier). Returns per-round results and a summary.
+    """
+    try:
+        kind, payload = _parse_verification(request.data)
+    except (ValueError, TypeError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(payload) > verification.MAX_BATCH:
+        return Response(
+            {'error': f'At most {verification.MAX_BATCH} rounds per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if kind == 'rounds':
+        results = verification.verify_supplied(payload)
+    else:
+        results = verification.verify_rounds(payload)
+    
+    return Response({
+        'results': results,
+        'summary': verification.summarize(results),
+    })
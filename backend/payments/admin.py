@@ -1,11 +1,13 @@
 from django.contrib import admin
-from .models import Deposit
+from .models import Deposit, PayoutRequest, WebhookInbox
+from . import payouts
 
 
 @admin.register(Deposit)
 class DepositAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'amount_tnd', 'pay_currency', 'status', 'created_at', 'completed_at']
     list_filter = ['status', 'pay_currency', 'created_at']
+    list_select_related = ['user']
     search_fields = ['user__username', 'invoice_id', 'order_id']
     readonly_fields = ['created_at', 'updated_at', 'invoice_id', 'order_id']
     
@@ -27,3 +29,49 @@ class DepositAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(WebhookInbox)
+class WebhookInboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'invoice_id', 'payment_status', 'received_at', 'processed_at', 'attempts']
+    list_filter = ['payment_status', 'received_at']
+    search_fields = ['invoice_id']
+    readonly_fields = ['invoice_id', 'payment_status', 'payload', 'received_at', 'processed_at', 'attempts', 'retry_after', 'last_error']
+
+
+@admin.register(PayoutRequest)
+class PayoutRequestAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'amount_tnd', 'method', 'currency', 'status', 'created_at', 'completed_at']
+    list_filter = ['status', 'method', 'currency', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['user__username', 'destination']
+    readonly_fields = ['user', 'amount_tnd', 'method', 'currency', 'destination', 'created_at', 'updated_at',
+                       'processed_at', 'completed_at', 'processed_by', 'meta']
+    actions = ['process_selected', 'complete_selected', 'reject_selected']
+    
+    @admin.action(description="Process selected pending payouts")
+    def process_selected(self, request, queryset):
+        ids = list(queryset.filter(status='pending').values_list('id', flat=True))
+        summary = payouts.process_payouts(batch_size=len(ids), processed_by=request.user, ids=ids)
+        self.message_user(
+            request,
+            "Claimed {claimed}: {completed} sent in {batches} provider batches, "
+            "{released} released after errors, {failed} failed and awaiting review, "
+            "{manual} awaiting manual transfer".format(**summary)
+        )
+    
+    @admin.action(description="Mark selected processing or failed payouts as completed")
+    def complete_selected(self, request, queryset):
+        count = payouts.mark_completed(list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f"Completed {count} payouts")
+    
+    @admin.action(description="Reject and refund selected payouts")
+    def reject_selected(self, request, queryset):
+        count = 0
+        for payout_id in queryset.filter(status__in=payouts.REFUNDABLE_STATUSES).values_list('id', flat=True):
+            try:
+                payouts.refund_payout(payout_id, reason='Rejected by admin', processed_by=request.user)
+                count += 1
+            except payouts.PayoutError:
+                pass
+        self.message_user(request, f"Rejected and refunded {count} payouts")
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from payments.payouts import process_payouts
+
+
+class Command(BaseCommand):
+    help = "Submit pending payout requests to the provider in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Payouts claimed per run")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep processing until interrupted")
+        parser.add_argument('--interval', type=float, default=30.0,
+                            help="Seconds between runs with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            summary = process_payouts(batch_size=options['batch_size'])
+            self.stdout.write(
+                "Claimed {claimed} payouts: {completed} sent in {batches} batches, "
+                "{released} released, {failed} failed, {manual} manual".format(**summary)
+            )
+            if not options['loop']:
+                return
+            if summary['claimed'] < options['batch_size']:
+                time.sleep(options['interval'])
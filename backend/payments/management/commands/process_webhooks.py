@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from payments.webhooks import drain_inbox
+
+
+class Command(BaseCommand):
+    help = "Apply queued NowPayments webhook events from the inbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep draining instead of exiting once the inbox is empty")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep when the inbox is drained")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+
+        while True:
+            claimed = drain_inbox(batch_size)
+            total += claimed
+            if claimed < batch_size:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(f"Processed {total} webhook events")
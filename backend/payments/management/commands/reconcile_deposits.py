@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from payments.reconciler import expire_overdue, reconcile_open_deposits
+
+
+class Command(BaseCommand):
+    help = "Poll open deposits for lost webhooks and expire overdue ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            default=getattr(settings, 'NOWPAYMENTS_MAX_CONCURRENCY', 20),
+                            help="Concurrent provider requests")
+        parser.add_argument('--rate', type=float, default=10.0,
+                            help="Max provider requests per second")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Open deposits loaded per page")
+        parser.add_argument('--expire-only', action='store_true',
+                            help="Skip polling and only expire overdue deposits")
+
+    def handle(self, *args, **options):
+        if options['expire_only']:
+            self.stdout.write(f"Expired {expire_overdue()} deposits")
+            return
+
+        summary = reconcile_open_deposits(
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(
+            "Polled {polled} open deposits: {updated} updated, {errors} errors, "
+            "{expired} expired".format(**summary)
+        )
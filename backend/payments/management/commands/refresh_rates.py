@@ -0,0 +1,28 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from payments.rates import refresh_rates
+
+
+class Command(BaseCommand):
+    help = "Refresh cached exchange rates and the provider currency list"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep refreshing on a schedule instead of running once")
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Seconds between refreshes (default: half of RATES_TTL)")
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'RATES_TTL', 60) / 2
+
+        while True:
+            started = time.monotonic()
+            rates = refresh_rates()
+            self.stdout.write(
+                f"Refreshed {len(rates)} rates: "
+                + ", ".join(f"{currency}={rate}" for currency, rate in rates.items())
+            )
+            if not options['loop']:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -3,6 +3,9 @@ from django.contrib.auth.models import User
 from decimal import Decimal
 
 
+OPEN_STATUSES = ['pending', 'waiting', 'confirming', 'confirmed']
+
+
 class Deposit(models.Model):
     """
     Represents a deposit transaction via NowPayments
@@ -57,6 +60,12 @@ class Deposit(models.Model):
             models.Index(fields=['invoice_id']),
             models.Index(fields=['order_id']),
             models.Index(fields=['status']),
+            # Open deposits along the id key the reconciler pages on
+            models.Index(
+                fields=['id'],
+                name='deposit_open_idx',
+                condition=models.Q(status__in=OPEN_STATUSES),
+            ),
         ]
     
     def __str__(self):
@@ -76,6 +85,35 @@ class Deposit(models.Model):
         return min(100, (self.current_confirmations / self.required_confirmations) * 100)
 
 
+class WebhookInbox(models.Model):
+    """
+    Append-only inbox of verified NowPayments IPN payloads
+
+    The webhook endpoint only inserts here and acknowledges; workers drain
+    unprocessed rows and apply them. Provider retries of the same
+    (invoice_id, payment_status) collapse onto one row.
+    """
+    invoice_id = models.CharField(max_length=255)
+    payment_status = models.CharField(max_length=32)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    retry_after = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['invoice_id', 'payment_status'], name='webhook_inbox_unique_event'),
+        ]
+        indexes = [
+            models.Index(fields=['id'], name='webhook_inbox_pending_idx', condition=models.Q(processed_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"Webhook {self.invoice_id} {self.payment_status}"
+
+
 class PayoutRequest(models.Model):
     """
     Represents a user's payout/withdrawal request
@@ -84,6 +122,7 @@ class PayoutRequest(models.Model):
         ('pending', 'Pending Review'),
         ('processing', 'Processing'),
         ('completed', 'Completed'),
+        ('failed', 'Failed - check with provider'),
         ('rejected', 'Rejected'),
         ('cancelled', 'Cancelled'),
     ]
@@ -100,6 +139,7 @@ class PayoutRequest(models.Model):
     
     # Method and destination
     method = models.CharField(max_length=20, choices=METHOD_CHOICES)
+    currency = models.CharField(max_length=10, blank=True)  # Payout coin for crypto, blank for bank
     destination = models.TextField()  # Crypto address or bank details
     
     # Status
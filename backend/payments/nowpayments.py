@@ -1,47 +1,179 @@
 import requests
 import hmac
 import hashlib
+import random
+import threading
+import time
+from datetime import datetime, timezone
 from decimal import Decimal
+from email.utils import parsedate_to_datetime
 from typing import Dict, Optional
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+def jittered_backoff(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff delay for a retry attempt"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds a 429/503 response's Retry-After header asks for, or None if absent or malformed"""
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class EndpointMetrics:
+    """
+    Per-endpoint call counters and latency totals for the NowPayments client
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+    
+    def observe(self, endpoint: str, elapsed: float, ok: bool, attempts: int):
+        with self._lock:
+            stats = self._data.setdefault(endpoint, {
+                'calls': 0, 'errors': 0, 'retries': 0,
+                'total_seconds': 0.0, 'max_seconds': 0.0,
+            })
+            stats['calls'] += 1
+            stats['retries'] += attempts - 1
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+            if not ok:
+                stats['errors'] += 1
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {endpoint: dict(stats) for endpoint, stats in self._data.items()}
 
 
 class NowPaymentsClient:
     """
     Client wrapper for NowPayments API
+    
+    All calls share one pooled keep-alive session. Idempotent (GET) calls are
+    retried on connection errors and 429/5xx responses with jittered
+    exponential backoff, or after the response's Retry-After when it sends
+    one. A Retry-After beyond RETRY_AFTER_MAX fails the call instead of
+    holding the worker. Responses that are retried are closed first, so
+    their connections go back to the pool.
     """
     
     BASE_URL = "https://api.nowpayments.io/v1"
     SANDBOX_URL = "https://api-sandbox.nowpayments.io/v1"
     
-    def __init__(self, api_key: str, use_sandbox: bool = False):
+    # (connect, read) timeouts per endpoint, in seconds
+    TIMEOUTS = {
+        'currencies': (3.05, 10),
+        'estimate': (3.05, 5),
+        'invoice': (3.05, 15),
+        'invoice_status': (3.05, 5),
+        'payout': (3.05, 30),
+    }
+    
+    MAX_RETRIES = 2
+    BACKOFF_BASE = 0.2  # seconds
+    BACKOFF_MAX = 2.0  # seconds
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    RETRY_AFTER_MAX = 5.0  # seconds
+    
+    POOL_MAXSIZE = 20
+    
+    def __init__(
+        self,
+        api_key: str,
+        use_sandbox: bool = False,
+        session: Optional[requests.Session] = None,
+        base_url: Optional[str] = None
+    ):
         self.api_key = api_key
-        self.base_url = self.SANDBOX_URL if use_sandbox else self.BASE_URL
+        self.base_url = base_url or (self.SANDBOX_URL if use_sandbox else self.BASE_URL)
         self.headers = {
             'x-api-key': api_key,
             'Content-Type': 'application/json'
         }
+        self.session = session or self._build_session()
+        self.metrics = EndpointMetrics()
     
-    def get_available_currencies(self) -> list:
+    def _build_session(self) -> requests.Session:
+        """Build a keep-alive session with a connection pool sized for worker threads"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.POOL_MAXSIZE, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def _backoff(self, attempt: int) -> float:
+        return jittered_backoff(attempt, self.BACKOFF_BASE, self.BACKOFF_MAX)
+    
+    def _request(self, endpoint: str, method: str, path: str, idempotent: bool, **kwargs) -> requests.Response:
+        """
+        Send a request on the pooled session, retrying idempotent calls,
+        and record its latency under ``endpoint``
+        """
+        attempts = 0
+        started = time.perf_counter()
+        ok = False
+        try:
+            while True:
+                attempts += 1
+                can_retry = idempotent and attempts <= self.MAX_RETRIES
+                try:
+                    response = self.session.request(
+                        method,
+                        f"{self.base_url}{path}",
+                        headers=self.headers,
+                        timeout=self.TIMEOUTS[endpoint],
+                        **kwargs
+                    )
+                except (requests.ConnectionError, requests.Timeout):
+                    if not can_retry:
+                        raise
+                    delay = self._backoff(attempts - 1)
+                else:
+                    delay = retry_after(response.headers)
+                    if (response.status_code not in self.RETRY_STATUSES or not can_retry
+                            or (delay is not None and delay > self.RETRY_AFTER_MAX)):
+                        response.raise_for_status()
+                        ok = True
+                        return response
+                    response.close()
+                    if delay is None:
+                        delay = self._backoff(attempts - 1)
+                time.sleep(delay)
+        finally:
+            self.metrics.observe(endpoint, time.perf_counter() - started, ok, attempts)
+    
+    def get_available_currencies(self, fallback: bool = True) -> list:
         """Get list of available cryptocurrencies"""
         try:
-            response = requests.get(
-                f"{self.base_url}/currencies",
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
+            response = self._request('currencies', 'GET', '/currencies', idempotent=True)
             return response.json().get('currencies', [])
         except Exception as e:
+            if not fallback:
+                raise
             print(f"Error fetching currencies: {e}")
             return ['btc', 'eth', 'usdt']  # Fallback
     
-    def get_estimate(self, amount: Decimal, currency_from: str, currency_to: str) -> Dict:
+    def get_estimate(self, amount: Decimal, currency_from: str, currency_to: str, fallback: bool = True) -> Dict:
         """
         Get estimated amount for conversion
         amount: Amount in currency_from
         currency_from: Source currency (e.g., 'usd')
         currency_to: Target cryptocurrency (e.g., 'btc')
+        fallback: Return a mock estimate instead of raising on errors
         """
         try:
             params = {
@@ -49,15 +181,11 @@ class NowPaymentsClient:
                 'currency_from': currency_from.lower(),
                 'currency_to': currency_to.lower()
             }
-            response = requests.get(
-                f"{self.base_url}/estimate",
-                params=params,
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
+            response = self._request('estimate', 'GET', '/estimate', idempotent=True, params=params)
             return response.json()
         except Exception as e:
+            if not fallback:
+                raise
             print(f"Error getting estimate: {e}")
             # Return mock estimate for development
             return {
@@ -77,6 +205,8 @@ class NowPaymentsClient:
     ) -> Dict:
         """
         Create a payment invoice
+        
+        Not retried: a timed-out POST may still have created the invoice.
         """
         try:
             payload = {
@@ -90,13 +220,7 @@ class NowPaymentsClient:
             if ipn_callback_url:
                 payload['ipn_callback_url'] = ipn_callback_url
             
-            response = requests.post(
-                f"{self.base_url}/invoice",
-                json=payload,
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
+            response = self._request('invoice', 'POST', '/invoice', idempotent=False, json=payload)
             return response.json()
         except Exception as e:
             print(f"Error creating invoice: {e}")
@@ -105,17 +229,30 @@ class NowPaymentsClient:
     def get_invoice_status(self, invoice_id: str) -> Dict:
         """Get invoice status"""
         try:
-            response = requests.get(
-                f"{self.base_url}/invoice/{invoice_id}",
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
+            response = self._request('invoice_status', 'GET', f"/invoice/{invoice_id}", idempotent=True)
             return response.json()
         except Exception as e:
             print(f"Error getting invoice status: {e}")
             raise
     
+    def create_payout(self, withdrawals: list, ipn_callback_url: Optional[str] = None) -> Dict:
+        """
+        Submit a batch of withdrawals in a single mass-payout call
+        
+        ``withdrawals`` is a list of ``{'address', 'currency', 'amount'}``
+        dicts. Not retried: a timed-out POST may still have queued the batch.
+        """
+        try:
+            payload = {'withdrawals': withdrawals}
+            if ipn_callback_url:
+                payload['ipn_callback_url'] = ipn_callback_url
+            
+            response = self._request('payout', 'POST', '/payout', idempotent=False, json=payload)
+            return response.json()
+        except Exception as e:
+            print(f"Error creating payout: {e}")
+            raise
+    
     @staticmethod
     def verify_webhook_signature(payload: bytes, signature: str, secret: str) -> bool:
         """
@@ -133,8 +270,32 @@ class NowPaymentsClient:
             return False
 
 
-def get_nowpayments_client() -> NowPaymentsClient:
-    """Get configured NowPayments client"""
+def get_client_config():
+    """Return (api_key, base_url) for the configured NowPayments environment"""
     api_key = getattr(settings, 'NOWPAYMENTS_API_KEY', '')
     use_sandbox = getattr(settings, 'NOWPAYMENTS_SANDBOX', True)
-    return NowPaymentsClient(api_key, use_sandbox)
+    base_url = getattr(settings, 'NOWPAYMENTS_BASE_URL', '') or (
+        NowPaymentsClient.SANDBOX_URL if use_sandbox else NowPaymentsClient.BASE_URL
+    )
+    return api_key, base_url
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_nowpayments_client() -> NowPaymentsClient:
+    """
+    Get the shared, process-wide NowPayments client.
+    Rebuilt only if the configured API key or base URL changes.
+    """
+    global _client
+    api_key, base_url = get_client_config()
+    
+    client = _client
+    if client is None or client.api_key != api_key or client.base_url != base_url:
+        with _client_lock:
+            client = _client
+            if client is None or client.api_key != api_key or client.base_url != base_url:
+                client = _client = NowPaymentsClient(api_key, base_url=base_url)
+    return client
@@ -0,0 +1,169 @@
+import asyncio
+import time
+import weakref
+from decimal import Decimal
+from typing import Dict, Optional
+import httpx
+from django.conf import settings
+from .nowpayments import EndpointMetrics, NowPaymentsClient, get_client_config, jittered_backoff, retry_after
+
+
+class ProviderBusy(Exception):
+    """Raised when no provider call slot frees up within the queue timeout"""
+
+
+class AsyncNowPaymentsClient:
+    """
+    asyncio-native client for the NowPayments API
+    
+    Mirrors NowPaymentsClient's endpoints, timeouts and retry policy on a
+    pooled httpx.AsyncClient. A semaphore caps concurrent provider calls so
+    a slow provider queues deposit requests instead of piling up sockets.
+    """
+    
+    TIMEOUTS = NowPaymentsClient.TIMEOUTS
+    MAX_RETRIES = NowPaymentsClient.MAX_RETRIES
+    RETRY_STATUSES = NowPaymentsClient.RETRY_STATUSES
+    BACKOFF_BASE = NowPaymentsClient.BACKOFF_BASE
+    BACKOFF_MAX = NowPaymentsClient.BACKOFF_MAX
+    RETRY_AFTER_MAX = NowPaymentsClient.RETRY_AFTER_MAX
+    
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        max_concurrency: int = 20,
+        queue_timeout: float = 2.0,
+        http: Optional[httpx.AsyncClient] = None
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.headers = {
+            'x-api-key': api_key,
+            'Content-Type': 'application/json'
+        }
+        self.http = http or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.metrics = EndpointMetrics()
+    
+    async def _request(self, endpoint: str, method: str, path: str, idempotent: bool, **kwargs) -> httpx.Response:
+        """
+        Send a request within the concurrency limit, retrying idempotent
+        calls, and record its latency under ``endpoint``
+        """
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ProviderBusy(f"No NowPayments slot free for {endpoint}")
+        
+        connect, read = self.TIMEOUTS[endpoint]
+        timeout = httpx.Timeout(read, connect=connect)
+        attempts = 0
+        started = time.perf_counter()
+        ok = False
+        try:
+            while True:
+                attempts += 1
+                can_retry = idempotent and attempts <= self.MAX_RETRIES
+                try:
+                    response = await self.http.request(
+                        method,
+                        f"{self.base_url}{path}",
+                        headers=self.headers,
+                        timeout=timeout,
+                        **kwargs
+                    )
+                except httpx.TransportError:
+                    if not can_retry:
+                        raise
+                    delay = None
+                else:
+                    delay = retry_after(response.headers)
+                    if (response.status_code not in self.RETRY_STATUSES or not can_retry
+                            or (delay is not None and delay > self.RETRY_AFTER_MAX)):
+                        response.raise_for_status()
+                        ok = True
+                        return response
+                    await response.aclose()
+                if delay is None:
+                    delay = jittered_backoff(attempts - 1, self.BACKOFF_BASE, self.BACKOFF_MAX)
+                await asyncio.sleep(delay)
+        finally:
+            self.slots.release()
+            self.metrics.observe(endpoint, time.perf_counter() - started, ok, attempts)
+    
+    async def get_available_currencies(self) -> list:
+        """Get list of available cryptocurrencies"""
+        response = await self._request('currencies', 'GET', '/currencies', idempotent=True)
+        return response.json().get('currencies', [])
+    
+    async def get_estimate(self, amount: Decimal, currency_from: str, currency_to: str) -> Dict:
+        """Get estimated amount for conversion"""
+        params = {
+            'amount': float(amount),
+            'currency_from': currency_from.lower(),
+            'currency_to': currency_to.lower()
+        }
+        response = await self._request('estimate', 'GET', '/estimate', idempotent=True, params=params)
+        return response.json()
+    
+    async def create_invoice(
+        self,
+        price_amount: Decimal,
+        price_currency: str,
+        pay_currency: str,
+        order_id: str,
+        order_description: str = "",
+        ipn_callback_url: Optional[str] = None
+    ) -> Dict:
+        """Create a payment invoice (never retried)"""
+        payload = {
+            'price_amount': float(price_amount),
+            'price_currency': price_currency.upper(),
+            'pay_currency': pay_currency.lower(),
+            'order_id': order_id,
+            'order_description': order_description or f"Deposit {price_amount} {price_currency}",
+        }
+        
+        if ipn_callback_url:
+            payload['ipn_callback_url'] = ipn_callback_url
+        
+        response = await self._request('invoice', 'POST', '/invoice', idempotent=False, json=payload)
+        return response.json()
+    
+    async def get_invoice_status(self, invoice_id: str) -> Dict:
+        """Get invoice status"""
+        response = await self._request('invoice_status', 'GET', f"/invoice/{invoice_id}", idempotent=True)
+        return response.json()
+    
+    async def aclose(self):
+        await self.http.aclose()
+
+
+# One client per event loop: httpx pools and asyncio primitives are loop-bound
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_nowpayments_client() -> AsyncNowPaymentsClient:
+    """
+    Get the NowPayments async client for the running event loop
+    
+    The web server runs config.asgi under uvicorn workers, one event loop
+    per worker process, so every request a worker serves shares this
+    client's connection pool and concurrency limit.
+    """
+    loop = asyncio.get_running_loop()
+    api_key, base_url = get_client_config()
+    
+    client = _clients.get(loop)
+    if client is None or client.api_key != api_key or client.base_url != base_url:
+        client = _clients[loop] = AsyncNowPaymentsClient(
+            api_key,
+            base_url,
+            max_concurrency=getattr(settings, 'NOWPAYMENTS_MAX_CONCURRENCY', 20),
+            queue_timeout=getattr(settings, 'NOWPAYMENTS_QUEUE_TIMEOUT', 2.0),
+        )
+    return client
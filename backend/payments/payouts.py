@@ -0,0 +1,237 @@
+"""
+Payout processing.
+
+A payout request debits the balance and writes its WITHDRAWAL ledger entry
+in the same transaction, so the money is reserved the moment the request
+exists and the profile row is locked only for that short debit. Processing
+never touches balances again: ``process_payouts`` claims pending requests
+with SKIP LOCKED (so several workers or an admin action can run at once),
+groups them by method and currency, submits each crypto group to the
+provider in one mass-payout call and bulk-updates the statuses. Bank
+transfers are claimed into 'processing' and completed by hand.
+
+A group goes back to 'pending' only when it fails before anything is sent
+(no cached rate). Once the mass-payout POST has been attempted, an error
+(a timeout or reset included) may still have queued the payout, so the
+group is marked 'failed' for an operator to check with the provider and
+then complete or reject it. It is never retried or refunded on its own.
+
+Rejecting or cancelling a payout refunds it with a REFUND ledger entry.
+Only 'pending' and 'failed' payouts can be refunded: a 'processing' one
+may be on its way to the user.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, JSONField, Value, When
+from django.utils import timezone
+from games.models import UserProfile, LedgerEntry
+from .models import PayoutRequest
+from .nowpayments import get_nowpayments_client
+from . import rates
+
+MIN_PAYOUT = Decimal('10.00')
+
+# Requests that still hold reserved funds and are known not to have been paid
+REFUNDABLE_STATUSES = ['pending', 'failed']
+
+
+class PayoutError(Exception):
+    """A payout request that cannot be accepted or changed"""
+
+
+def request_payout(user_id, amount_tnd, method, destination, currency='', user_note=''):
+    """
+    Reserve ``amount_tnd`` from the user's balance and create a pending
+    payout request. Raises PayoutError on insufficient balance.
+    """
+    with transaction.atomic():
+        profile, _ = UserProfile.objects.select_for_update().get_or_create(user_id=user_id)
+        if profile.balance_tnd < amount_tnd:
+            raise PayoutError('Insufficient balance')
+
+        balance_before = profile.balance_tnd
+        profile.balance_tnd -= amount_tnd
+        profile.save()
+
+        payout = PayoutRequest.objects.create(
+            user_id=user_id,
+            amount_tnd=amount_tnd,
+            method=method,
+            currency=currency,
+            destination=destination,
+            user_note=user_note,
+        )
+
+        LedgerEntry.objects.create(
+            user_id=user_id,
+            type='WITHDRAWAL',
+            amount_tnd=-amount_tnd,
+            balance_before=balance_before,
+            balance_after=profile.balance_tnd,
+            meta={
+                'payout_id': payout.id,
+                'method': method,
+                'currency': currency,
+            }
+        )
+        return payout
+
+
+def refund_payout(payout_id, reason='', status='rejected', processed_by=None, user_id=None):
+    """
+    Move a payout that still holds funds to ``status`` ('rejected' or
+    'cancelled') and credit the amount back. Pass ``user_id`` to only allow
+    the owner's pending requests, as for user cancellations.
+    """
+    with transaction.atomic():
+        payouts = PayoutRequest.objects.select_for_update()
+        if user_id is not None:
+            payouts = payouts.filter(user_id=user_id, status='pending')
+        payout = payouts.get(id=payout_id)
+        if payout.status not in REFUNDABLE_STATUSES:
+            raise PayoutError(f'Payout is already {payout.status}')
+
+        profile = UserProfile.objects.select_for_update().get(user_id=payout.user_id)
+        balance_before = profile.balance_tnd
+        profile.balance_tnd += payout.amount_tnd
+        profile.save()
+
+        LedgerEntry.objects.create(
+            user_id=payout.user_id,
+            type='REFUND',
+            amount_tnd=payout.amount_tnd,
+            balance_before=balance_before,
+            balance_after=profile.balance_tnd,
+            meta={'payout_id': payout.id, 'reason': reason or status}
+        )
+
+        payout.status = status
+        payout.rejection_reason = reason
+        payout.processed_by = processed_by or payout.processed_by
+        payout.processed_at = payout.processed_at or timezone.now()
+        payout.save()
+        return payout
+
+
+def claim_pending(batch_size=100, processed_by=None, ids=None):
+    """
+    Atomically move up to ``batch_size`` pending payouts (optionally only
+    ``ids``) to 'processing' and return them. Rows locked by another
+    worker are skipped rather than waited on.
+    """
+    with transaction.atomic():
+        pending = PayoutRequest.objects.select_for_update(skip_locked=True).filter(status='pending')
+        if ids is not None:
+            pending = pending.filter(id__in=ids)
+        claimed = list(pending.order_by('created_at', 'id').values_list('id', flat=True)[:batch_size])
+        if claimed:
+            now = timezone.now()
+            PayoutRequest.objects.filter(id__in=claimed).update(
+                status='processing', processed_at=now, processed_by=processed_by, updated_at=now
+            )
+    return list(PayoutRequest.objects.filter(id__in=claimed).order_by('created_at', 'id'))
+
+
+def _withdrawal(payout):
+    estimate = rates.estimate(payout.amount_tnd, payout.currency)
+    if estimate is None:
+        raise PayoutError(f'No rate cached for {payout.currency}')
+    return {
+        'address': payout.destination,
+        'currency': payout.currency,
+        'amount': float(estimate['estimated_amount']),
+    }
+
+
+def submit_crypto_batch(client, currency, payouts):
+    """
+    Send one mass-payout call for ``payouts`` and mark them completed with
+    the provider's batch and withdrawal ids. A group that fails before the
+    call is released back to 'pending' for the next run; one whose call
+    fails is marked 'failed' for review.
+    Returns the outcome: 'completed', 'released' or 'failed'.
+    """
+    ids = [p.id for p in payouts]
+    try:
+        withdrawals = [_withdrawal(p) for p in payouts]
+    except PayoutError as e:
+        print(f"Error preparing {currency} payout batch: {e}")
+        PayoutRequest.objects.filter(id__in=ids, status='processing').update(
+            status='pending', processed_at=None, processed_by=None, updated_at=timezone.now()
+        )
+        return 'released'
+
+    try:
+        result = client.create_payout(withdrawals)
+    except Exception as e:
+        print(f"Error submitting {currency} payout batch: {e}")
+        PayoutRequest.objects.filter(id__in=ids, status='processing').update(
+            status='failed',
+            meta=Case(*[
+                When(id=p.id, then=Value({**p.meta, 'provider_error': str(e)}, output_field=JSONField()))
+                for p in payouts
+            ]),
+            updated_at=timezone.now(),
+        )
+        return 'failed'
+
+    now = timezone.now()
+    sent = result.get('withdrawals') or []
+    meta = {
+        p.id: {
+            **p.meta,
+            'provider_batch_id': result.get('id'),
+            'provider_withdrawal_id': sent[i].get('id') if i < len(sent) else None,
+        }
+        for i, p in enumerate(payouts)
+    }
+    # Conditional on 'processing', so nothing changed since the claim is overwritten
+    updated = PayoutRequest.objects.filter(id__in=ids, status='processing').update(
+        status='completed',
+        completed_at=now,
+        meta=Case(*[When(id=pk, then=Value(value, output_field=JSONField())) for pk, value in meta.items()]),
+        updated_at=now,
+    )
+    if updated != len(payouts):
+        print(f"{len(payouts) - updated} {currency} payouts left 'processing' before completion")
+    return 'completed'
+
+
+def process_payouts(batch_size=100, processed_by=None, ids=None, client=None):
+    """
+    Claim pending payouts and submit them grouped by method and currency.
+    Returns a summary dict of counts.
+    """
+    summary = {'claimed': 0, 'completed': 0, 'released': 0, 'failed': 0, 'manual': 0, 'batches': 0}
+    payouts = claim_pending(batch_size, processed_by=processed_by, ids=ids)
+    summary['claimed'] = len(payouts)
+    if not payouts:
+        return summary
+
+    groups = defaultdict(list)
+    for payout in payouts:
+        groups[(payout.method, payout.currency)].append(payout)
+
+    for (method, currency), group in groups.items():
+        if method != 'crypto':
+            # Bank transfers are paid by operations and completed from the admin
+            summary['manual'] += len(group)
+            continue
+
+        client = client or get_nowpayments_client()
+        summary['batches'] += 1
+        summary[submit_crypto_batch(client, currency, group)] += len(group)
+
+    return summary
+
+
+def mark_completed(ids):
+    """
+    Complete claimed manual payouts, or failed ones the provider confirms
+    were paid, in one UPDATE. Returns the number changed.
+    """
+    now = timezone.now()
+    return PayoutRequest.objects.filter(id__in=ids, status__in=['processing', 'failed']).update(
+        status='completed', completed_at=now, updated_at=now
+    )
@@ -0,0 +1,150 @@
+"""
+Cached exchange-rate service.
+
+Rates (crypto units per 1 USD, with USD standing in for TND as elsewhere in
+the deposit flow) and the provider's currency list are kept in the shared
+Django cache. Entries carry their fetch time and follow a
+stale-while-revalidate policy:
+
+* younger than RATES_TTL: served as-is,
+* younger than RATES_STALE_TTL: served, and a single background refresh
+  is started,
+* older or missing: treated as absent.
+
+``refresh_rates`` (also run on a schedule by the ``refresh_rates``
+management command) is the only code path that calls the provider.
+"""
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.core.cache import cache
+from .nowpayments import get_nowpayments_client
+
+SUPPORTED_CURRENCIES = ['btc', 'eth', 'usdt', 'ltc', 'trx']
+
+BASE_CURRENCY = 'usd'
+
+# Quote a round amount and divide, so small per-unit rates keep their precision
+REFERENCE_AMOUNT = Decimal('1000')
+
+RATE_KEY = 'rates:{currency}'
+CURRENCIES_KEY = 'rates:currencies'
+REFRESH_LOCK_KEY = 'rates:refreshing'
+
+
+def _ttl():
+    return getattr(settings, 'RATES_TTL', 60)
+
+
+def _stale_ttl():
+    return getattr(settings, 'RATES_STALE_TTL', 900)
+
+
+def refresh_rates(currencies: Optional[List[str]] = None) -> Dict[str, Decimal]:
+    """
+    Fetch rates and the currency list from the provider and store them.
+    Currencies that fail to refresh keep their previous cache entry.
+    """
+    client = get_nowpayments_client()
+    now = time.time()
+    refreshed = {}
+
+    for currency in currencies or SUPPORTED_CURRENCIES:
+        try:
+            estimate = client.get_estimate(REFERENCE_AMOUNT, BASE_CURRENCY, currency, fallback=False)
+            rate = Decimal(str(estimate['estimated_amount'])) / REFERENCE_AMOUNT
+        except Exception as e:
+            print(f"Error refreshing {currency} rate: {e}")
+            continue
+        cache.set(RATE_KEY.format(currency=currency), {'rate': rate, 'fetched_at': now}, _stale_ttl())
+        refreshed[currency] = rate
+
+    try:
+        available = client.get_available_currencies(fallback=False)
+        cache.set(CURRENCIES_KEY, {'currencies': available, 'fetched_at': now}, _stale_ttl())
+    except Exception as e:
+        print(f"Error refreshing currency list: {e}")
+
+    return refreshed
+
+
+def _revalidate_in_background():
+    """Start one background refresh across all processes sharing the cache"""
+    if not cache.add(REFRESH_LOCK_KEY, True, _ttl()):
+        return
+
+    def run():
+        try:
+            refresh_rates()
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+
+    threading.Thread(target=run, name='rates-revalidate', daemon=True).start()
+
+
+def _usable(entry) -> bool:
+    """Apply the stale-while-revalidate policy to a cache entry"""
+    if entry is None:
+        return False
+    age = time.time() - entry['fetched_at']
+    if age > _stale_ttl():
+        return False
+    if age > _ttl():
+        _revalidate_in_background()
+    return True
+
+
+def _read(key):
+    entry = cache.get(key)
+    return entry if _usable(entry) else None
+
+
+def get_rates(currencies: Optional[List[str]] = None) -> Dict[str, Decimal]:
+    """Return cached rates; never calls the provider inline"""
+    currencies = currencies or SUPPORTED_CURRENCIES
+    entries = cache.get_many([RATE_KEY.format(currency=c) for c in currencies])
+    rates = {}
+    for currency in currencies:
+        entry = entries.get(RATE_KEY.format(currency=currency))
+        if _usable(entry):
+            rates[currency] = entry['rate']
+    return rates
+
+
+def get_rate(currency: str) -> Optional[Decimal]:
+    entry = _read(RATE_KEY.format(currency=currency))
+    return entry['rate'] if entry else None
+
+
+def get_available_currencies() -> Optional[list]:
+    entry = _read(CURRENCIES_KEY)
+    return entry['currencies'] if entry else None
+
+
+def estimate(amount: Decimal, currency: str) -> Optional[Dict]:
+    """
+    Build a NowPayments-style estimate from the cached rate, or None if
+    no usable rate is cached
+    """
+    rate = get_rate(currency)
+    if rate is None:
+        return None
+    return {
+        'currency_from': BASE_CURRENCY,
+        'currency_to': currency,
+        'estimated_amount': (amount * rate).quantize(Decimal('0.00000001')),
+    }
+
+
+def crypto_equivalents(balance_tnd: Decimal) -> List[Dict]:
+    """Balance expressed in each currency with a cached rate"""
+    return [
+        {
+            'currency': currency,
+            'rate': str(rate),
+            'amount': str((balance_tnd * rate).quantize(Decimal('0.00000001'))),
+        }
+        for currency, rate in get_rates().items()
+    ]
@@ -0,0 +1,119 @@
+"""
+Deposit status reconciliation.
+
+Catches deposits whose webhook never arrived: open deposits are polled with
+``get_invoice_status`` under a concurrency cap and a request-rate limit,
+and each result goes through the same idempotent
+``apply_payment_status`` path as the webhook inbox. Deposits still waiting
+for payment after their expiry are then expired in one UPDATE.
+"""
+import asyncio
+import time
+from django.utils import timezone
+from .models import Deposit, OPEN_STATUSES
+from .nowpayments_async import AsyncNowPaymentsClient
+from .nowpayments import get_client_config
+from .webhooks import apply_payment_status
+
+# Only deposits with no payment seen yet can expire; confirming funds are still in flight
+EXPIRABLE_STATUSES = ['pending', 'waiting']
+
+
+class RateLimiter:
+    """Spaces out acquisitions to at most ``rate`` per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def fetch_statuses(client, invoice_ids, rate):
+    """
+    Poll invoice statuses concurrently (bounded by the client's semaphore)
+    and rate limited. Returns {invoice_id: result or Exception}.
+    """
+    limiter = RateLimiter(rate)
+
+    async def fetch(invoice_id):
+        await limiter.wait()
+        try:
+            return invoice_id, await client.get_invoice_status(invoice_id)
+        except Exception as e:
+            return invoice_id, e
+
+    return dict(await asyncio.gather(*(fetch(invoice_id) for invoice_id in invoice_ids)))
+
+
+def expire_overdue(now=None):
+    """Expire every unpaid deposit past its expiry in a single UPDATE"""
+    now = now or timezone.now()
+    return Deposit.objects.filter(
+        status__in=EXPIRABLE_STATUSES,
+        expires_at__lt=now,
+    ).update(status='expired', updated_at=now)
+
+
+def open_invoice_ids(after_id=0, limit=500):
+    """Next page of (id, invoice_id) for open deposits, walking deposit_open_idx (open rows by id)"""
+    return list(
+        Deposit.objects.filter(status__in=OPEN_STATUSES, id__gt=after_id)
+        .exclude(invoice_id='')
+        .order_by('id')
+        .values_list('id', 'invoice_id')[:limit]
+    )
+
+
+def reconcile_open_deposits(concurrency=20, rate=10.0, batch_size=500, client_factory=None):
+    """
+    Poll every open deposit and apply the provider's status.
+    Returns a summary dict of counts.
+    """
+    api_key, base_url = get_client_config()
+    client_factory = client_factory or (
+        lambda: AsyncNowPaymentsClient(api_key, base_url, max_concurrency=concurrency, queue_timeout=None)
+    )
+    summary = {'polled': 0, 'updated': 0, 'errors': 0, 'expired': 0}
+
+    async def poll(invoice_ids):
+        client = client_factory()
+        try:
+            return await fetch_statuses(client, invoice_ids, rate)
+        finally:
+            await client.aclose()
+
+    after_id = 0
+    while True:
+        page = open_invoice_ids(after_id, batch_size)
+        if not page:
+            break
+        after_id = page[-1][0]
+
+        results = asyncio.run(poll([invoice_id for _, invoice_id in page]))
+        for invoice_id, result in results.items():
+            summary['polled'] += 1
+            if isinstance(result, Exception):
+                summary['errors'] += 1
+                continue
+            payment_status = str(result.get('payment_status') or result.get('status') or '').lower()
+            try:
+                if apply_payment_status(
+                    invoice_id,
+                    payment_status,
+                    confirmations=result.get('confirmations'),
+                    source='reconciler',
+                ):
+                    summary['updated'] += 1
+            except Exception:
+                summary['errors'] += 1
+
+    summary['expired'] = expire_overdue()
+    return summary
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Deposit, PayoutRequest
 from games.models import LedgerEntry
+from .rates import SUPPORTED_CURRENCIES
+from .payouts import MIN_PAYOUT
 
 
 class CreateDepositSerializer(serializers.Serializer):
@@ -16,7 +18,6 @@ class CreateDepositSerializer(serializers.Serializer):
     
     def validate_pay_currency(self, value):
         """Validate cryptocurrency"""
-        SUPPORTED_CURRENCIES = ['btc', 'eth', 'usdt', 'ltc', 'trx']
         if value.lower() not in SUPPORTED_CURRENCIES:
             raise serializers.ValidationError(f"Unsupported currency. Supported: {', '.join(SUPPORTED_CURRENCIES)}")
         return value.lower()
@@ -36,3 +37,35 @@ class DepositSerializer(serializers.ModelSerializer):
             'completed_at', 'is_expired'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class CreatePayoutSerializer(serializers.Serializer):
+    amount_tnd = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=MIN_PAYOUT)
+    method = serializers.ChoiceField(choices=PayoutRequest.METHOD_CHOICES)
+    currency = serializers.CharField(max_length=10, required=False, allow_blank=True, default='')
+    destination = serializers.CharField()
+    user_note = serializers.CharField(required=False, allow_blank=True, default='')
+    
+    def validate(self, data):
+        """Crypto payouts need a supported currency, bank payouts none"""
+        if data['method'] == 'crypto':
+            currency = data['currency'].lower()
+            if currency not in SUPPORTED_CURRENCIES:
+                raise serializers.ValidationError(
+                    {'currency': f"Unsupported currency. Supported: {', '.join(SUPPORTED_CURRENCIES)}"}
+                )
+            data['currency'] = currency
+        else:
+            data['currency'] = ''
+        return data
+
+
+class PayoutRequestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PayoutRequest
+        fields = [
+            'id', 'amount_tnd', 'method', 'currency', 'destination', 'status',
+            'user_note', 'rejection_reason', 'created_at', 'processed_at',
+            'completed_at'
+        ]
+        read_only_fields = fields
@@ -1,9 +1,15 @@
 from django.urls import path
-from .views import create_deposit, get_deposit, deposit_webhook, list_deposits
+from .views import (
+    create_deposit, create_deposit_async, get_deposit, deposit_webhook, list_deposits,
+    payouts, cancel_payout,
+)
 
 urlpatterns = [
     path('create/', create_deposit, name='create-deposit'),
+    path('create-async/', create_deposit_async, name='create-deposit-async'),
     path('webhook/', deposit_webhook, name='deposit-webhook'),
     path('list/', list_deposits, name='list-deposits'),
+    path('payouts/', payouts, name='payouts'),
+    path('payouts/<int:payout_id>/cancel/', cancel_payout, name='cancel-payout'),
     path('<int:deposit_id>/', get_deposit, name='get-deposit'),
 ]
@@ -2,16 +2,25 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.exceptions import AuthenticationFailed
+from core.authentication import ClaimsJWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from asgiref.sync import sync_to_async
 from django.db import transaction
+from django.http import JsonResponse
 from django.utils import timezone
 from django.conf import settings
 from decimal import Decimal
 import uuid
 import json
-from .models import Deposit
-from .serializers import CreateDepositSerializer, DepositSerializer
+from .models import Deposit, PayoutRequest
+from .serializers import (
+    CreateDepositSerializer, DepositSerializer, CreatePayoutSerializer, PayoutRequestSerializer
+)
 from .nowpayments import get_nowpayments_client, NowPaymentsClient
-from games.models import UserProfile, LedgerEntry
+from .nowpayments_async import ProviderBusy, get_async_nowpayments_client
+from . import rates, webhooks
+from . import payouts as payout_engine
 
 
 @api_view(['POST'])
@@ -31,51 +40,26 @@ def create_deposit(request):
         client = get_nowpayments_client()
         
         # Generate unique order ID
-        order_id = f"deposit_{request.user.id}_{uuid.uuid4().hex[:8]}"
+        order_id = _new_order_id(request.user)
         
-        # Get estimate for conversion
-        estimate = client.get_estimate(
+        # Get estimate for conversion, from the rate cache when possible
+        estimate = rates.estimate(amount_tnd, pay_currency) or client.get_estimate(
             amount=amount_tnd,
             currency_from='usd',  # Using USD as proxy for TND
             currency_to=pay_currency
         )
         
-        pay_amount = Decimal(str(estimate.get('estimated_amount', 0)))
-        
         # Create invoice with NowPayments
-        webhook_url = f"{settings.FRONTEND_URL}/api/deposits/webhook/"
-        
         invoice = client.create_invoice(
             price_amount=amount_tnd,
             price_currency='USD',  # NowPayments uses USD
             pay_currency=pay_currency,
             order_id=order_id,
             order_description=f"Aviator deposit for {request.user.username}",
-            ipn_callback_url=webhook_url
+            ipn_callback_url=_webhook_url()
         )
         
-        # Calculate expiry (typically 1 hour)
-        expires_at = timezone.now() + timezone.timedelta(hours=1)
-        
-        # Create deposit record
-        with transaction.atomic():
-            deposit = Deposit.objects.create(
-                user=request.user,
-                invoice_id=invoice.get('id', ''),
-                order_id=order_id,
-                pay_address=invoice.get('pay_address', ''),
-                pay_amount=pay_amount,
-                pay_currency=pay_currency,
-                amount_tnd=amount_tnd,
-                rate_used=pay_amount / amount_tnd if amount_tnd > 0 else Decimal('0'),
-                status='waiting',
-                required_confirmations=invoice.get('required_confirmations', 1),
-                expires_at=expires_at,
-                meta={
-                    'invoice_url': invoice.get('invoice_url', ''),
-                    'network': invoice.get('network', ''),
-                }
-            )
+        deposit = _record_deposit(request.user, amount_tnd, pay_currency, order_id, estimate, invoice)
         
         return Response(
             DepositSerializer(deposit).data,
@@ -89,6 +73,139 @@ def create_deposit(request):
         )
 
 
+def _new_order_id(user):
+    """Generate unique order ID"""
+    return f"deposit_{user.id}_{uuid.uuid4().hex[:8]}"
+
+
+def _webhook_url():
+    return f"{settings.FRONTEND_URL}/api/deposits/webhook/"
+
+
+def _record_deposit(user, amount_tnd, pay_currency, order_id, estimate, invoice):
+    """
+    Persist the deposit for a freshly created invoice
+    """
+    pay_amount = Decimal(str(estimate.get('estimated_amount', 0)))
+    
+    # Calculate expiry (typically 1 hour)
+    expires_at = timezone.now() + timezone.timedelta(hours=1)
+    
+    # Create deposit record
+    with transaction.atomic():
+        return Deposit.objects.create(
+            user=user,
+            invoice_id=invoice.get('id', ''),
+            order_id=order_id,
+            pay_address=invoice.get('pay_address', ''),
+            pay_amount=pay_amount,
+            pay_currency=pay_currency,
+            amount_tnd=amount_tnd,
+            rate_used=pay_amount / amount_tnd if amount_tnd > 0 else Decimal('0'),
+            status='waiting',
+            required_confirmations=invoice.get('required_confirmations', 1),
+            expires_at=expires_at,
+            meta={
+                'invoice_url': invoice.get('invoice_url', ''),
+                'network': invoice.get('network', ''),
+            }
+        )
+
+
+_jwt_authentication = ClaimsJWTAuthentication()
+
+
+async def _authenticate(request):
+    """
+    Resolve the JWT bearer user for a plain (non-DRF) async view, or None
+    """
+    header = _jwt_authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = _jwt_authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+    try:
+        token = _jwt_authentication.get_validated_token(raw_token)
+        return await sync_to_async(_jwt_authentication.get_user)(token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def create_deposit_async(request):
+    """
+    Create a new deposit invoice without tying up a worker
+    
+    Served by the ASGI stack: provider calls are awaited on the event loop
+    and capped by NOWPAYMENTS_MAX_CONCURRENCY, so a slow provider queues
+    deposits instead of starving bet and balance traffic. DRF 3.13 views
+    are sync-only, so auth and validation are done by hand here.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = CreateDepositSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    amount_tnd = serializer.validated_data['amount_tnd']
+    pay_currency = serializer.validated_data['pay_currency']
+    order_id = _new_order_id(user)
+    
+    try:
+        client = get_async_nowpayments_client()
+        
+        estimate = await sync_to_async(rates.estimate)(amount_tnd, pay_currency)
+        if estimate is None:
+            estimate = await client.get_estimate(
+                amount=amount_tnd,
+                currency_from='usd',  # Using USD as proxy for TND
+                currency_to=pay_currency
+            )
+        
+        invoice = await client.create_invoice(
+            price_amount=amount_tnd,
+            price_currency='USD',  # NowPayments uses USD
+            pay_currency=pay_currency,
+            order_id=order_id,
+            order_description=f"Aviator deposit for {user.username}",
+            ipn_callback_url=_webhook_url()
+        )
+        
+        deposit = await sync_to_async(_record_deposit)(user, amount_tnd, pay_currency, order_id, estimate, invoice)
+        
+        return JsonResponse(DepositSerializer(deposit).data, status=status.HTTP_201_CREATED)
+        
+    except ProviderBusy:
+        response = JsonResponse(
+            {'error': 'Payment provider is busy, please retry shortly'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        response['Retry-After'] = '2'
+        return response
+    except Exception as e:
+        return JsonResponse(
+            {'error': f'Failed to create deposit: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Plain async view: mark CSRF-exempt directly, csrf_exempt() would wrap it in a sync function
+create_deposit_async.csrf_exempt = True
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_deposit(request, deposit_id):
@@ -110,6 +227,9 @@ def get_deposit(request, deposit_id):
 def deposit_webhook(request):
     """
     Handle NowPayments webhook
+    
+    Only verifies and records the event; payments.webhooks.drain_inbox
+    applies it.
     """
     try:
         # Get signature from headers
@@ -134,75 +254,13 @@ def deposit_webhook(request):
         # Parse webhook data
         data = json.loads(payload.decode('utf-8'))
         
-        invoice_id = data.get('invoice_id')
-        payment_status = data.get('payment_status', '').lower()
-        order_id = data.get('order_id')
-        
-        if not invoice_id:
+        # Store for the inbox workers and acknowledge right away
+        if not webhooks.enqueue(data):
             return Response(
                 {'error': 'Missing invoice_id'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get deposit
-        try:
-            deposit = Deposit.objects.select_for_update().get(invoice_id=invoice_id)
-        except Deposit.DoesNotExist:
-            return Response(
-                {'error': 'Deposit not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Map NowPayments status to our status
-        status_mapping = {
-            'waiting': 'waiting',
-            'confirming': 'confirming',
-            'confirmed': 'confirmed',
-            'sending': 'confirmed',
-            'finished': 'completed',
-            'failed': 'failed',
-            'refunded': 'failed',
-            'expired': 'expired',
-        }
-        
-        new_status = status_mapping.get(payment_status, deposit.status)
-        
-        with transaction.atomic():
-            # Update deposit status
-            deposit.status = new_status
-            deposit.current_confirmations = data.get('confirmations', 0)
-            
-            # If completed, credit user balance
-            if new_status == 'completed' and deposit.status != 'completed':
-                deposit.completed_at = timezone.now()
-                
-                # Get user profile
-                profile = UserProfile.objects.select_for_update().get(user=deposit.user)
-                balance_before = profile.balance_tnd
-                
-                # Credit balance
-                profile.balance_tnd += deposit.amount_tnd
-                profile.save()
-                
-                # Create ledger entry
-                LedgerEntry.objects.create(
-                    user=deposit.user,
-                    type='DEPOSIT',
-                    amount_tnd=deposit.amount_tnd,
-                    balance_before=balance_before,
-                    balance_after=profile.balance_tnd,
-                    meta={
-                        'deposit_id': deposit.id,
-                        'invoice_id': invoice_id,
-                        'pay_currency': deposit.pay_currency,
-                        'pay_amount': float(deposit.pay_amount),
-                    }
-                )
-                
-                # TODO: Emit WebSocket event for balance update
-            
-            deposit.save()
-        
         return Response({'status': 'ok'}, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -221,3 +279,43 @@ def list_deposits(request):
     """
     deposits = Deposit.objects.filter(user=request.user).order_by('-created_at')[:20]
     return Response(DepositSerializer(deposits, many=True).data)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def payouts(request):
+    """
+    List user's payout requests, or request a new payout
+    """
+    if request.method == 'GET':
+        payout_requests = PayoutRequest.objects.filter(user=request.user).order_by('-created_at')[:20]
+        return Response(PayoutRequestSerializer(payout_requests, many=True).data)
+    
+    serializer = CreatePayoutSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    try:
+        payout = payout_engine.request_payout(request.user.id, **serializer.validated_data)
+    except payout_engine.PayoutError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(PayoutRequestSerializer(payout).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cancel_payout(request, payout_id):
+    """
+    Cancel a pending payout request and refund it
+    """
+    try:
+        payout = payout_engine.refund_payout(
+            payout_id, status='cancelled', user_id=request.user.id
+        )
+    except PayoutRequest.DoesNotExist:
+        return Response(
+            {'error': 'Pending payout not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response(PayoutRequestSerializer(payout).data)
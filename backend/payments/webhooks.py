@@ -0,0 +1,168 @@
+"""
+NowPayments IPN processing.
+
+The webhook endpoint stores verified payloads in WebhookInbox and returns
+immediately. ``drain_inbox`` (run by the ``process_webhooks`` command)
+claims unprocessed rows with SKIP LOCKED so several workers can drain in
+parallel, and applies each one through ``apply_payment_status``, the single
+idempotent path that moves a deposit forward and credits it exactly once.
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from games.models import UserProfile, LedgerEntry
+from .models import Deposit, WebhookInbox
+
+# Map NowPayments status to our status
+STATUS_MAPPING = {
+    'waiting': 'waiting',
+    'confirming': 'confirming',
+    'confirmed': 'confirmed',
+    'sending': 'confirmed',
+    'finished': 'completed',
+    'failed': 'failed',
+    'refunded': 'failed',
+    'expired': 'expired',
+}
+
+# Order of non-terminal states; a deposit never moves backwards
+PROGRESS = {'pending': 0, 'waiting': 1, 'confirming': 2, 'confirmed': 3}
+
+TERMINAL_STATUSES = {'completed', 'failed', 'expired'}
+
+
+def _next_status(current, new):
+    """Return the status to move to, or None if the update is stale"""
+    if new is None or new == current or current == 'completed':
+        return None
+    # Funds that arrive after expiry or failure are still credited
+    if new == 'completed':
+        return new
+    if current in TERMINAL_STATUSES:
+        return None
+    if new in TERMINAL_STATUSES or PROGRESS[new] > PROGRESS[current]:
+        return new
+    return None
+
+
+def apply_payment_status(invoice_id, payment_status, confirmations=None, source='webhook'):
+    """
+    Apply a provider payment status to a deposit. Idempotent: repeated or
+    out-of-order statuses are ignored and the balance is credited only on
+    the transition into 'completed'.
+
+    Returns the new deposit status, or None if nothing changed.
+    Raises Deposit.DoesNotExist for unknown invoices.
+    """
+    with transaction.atomic():
+        deposit = Deposit.objects.select_for_update().get(invoice_id=str(invoice_id))
+
+        new_status = _next_status(deposit.status, STATUS_MAPPING.get(payment_status))
+        if confirmations is not None:
+            deposit.current_confirmations = max(deposit.current_confirmations, int(confirmations))
+
+        if new_status is None:
+            deposit.save(update_fields=['current_confirmations', 'updated_at'])
+            return None
+
+        # If completed, credit user balance
+        if new_status == 'completed':
+            deposit.completed_at = timezone.now()
+
+            profile = UserProfile.objects.select_for_update().get(user_id=deposit.user_id)
+            balance_before = profile.balance_tnd
+
+            profile.balance_tnd += deposit.amount_tnd
+            profile.save()
+
+            LedgerEntry.objects.create(
+                user_id=deposit.user_id,
+                type='DEPOSIT',
+                amount_tnd=deposit.amount_tnd,
+                balance_before=balance_before,
+                balance_after=profile.balance_tnd,
+                meta={
+                    'deposit_id': deposit.id,
+                    'invoice_id': deposit.invoice_id,
+                    'pay_currency': deposit.pay_currency,
+                    'pay_amount': float(deposit.pay_amount),
+                    'source': source,
+                }
+            )
+
+            # TODO: Emit WebSocket event for balance update
+
+        deposit.status = new_status
+        deposit.save()
+        return new_status
+
+
+def enqueue(payload):
+    """
+    Store a verified webhook payload. Returns False if the payload has no
+    invoice_id. Duplicate deliveries are silently absorbed.
+    """
+    invoice_id = payload.get('invoice_id')
+    if not invoice_id:
+        return False
+
+    WebhookInbox.objects.bulk_create([
+        WebhookInbox(
+            invoice_id=str(invoice_id),
+            payment_status=str(payload.get('payment_status', '')).lower(),
+            payload=payload,
+        )
+    ], ignore_conflicts=True)
+    return True
+
+
+MAX_ATTEMPTS = 10
+
+# Failed events wait RETRY_BASE_DELAY * 2**(attempts - 1), e.g. while the
+# deposit row for a just-created invoice is still being committed
+RETRY_BASE_DELAY = timedelta(seconds=1)
+RETRY_MAX_DELAY = timedelta(minutes=10)
+
+
+def drain_inbox(batch_size=100):
+    """
+    Claim and apply up to ``batch_size`` unprocessed webhook events.
+    Returns the number of rows claimed.
+
+    Each event is claimed, applied and marked in its own transaction, so
+    its row lock and the deposit and balance locks it takes are released
+    as soon as it is done, and a crash part-way through a batch keeps the
+    events already applied.
+    """
+    now = timezone.now()
+    claimed = 0
+    while claimed < batch_size:
+        with transaction.atomic():
+            event = (
+                WebhookInbox.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+                .filter(Q(retry_after__isnull=True) | Q(retry_after__lte=now))
+                .order_by('id').first()
+            )
+            if event is None:
+                break
+
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    apply_payment_status(
+                        event.invoice_id,
+                        event.payment_status,
+                        confirmations=event.payload.get('confirmations'),
+                    )
+            except Exception as e:
+                event.last_error = 'Deposit not found' if isinstance(e, Deposit.DoesNotExist) else str(e)
+                event.retry_after = now + min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (event.attempts - 1))
+            else:
+                event.processed_at = timezone.now()
+                event.last_error = ''
+            event.save(update_fields=['attempts', 'processed_at', 'retry_after', 'last_error'])
+        claimed += 1
+
+    return claimed
@@ -0,0 +1,77 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core.changelists import EstimatedCountPaginator, estimated_count
+from games.models import Bet, LedgerEntry
+from games.services import RoundsEngine
+
+
+@pytest.mark.django_db
+class TestLargeTableChangelists(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.client = Client()
+        self.client.force_login(admin)
+
+        self.round = RoundsEngine.get_current_round()
+        self.users = [User.objects.create_user(username=f'player{i}', password='testpass123') for i in range(3)]
+        self.bets = [
+            Bet.objects.create(user=user, round=self.round, amount_tnd=Decimal('10.00'), status='ACTIVE')
+            for user in self.users
+        ]
+        self.old = Bet.objects.create(user=self.users[0], round=self.round, amount_tnd=Decimal('5.00'))
+        Bet.objects.filter(id=self.old.id).update(placed_at=timezone.now() - timedelta(days=30))
+
+    def _ids(self, response):
+        assert response.status_code == 200
+        return {bet.id for bet in response.context['cl'].result_list}
+
+    def test_changelist_defaults_to_recent_rows(self):
+        """Test the bounded default range and the explicit "Any date" choice"""
+        response = self.client.get('/admin/games/bet/')
+
+        assert self._ids(response) == {bet.id for bet in self.bets}
+        assert response.context['cl'].full_result_count is None
+        assert '?placed_at__gte=1970-01-01' in response.content.decode()
+
+        any_date = self.client.get('/admin/games/bet/', {'placed_at__gte': '1970-01-01 00:00:00+00:00'})
+        assert self.old.id in self._ids(any_date)
+
+    def test_search_uses_exact_usernames_and_ids(self):
+        """Test username, bet id and round id searches, which also lift the date bound"""
+        assert self._ids(self.client.get('/admin/games/bet/', {'q': 'player0'})) == {self.bets[0].id, self.old.id}
+        assert self._ids(self.client.get('/admin/games/bet/', {'q': 'player'})) == set()
+        assert self._ids(self.client.get('/admin/games/bet/', {'q': str(self.old.id)})) >= {self.old.id}
+        assert len(self._ids(self.client.get('/admin/games/bet/', {'q': str(self.round.id)}))) == 4
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Test that users and rounds are joined, not fetched per row"""
+        def changelist_queries(path):
+            with CaptureQueriesContext(connection) as queries:
+                assert self.client.get(path).status_code == 200
+            return len(queries)
+
+        bets = changelist_queries('/admin/games/bet/')
+        ledger = changelist_queries('/admin/games/ledgerentry/')
+        for user in self.users:
+            round_obj = RoundsEngine.create_round('vip')
+            RoundsEngine.crash_round(round_obj)
+            Bet.objects.create(user=user, round=round_obj, amount_tnd=Decimal('1.00'))
+            LedgerEntry.objects.create(user=user, type='DEPOSIT', amount_tnd=Decimal('1.00'),
+                                       balance_before=Decimal('0.00'), balance_after=Decimal('1.00'))
+
+        assert changelist_queries('/admin/games/bet/') == bets
+        assert changelist_queries('/admin/games/ledgerentry/') == ledger
+
+    def test_estimated_count_is_exact_on_small_results(self):
+        """Test the count used for paging"""
+        queryset = Bet.objects.filter(round=self.round)
+
+        assert estimated_count(queryset) == 4
+        assert EstimatedCountPaginator(queryset.order_by('-id'), 2).num_pages == 2
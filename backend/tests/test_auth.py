@@ -0,0 +1,258 @@
+import pytest
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.testing import HttpCommunicator
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+from config.asgi import application
+from core.auth import HasherBusy
+from core.authentication import ClaimsJWTAuthentication, revocations, revoke_token, revoke_user, tokens_for
+from core.ws_auth import JWTAuthMiddleware
+from games.models import Bet, Round, UserProfile
+from games.services import RoundsEngine
+
+
+@pytest.mark.django_db
+class TestAsyncAuth(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        UserProfile.objects.create(user=self.user, balance_tnd=Decimal('250.00'))
+
+    def test_register_inserts_once(self):
+        """Test that registration hashes once and never updates the new user"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/auth/register/', {
+                'username': 'newplayer',
+                'email': 'new@example.com',
+                'password': 'Sup3r-secret-pw',
+                'password2': 'Sup3r-secret-pw',
+            }, content_type='application/json')
+
+        assert response.status_code == 201
+        assert response.json()['tokens']['access']
+        statements = [q['sql'].split()[0].upper() for q in queries.captured_queries]
+        assert 'UPDATE' not in statements
+        assert statements.count('INSERT') == 3
+
+        user = User.objects.select_related('profile').get(username='newplayer')
+        assert user.check_password('Sup3r-secret-pw')
+        assert user.profile.balance_tnd == Decimal('5000.00')
+
+    def test_register_validation_errors(self):
+        """Test that serializer errors are returned as before"""
+        response = self.client.post('/api/auth/register/', {
+            'username': 'other',
+            'email': 'test@example.com',
+            'password': 'Sup3r-secret-pw',
+            'password2': 'different-pw',
+        }, content_type='application/json')
+
+        assert response.status_code == 400
+        assert 'password' in response.json()
+
+    def test_login_uses_one_query(self):
+        """Test that login loads user and profile together"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/auth/login/', {
+                'username': 'testuser', 'password': 'testpass123'
+            }, content_type='application/json')
+
+        assert response.status_code == 200
+        assert response.json()['user']['balance_tnd'] == 250.0
+        assert len(queries.captured_queries) == 1
+
+    def test_login_rejects_bad_credentials(self):
+        """Test wrong passwords and unknown users"""
+        for username, password in (('testuser', 'wrong'), ('nobody', 'testpass123')):
+            response = self.client.post('/api/auth/login/', {
+                'username': username, 'password': password
+            }, content_type='application/json')
+            assert response.status_code == 401
+
+    def test_login_upgrades_outdated_hash(self):
+        """Test that an outdated hash is replaced after a successful login"""
+        with self.settings(PASSWORD_HASHERS=[
+            'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+            'django.contrib.auth.hashers.MD5PasswordHasher',
+        ]):
+            old = make_password('testpass123', hasher='md5')
+            User.objects.filter(pk=self.user.pk).update(password=old)
+            response = self.client.post('/api/auth/login/', {
+                'username': 'testuser', 'password': 'testpass123'
+            }, content_type='application/json')
+
+        assert response.status_code == 200
+        user = User.objects.get(pk=self.user.pk)
+        assert user.password.startswith('pbkdf2_sha256$')
+
+    def test_login_sheds_load_when_pool_is_full(self):
+        """Test that a full hashing pool returns 503 with Retry-After"""
+        with mock.patch('core.views.verify_password', side_effect=HasherBusy):
+            response = self.client.post('/api/auth/login/', {
+                'username': 'testuser', 'password': 'testpass123'
+            }, content_type='application/json')
+
+        assert response.status_code == 503
+        assert response['Retry-After'] == '1'
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsgiEntrypoint(TransactionTestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        UserProfile.objects.create(user=self.user, balance_tnd=Decimal('250.00'))
+
+    def test_login_is_served_by_the_asgi_entrypoint(self):
+        """Test that the deployed ASGI application routes login to the async view"""
+        communicator = HttpCommunicator(
+            application, 'POST', '/api/auth/login/',
+            body=b'{"username": "testuser", "password": "testpass123"}',
+            headers=[(b'host', b'testserver'), (b'content-type', b'application/json')],
+        )
+        response = async_to_sync(communicator.get_response)()
+
+        assert response['status'] == 200
+        assert b'access' in response['body']
+
+
+@pytest.mark.django_db
+class TestClaimsAuthentication(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        revocations.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = UserProfile.objects.create(user=self.user, balance_tnd=Decimal('75.00'))
+        self.tokens = tokens_for(self.user)
+
+    def _get(self, path, token):
+        return Client(HTTP_AUTHORIZATION=f'Bearer {token}').get(path)
+
+    def test_claims_user_skips_user_query(self):
+        """Test that the balance endpoint only queries the profile"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get('/api/games/balance/', self.tokens['access'])
+
+        assert response.status_code == 200
+        assert response.json()['balance_tnd'] == '75.00'
+        assert not any('auth_user' in q['sql'] for q in queries.captured_queries)
+
+    def test_tokens_without_claims_fall_back_to_db(self):
+        """Test that tokens issued before the claims existed still work"""
+        response = self._get('/api/games/balance/', str(AccessToken.for_user(self.user)))
+        assert response.status_code == 200
+
+        # A token from before the email claim loads the row rather than returning a blank email
+        token = AccessToken.for_user(self.user)
+        token['username'] = self.user.username
+        user = ClaimsJWTAuthentication().get_user(token)
+        assert not getattr(user, 'from_claims', False)
+
+    def test_claims_user_carries_email(self):
+        """Test that payloads built from request.user get the real email without a query"""
+        self.user.email = 'test@example.com'
+        self.user.save()
+        access = tokens_for(self.user)['access']
+        RoundsEngine.crash_round(RoundsEngine.get_current_round())
+        Bet.objects.create(user=self.user, round=Round.objects.get(), amount_tnd=Decimal('5.00'), status='LOST')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get('/api/games/bets/', access)
+
+        assert response.status_code == 200
+        assert response.json()[0]['user']['email'] == 'test@example.com'
+        assert not any('auth_user' in q['sql'] for q in queries.captured_queries)
+
+    def test_revoke_user(self):
+        """Test that revoking a user rejects their tokens and refreshes"""
+        revoke_user(self.user.id)
+
+        assert self._get('/api/games/balance/', self.tokens['access']).status_code == 401
+        response = Client().post('/api/auth/refresh/', {'refresh': self.tokens['refresh']},
+                                 content_type='application/json')
+        assert response.status_code == 401
+
+    def test_token_issued_after_revocation_in_same_second(self):
+        """Test that a revocation only rejects tokens issued before it, even within one second"""
+        with mock.patch('core.authentication.time.time', return_value=2000000000.25):
+            before = tokens_for(self.user)
+        with mock.patch('core.authentication.time.time', return_value=2000000000.5):
+            revoke_user(self.user.id)
+        with mock.patch('core.authentication.time.time', return_value=2000000000.75):
+            after = tokens_for(self.user)
+
+        assert self._get('/api/games/balance/', before['access']).status_code == 401
+        assert self._get('/api/games/balance/', after['access']).status_code == 200
+        response = Client().post('/api/auth/refresh/', {'refresh': after['refresh']},
+                                 content_type='application/json')
+        assert response.status_code == 200
+
+    def test_revoke_single_token(self):
+        """Test that revoking one token leaves the others valid"""
+        other = tokens_for(self.user)
+        revoke_token(AccessToken(self.tokens['access']))
+
+        assert self._get('/api/games/balance/', self.tokens['access']).status_code == 401
+        assert self._get('/api/games/balance/', other['access']).status_code == 200
+
+    def test_deactivation_revokes(self):
+        """Test that saving an inactive user revokes outstanding tokens"""
+        self.user.is_active = False
+        self.user.save()
+
+        assert self._get('/api/games/balance/', self.tokens['access']).status_code == 401
+
+
+@pytest.mark.django_db
+class TestWebSocketAuth(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        revocations.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.access = tokens_for(self.user)['access']
+
+    def _connect(self, subprotocols=(), query_string=b''):
+        scopes = []
+
+        async def inner(scope, receive, send):
+            scopes.append(scope)
+
+        scope = {'type': 'websocket', 'path': '/ws/rounds/', 'subprotocols': list(subprotocols),
+                 'query_string': query_string}
+        async_to_sync(JWTAuthMiddleware(inner))(scope, None, None)
+        return scopes[0]
+
+    def test_subprotocol_token(self):
+        """Test a JWT sent as the bearer subprotocol, without queries"""
+        with CaptureQueriesContext(connection) as queries:
+            scope = self._connect(subprotocols=['bearer', self.access])
+
+        assert scope['user'].is_authenticated
+        assert scope['user'].id == self.user.id
+        assert scope['auth_subprotocol'] == 'bearer'
+        assert len(queries.captured_queries) == 0
+
+    def test_query_param_token(self):
+        """Test a JWT sent as the token query parameter"""
+        scope = self._connect(query_string=f'token={self.access}'.encode())
+
+        assert scope['user'].username == 'testuser'
+        assert scope['auth_subprotocol'] is None
+
+    def test_invalid_or_revoked_token_is_anonymous(self):
+        """Test that bad tokens connect as AnonymousUser"""
+        assert not self._connect(query_string=b'token=garbage')['user'].is_authenticated
+        assert not self._connect()['user'].is_authenticated
+
+        revoke_user(self.user.id)
+        assert not self._connect(subprotocols=['bearer', self.access])['user'].is_authenticated
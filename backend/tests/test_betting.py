@@ -1,9 +1,13 @@
 import pytest
 from decimal import Decimal
+from unittest import mock
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, Client
+from core.authentication import tokens_for
 from games.models import Bet, Round, UserProfile, LedgerEntry
+from games.serializers import BetHistoryProjection, BetSerializer
 from games.services import RoundsEngine
+from games.tasks import activate_round_bets
 
 
 @pytest.mark.django_db
@@ -118,3 +122,44 @@ class TestBettingLogic(TestCase):
         
         assert bet.status == 'CASHED_OUT'
         assert bet.cashed_out_multiplier == auto_cashout
+
+    def test_bet_history_projection_matches_serializer(self):
+        """Test that the lean history path renders the same payload as BetSerializer"""
+        Bet.objects.create(
+            user=self.user,
+            round=self.round,
+            amount_tnd=Decimal('100.00'),
+            status='PENDING'
+        )
+        Bet.objects.create(
+            user=self.user,
+            round=self.round,
+            amount_tnd=Decimal('50.00'),
+            auto_cashout_multiplier=Decimal('2.00'),
+            cashed_out_multiplier=Decimal('2.00'),
+            win_amount_tnd=Decimal('100.00'),
+            status='CASHED_OUT'
+        )
+        
+        queryset = Bet.objects.filter(user=self.user).order_by('-placed_at')
+        expected = BetSerializer(queryset.select_related('user', 'round'), many=True).data
+        
+        projection = BetHistoryProjection(self.user)
+        actual = projection.serialize(BetHistoryProjection.rows(queryset))
+        
+        assert actual == [dict(row) for row in expected]
+    
+    def test_bet_racing_take_off_is_refused(self):
+        """Test that a bet that read the round before take-off re-checks it under the round lock"""
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {tokens_for(self.user)['access']}")
+        stale = Round.objects.get(id=self.round.id)
+        RoundsEngine.start_round(self.round)
+        activate_round_bets(self.round.id)
+        
+        with mock.patch('games.views.RoundsEngine.get_current_round', return_value=stale):
+            response = client.post('/api/games/bets/', {'amount_tnd': '100.00'}, content_type='application/json')
+        
+        assert response.status_code == 400
+        self.profile.refresh_from_db()
+        assert self.profile.balance_tnd == Decimal('1000.00')
+        assert not Bet.objects.filter(status='PENDING').exists()
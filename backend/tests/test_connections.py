@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import pytest
+from django.conf import settings
+from django.db import connections
+from django.test import TestCase, Client
+from core.db import db_sync_to_async, keep_connections_open, pool_stats
+
+
+@pytest.mark.django_db
+class TestConnectionPool(TestCase):
+    def test_web_connections_close_and_are_health_checked(self):
+        """Test that the web process closes connections after each request and checks them"""
+        database = settings.DATABASES['default']
+        assert database['CONN_MAX_AGE'] == 0
+        assert database['CONN_HEALTH_CHECKS'] is True
+        assert 'DISABLE_SERVER_SIDE_CURSORS' in database
+
+    def test_workers_keep_connections_open(self):
+        """Test that long-running processes opt into persistent connections"""
+        database = connections['default'].settings_dict
+        try:
+            keep_connections_open()
+            assert database['CONN_MAX_AGE'] == settings.DB_WORKER_CONN_MAX_AGE > 0
+        finally:
+            database['CONN_MAX_AGE'] = 0
+
+    def test_calls_run_on_db_pool_and_are_counted(self):
+        """Test active and queued counts while every pool thread is blocked"""
+        size = pool_stats()['size']
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def block():
+            started.release()
+            release.wait(5)
+            return threading.current_thread().name
+
+        async def run():
+            calls = [asyncio.ensure_future(db_sync_to_async(block)()) for _ in range(size + 2)]
+            for _ in range(size):
+                await asyncio.get_running_loop().run_in_executor(None, started.acquire)
+            during = pool_stats()
+            release.set()
+            return during, await asyncio.gather(*calls)
+
+        during, names = asyncio.run(run())
+
+        assert during['active'] == size
+        assert during['queued'] == 2
+        assert all(name.startswith('db') for name in names)
+        assert (pool_stats()['active'], pool_stats()['queued']) == (0, 0)
+
+    def test_health_does_not_expose_pool(self):
+        """Test that the unauthenticated health check only reports liveness"""
+        response = Client().get('/api/health/')
+
+        assert response.status_code == 200
+        assert response.json() == {'status': 'ok'}
@@ -1,12 +1,24 @@
+import asyncio
 import pytest
 import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import hmac
 import hashlib
 from decimal import Decimal
+from unittest import mock
+import requests
 from django.contrib.auth.models import User
-from django.test import TestCase, Client
-from payments.models import Deposit
-from payments.nowpayments import NowPaymentsClient
+from django.test import TestCase, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from payments.models import Deposit, WebhookInbox
+from payments.webhooks import apply_payment_status, drain_inbox
+from payments.reconciler import expire_overdue, reconcile_open_deposits
+from django.utils import timezone
+from benchmarks.nowpayments_standin import NowPaymentsStandIn, StandInConfig
+from payments.nowpayments import NowPaymentsClient, get_nowpayments_client
+from payments.nowpayments_async import AsyncNowPaymentsClient, ProviderBusy
 from games.models import UserProfile, LedgerEntry
 
 
@@ -160,3 +172,389 @@ class TestDepositWebhook(TestCase):
         # Balance should not change
         self.profile.refresh_from_db()
         assert self.profile.balance_tnd == initial_balance
+
+
+def _response(status_code, body=None, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body or {}).encode()
+    response.headers.update(headers or {})
+    response.raw = mock.Mock()
+    return response
+
+
+class TestNowPaymentsTransport(TestCase):
+    def setUp(self):
+        """Set up a client on a stubbed session"""
+        self.session = mock.Mock(spec=requests.Session)
+        self.client = NowPaymentsClient('test_key', use_sandbox=True, session=self.session)
+        self.client.BACKOFF_BASE = 0
+    
+    def test_idempotent_calls_are_retried(self):
+        """Test that GETs are retried on 5xx and connection errors"""
+        self.session.request.side_effect = [
+            requests.ConnectionError('reset'),
+            _response(503),
+            _response(200, {'invoice_id': 'abc', 'payment_status': 'waiting'}),
+        ]
+        
+        result = self.client.get_invoice_status('abc')
+        
+        assert result['payment_status'] == 'waiting'
+        assert self.session.request.call_count == 3
+        metrics = self.client.metrics.snapshot()['invoice_status']
+        assert metrics['calls'] == 1
+        assert metrics['retries'] == 2
+        assert metrics['errors'] == 0
+    
+    def test_invoice_creation_is_not_retried(self):
+        """Test that a failed POST is surfaced without a retry"""
+        self.session.request.return_value = _response(503)
+        
+        with self.assertRaises(requests.HTTPError):
+            self.client.create_invoice(Decimal('10.00'), 'USD', 'btc', 'order_1')
+        
+        assert self.session.request.call_count == 1
+        assert self.client.metrics.snapshot()['invoice']['errors'] == 1
+    
+    def test_retries_are_bounded(self):
+        """Test that retries stop after MAX_RETRIES"""
+        self.session.request.return_value = _response(502)
+        
+        with self.assertRaises(requests.HTTPError):
+            self.client.get_invoice_status('abc')
+        
+        assert self.session.request.call_count == NowPaymentsClient.MAX_RETRIES + 1
+    
+    def test_retry_after_is_honoured(self):
+        """Test that a 429's Retry-After sets the wait and the throttled response is closed"""
+        throttled = _response(429, headers={'Retry-After': '1'})
+        self.session.request.side_effect = [throttled, _response(200, {'payment_status': 'waiting'})]
+        
+        with mock.patch('payments.nowpayments.time.sleep') as sleep:
+            result = self.client.get_invoice_status('abc')
+        
+        assert result['payment_status'] == 'waiting'
+        sleep.assert_called_once_with(1.0)
+        throttled.raw.close.assert_called_once()
+    
+    def test_long_retry_after_is_not_waited_for(self):
+        """Test that a Retry-After beyond RETRY_AFTER_MAX fails the call at once"""
+        self.session.request.return_value = _response(
+            429, headers={'Retry-After': str(int(NowPaymentsClient.RETRY_AFTER_MAX) + 60)}
+        )
+        
+        with mock.patch('payments.nowpayments.time.sleep') as sleep:
+            with self.assertRaises(requests.HTTPError):
+                self.client.get_invoice_status('abc')
+        
+        assert self.session.request.call_count == 1
+        sleep.assert_not_called()
+    
+    @override_settings(NOWPAYMENTS_API_KEY='shared_key', NOWPAYMENTS_SANDBOX=True)
+    def test_client_is_shared(self):
+        """Test that the process-wide client is reused"""
+        assert get_nowpayments_client() is get_nowpayments_client()
+        
+        with override_settings(NOWPAYMENTS_API_KEY='rotated_key'):
+            assert get_nowpayments_client().api_key == 'rotated_key'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Minimal local stand-in for the NowPayments endpoints"""
+    
+    delay = 0.0
+    failures_before_success = 0
+    calls = []
+    
+    def log_message(self, *args):
+        pass
+    
+    def _reply(self, status_code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def do_GET(self):
+        StandInHandler.calls.append(self.path)
+        time.sleep(StandInHandler.delay)
+        if StandInHandler.failures_before_success > 0:
+            StandInHandler.failures_before_success -= 1
+            return self._reply(503, {'message': 'unavailable'})
+        if self.path.startswith('/estimate'):
+            return self._reply(200, {'estimated_amount': 0.002})
+        return self._reply(200, {'invoice_id': self.path.rsplit('/', 1)[-1], 'payment_status': 'waiting'})
+    
+    def do_POST(self):
+        StandInHandler.calls.append(self.path)
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self._reply(200, {
+            'id': f"inv_{body['order_id']}",
+            'pay_address': 'standin_address',
+            'invoice_url': 'http://standin/invoice',
+        })
+
+
+class TestAsyncDeposits(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+    
+    def setUp(self):
+        """Reset the stand-in server"""
+        StandInHandler.delay = 0.0
+        StandInHandler.failures_before_success = 0
+        StandInHandler.calls = []
+        self.user = User.objects.create_user(username='asyncuser', password='testpass123')
+    
+    def test_async_client_retries_idempotent_calls(self):
+        """Test that the async client retries GETs against the stand-in"""
+        StandInHandler.failures_before_success = 1
+        
+        async def run():
+            client = AsyncNowPaymentsClient('key', self.base_url)
+            client.BACKOFF_BASE = 0
+            try:
+                return await client.get_invoice_status('abc'), client.metrics.snapshot()
+            finally:
+                await client.aclose()
+        
+        result, metrics = asyncio.run(run())
+        assert result['invoice_id'] == 'abc'
+        assert metrics['invoice_status']['retries'] == 1
+    
+    def test_async_client_limits_concurrency(self):
+        """Test that callers beyond the concurrency cap fail fast"""
+        StandInHandler.delay = 0.3
+        
+        async def run():
+            client = AsyncNowPaymentsClient('key', self.base_url, max_concurrency=1, queue_timeout=0.05)
+            try:
+                return await asyncio.gather(
+                    client.get_invoice_status('a'),
+                    client.get_invoice_status('b'),
+                    return_exceptions=True
+                )
+            finally:
+                await client.aclose()
+        
+        results = asyncio.run(run())
+        assert sum(isinstance(r, ProviderBusy) for r in results) == 1
+        assert len(StandInHandler.calls) == 1
+    
+    def test_async_deposit_endpoint(self):
+        """Test the async deposit endpoint end to end against the stand-in"""
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        
+        with override_settings(NOWPAYMENTS_BASE_URL=self.base_url):
+            response = client.post(
+                '/api/deposits/create-async/',
+                data=json.dumps({'amount_tnd': '100.00', 'pay_currency': 'btc'}),
+                content_type='application/json'
+            )
+        
+        assert response.status_code == 201
+        deposit = Deposit.objects.get(user=self.user)
+        assert deposit.pay_address == 'standin_address'
+        assert deposit.pay_amount == Decimal('0.002')
+        assert response.json()['invoice_id'] == deposit.invoice_id
+    
+    def test_async_deposit_endpoint_requires_auth(self):
+        """Test that anonymous requests are rejected"""
+        response = Client().post('/api/deposits/create-async/', data='{}', content_type='application/json')
+        assert response.status_code == 401
+
+
+@pytest.mark.django_db
+@override_settings(NOWPAYMENTS_WEBHOOK_SECRET='test_webhook_secret')
+class TestWebhookInbox(TestCase):
+    def setUp(self):
+        """Set up a waiting deposit"""
+        self.client = Client()
+        self.user = User.objects.create_user(username='inboxuser', password='testpass123')
+        self.profile = UserProfile.objects.create(user=self.user, balance_tnd=Decimal('1000.00'))
+        self.deposit = Deposit.objects.create(
+            user=self.user,
+            invoice_id='inv_1',
+            order_id='order_1',
+            pay_address='test_address',
+            pay_amount=Decimal('0.001'),
+            pay_currency='btc',
+            amount_tnd=Decimal('100.00'),
+            rate_used=Decimal('0.00001'),
+            status='waiting'
+        )
+    
+    def _post(self, body):
+        payload = json.dumps(body).encode()
+        signature = hmac.new(b'test_webhook_secret', payload, hashlib.sha512).hexdigest()
+        return self.client.post(
+            '/api/deposits/webhook/',
+            data=payload,
+            content_type='application/json',
+            HTTP_X_NOWPAYMENTS_SIG=signature
+        )
+    
+    def test_webhook_is_queued_and_acknowledged(self):
+        """Test that the endpoint only records the event"""
+        response = self._post({'invoice_id': 'inv_1', 'payment_status': 'finished'})
+        
+        assert response.status_code == 200
+        assert WebhookInbox.objects.filter(invoice_id='inv_1', processed_at__isnull=True).count() == 1
+        self.deposit.refresh_from_db()
+        assert self.deposit.status == 'waiting'
+    
+    def test_duplicate_deliveries_credit_once(self):
+        """Test that retried deliveries are deduplicated and credited exactly once"""
+        for _ in range(3):
+            self._post({'invoice_id': 'inv_1', 'payment_status': 'confirming', 'confirmations': 1})
+            self._post({'invoice_id': 'inv_1', 'payment_status': 'finished', 'confirmations': 2})
+        
+        assert WebhookInbox.objects.count() == 2
+        assert drain_inbox() == 2
+        assert drain_inbox() == 0
+        
+        self.deposit.refresh_from_db()
+        self.profile.refresh_from_db()
+        assert self.deposit.status == 'completed'
+        assert self.deposit.current_confirmations == 2
+        assert self.profile.balance_tnd == Decimal('1100.00')
+        assert LedgerEntry.objects.filter(user=self.user, type='DEPOSIT').count() == 1
+    
+    def test_stale_status_does_not_regress(self):
+        """Test that out-of-order statuses are ignored"""
+        apply_payment_status('inv_1', 'finished')
+        
+        assert apply_payment_status('inv_1', 'confirming') is None
+        assert apply_payment_status('inv_1', 'finished') is None
+        
+        self.deposit.refresh_from_db()
+        self.profile.refresh_from_db()
+        assert self.deposit.status == 'completed'
+        assert self.profile.balance_tnd == Decimal('1100.00')
+    
+    def test_unknown_invoice_is_kept_for_retry(self):
+        """Test that events for unknown invoices stay in the inbox"""
+        self._post({'invoice_id': 'inv_missing', 'payment_status': 'finished'})
+        
+        drain_inbox()
+        
+        event = WebhookInbox.objects.get(invoice_id='inv_missing')
+        assert event.processed_at is None
+        assert event.attempts == 1
+        assert event.last_error == 'Deposit not found'
+    
+    def test_events_are_committed_one_at_a_time(self):
+        """Test that a worker dying mid-batch keeps the events it already applied"""
+        self._post({'invoice_id': 'inv_1', 'payment_status': 'confirming', 'confirmations': 1})
+        self._post({'invoice_id': 'inv_1', 'payment_status': 'finished', 'confirmations': 2})
+        
+        with mock.patch('payments.webhooks.apply_payment_status', side_effect=[None, KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                drain_inbox()
+        
+        first, second = WebhookInbox.objects.order_by('id')
+        assert first.processed_at is not None
+        assert (second.processed_at, second.attempts) == (None, 0)
+        assert drain_inbox(batch_size=1) == 1
+        assert drain_inbox(batch_size=1) == 0
+
+
+class FakeStatusClient:
+    """Async provider stand-in returning canned invoice statuses"""
+    
+    statuses = {}
+    
+    async def get_invoice_status(self, invoice_id):
+        result = self.statuses[invoice_id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.django_db
+class TestDepositReconciler(TestCase):
+    def setUp(self):
+        """Set up open deposits in several states"""
+        self.user = User.objects.create_user(username='reconuser', password='testpass123')
+        self.profile = UserProfile.objects.create(user=self.user, balance_tnd=Decimal('0.00'))
+        now = timezone.now()
+        for invoice_id, deposit_status, expires_at in [
+            ('paid', 'waiting', now + timezone.timedelta(hours=1)),
+            ('overdue', 'waiting', now - timezone.timedelta(minutes=5)),
+            ('in_flight', 'confirming', now - timezone.timedelta(minutes=5)),
+            ('broken', 'waiting', now + timezone.timedelta(hours=1)),
+        ]:
+            Deposit.objects.create(
+                user=self.user,
+                invoice_id=invoice_id,
+                order_id=f'order_{invoice_id}',
+                pay_address='test_address',
+                pay_amount=Decimal('0.001'),
+                pay_currency='btc',
+                amount_tnd=Decimal('100.00'),
+                rate_used=Decimal('0.00001'),
+                status=deposit_status,
+                expires_at=expires_at
+            )
+        FakeStatusClient.statuses = {
+            'paid': {'payment_status': 'finished', 'confirmations': 3},
+            'overdue': {'payment_status': 'waiting'},
+            'in_flight': {'payment_status': 'confirming'},
+            'broken': requests.ConnectionError('down'),
+        }
+    
+    def test_expire_overdue_only_touches_unpaid(self):
+        """Test the bulk expiry sweep"""
+        assert expire_overdue() == 1
+        assert Deposit.objects.get(invoice_id='overdue').status == 'expired'
+        assert Deposit.objects.get(invoice_id='in_flight').status == 'confirming'
+    
+    def test_reconcile_credits_lost_webhooks(self):
+        """Test that polled results go through the idempotent credit path"""
+        summary = reconcile_open_deposits(rate=0, client_factory=FakeStatusClient)
+        
+        assert summary == {'polled': 4, 'updated': 1, 'errors': 1, 'expired': 1}
+        self.profile.refresh_from_db()
+        assert self.profile.balance_tnd == Decimal('100.00')
+        assert Deposit.objects.get(invoice_id='paid').status == 'completed'
+        
+        # A second pass finds nothing new to credit
+        reconcile_open_deposits(rate=0, client_factory=FakeStatusClient)
+        self.profile.refresh_from_db()
+        assert self.profile.balance_tnd == Decimal('100.00')
+
+
+class TestNowPaymentsStandIn(TestCase):
+    def test_client_round_trip(self):
+        """Test that NowPaymentsClient works end to end against the stand-in"""
+        server = NowPaymentsStandIn(config=StandInConfig(secret='standin_secret', deliver_ipn=False)).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = NowPaymentsClient('key', base_url=server.base_url)
+        
+        assert 'btc' in client.get_available_currencies(fallback=False)
+        estimate = client.get_estimate(Decimal('1000'), 'usd', 'usdt', fallback=False)
+        assert estimate['estimated_amount'] == 1000.0
+        
+        invoice = client.create_invoice(Decimal('10.00'), 'USD', 'btc', 'order_standin')
+        status_ = client.get_invoice_status(invoice['id'])
+        assert status_['payment_status'] == 'waiting'
+        
+        payload = json.dumps({'invoice_id': invoice['id'], 'payment_status': 'finished'}).encode()
+        assert NowPaymentsClient.verify_webhook_signature(payload, server.sign(payload), 'standin_secret')
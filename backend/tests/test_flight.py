@@ -0,0 +1,141 @@
+import json
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
+from core.authentication import tokens_for
+from games import flight
+from games.flight import Flight
+from games.models import Bet, LedgerEntry, Round, UserProfile
+from games.routing import websocket_urlpatterns
+from games.serializers import BetSerializer
+from games.services import RoundsEngine
+
+
+@pytest.mark.django_db
+class TestFlightState(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        caches['flight'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = UserProfile.objects.create(user=self.user, balance_tnd=Decimal('1000.00'))
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {tokens_for(self.user)['access']}")
+
+        self.round = RoundsEngine.get_current_round()
+        self.round.crash_multiplier = Decimal('2.00')
+        RoundsEngine.start_round(self.round, started_at=timezone.now())
+        self.manual = Bet.objects.create(user=self.user, round=self.round, amount_tnd=Decimal('10.00'),
+                                         status='ACTIVE')
+        self.auto = Bet.objects.create(user=self.user, round=self.round, amount_tnd=Decimal('10.00'),
+                                       auto_cashout_multiplier=Decimal('1.50'), status='ACTIVE')
+        self.flight = Flight.load(self.round)
+
+    def _cashout(self, bet, multiplier):
+        return self.client.post(f'/api/games/bets/{bet.id}/cashout/', {'current_multiplier': multiplier},
+                                content_type='application/json')
+
+    def test_cashout_is_claimed_without_the_database(self):
+        """Test that a live cashout only touches the view and is paid at the crash"""
+        self.flight.tick(Decimal('1.30'))
+
+        with self.assertNumQueries(0):
+            claim = flight.claim_cashout(self.manual.id, self.user.id, Decimal('1.30'))
+        assert claim['win_amount_tnd'] == Decimal('13.00')
+
+        # Repeating the request returns the same cashout; the bet is unchanged until the crash
+        response = self._cashout(self.manual, '1.30')
+        assert response.status_code == 200
+        assert response.json()['win_amount_tnd'] == '13.00'
+        self.manual.refresh_from_db()
+        assert self.manual.status == 'ACTIVE'
+
+        self.flight.tick(Decimal('1.60'))
+        RoundsEngine.crash_round(self.round)
+        result = self.flight.settle()
+
+        assert result == {'settled_count': 2, 'cashed_out_count': 2}
+        self.manual.refresh_from_db()
+        self.auto.refresh_from_db()
+        self.profile.refresh_from_db()
+        assert (self.manual.status, self.manual.win_amount_tnd) == ('CASHED_OUT', Decimal('13.00'))
+        assert (self.auto.status, self.auto.cashed_out_multiplier) == ('CASHED_OUT', Decimal('1.50'))
+        assert self.profile.balance_tnd == Decimal('1028.00')
+        balances = list(LedgerEntry.objects.filter(type='BET_WON').order_by('id').values_list(
+            'balance_before', 'balance_after'))
+        assert balances == [(Decimal('1000.00'), Decimal('1013.00')), (Decimal('1013.00'), Decimal('1028.00'))]
+
+    def test_cashout_is_capped_at_the_published_multiplier(self):
+        """Test that a client cannot claim a multiplier the loop has not reached"""
+        self.flight.tick(Decimal('1.20'))
+
+        response = self._cashout(self.manual, '50.00')
+
+        assert response.json()['cashed_out_multiplier'] == '1.20'
+
+    def test_cashout_after_the_crash_is_refused(self):
+        """Test that the crash decides every bet before a late cashout lands"""
+        RoundsEngine.crash_round(self.round)
+        self.flight.settle()
+
+        response = self._cashout(self.manual, '1.10')
+
+        assert response.status_code == 400
+        self.manual.refresh_from_db()
+        assert self.manual.status == 'LOST'
+        assert LedgerEntry.objects.filter(type='BET_LOST').count() == 2
+
+    def test_bets_outside_the_view_fall_back_to_the_database(self):
+        """Test that other users' bets and cleared flights use the database path"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        assert flight.claim_cashout(self.manual.id, other.id, Decimal('1.10')) is None
+
+        self.flight.clear()
+        response = self._cashout(self.manual, '1.10')
+
+        assert response.status_code == 200
+        self.manual.refresh_from_db()
+        assert self.manual.status == 'CASHED_OUT'
+
+    def test_database_cashout_is_capped_at_the_server_multiplier(self):
+        """Test that the fallback path does not trust the client's multiplier"""
+        Round.objects.filter(id=self.round.id).update(start_time=timezone.now() - timedelta(seconds=2))
+        self.flight.clear()
+
+        response = self._cashout(self.manual, '1.90')
+
+        assert response.status_code == 200
+        assert Decimal('1.28') <= Decimal(response.json()['cashed_out_multiplier']) < Decimal('1.35')
+
+    def test_crash_point_is_hidden_until_the_crash(self):
+        """Test that bet history does not leak the crash point of a live round"""
+        flying = self.client.get('/api/games/bets/').json()
+        assert {bet['round']['crash_multiplier'] for bet in flying} == {None}
+        assert BetSerializer(self.manual).data['round']['crash_multiplier'] is None
+
+        RoundsEngine.crash_round(self.round)
+        crashed = self.client.get('/api/games/bets/').json()
+        assert {bet['round']['crash_multiplier'] for bet in crashed} == {'2.00'}
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+    def test_websocket_connect_reads_the_view(self):
+        """Test that new connections get the published multiplier"""
+        self.flight.tick(Decimal('1.40'))
+
+        async def first_message():
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/rounds/')
+            await communicator.connect()
+            message = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return message
+
+        message = async_to_sync(first_message)()
+
+        assert message['type'] == 'round:tick'
+        assert (message['data']['round_id'], message['data']['multiplier']) == (self.round.id, 1.4)
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache, caches
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.utils import timezone
+from games.leader import LeaderLease, NotLeader, lead
+from games.loop import RoundLoop
+from games.models import LoopLease, Round
+from games.services import RoundsEngine
+from tests.test_rounds import FakeChannelLayer, FakeClock
+
+
+class Clock:
+    def __init__(self):
+        self.current = timezone.now()
+
+    def __call__(self):
+        return self.current
+
+
+@pytest.mark.django_db
+class TestLeaderElection(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        caches['flight'].clear()
+        for target in ('games.loop.db_sync_to_async', 'games.leader.db_sync_to_async'):
+            patcher = mock.patch(target, sync_to_async)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.clock = Clock()
+
+    def _lease(self, holder):
+        return LeaderLease('main', holder=holder, ttl=5, now=self.clock)
+
+    def test_one_leader_until_the_lease_expires(self):
+        """Test exclusivity, takeover after expiry and fencing tokens"""
+        first, second = self._lease('node-a'), self._lease('node-b')
+
+        assert first.try_acquire()
+        assert not second.try_acquire()
+
+        self.clock.current += timedelta(seconds=6)
+        assert second.try_acquire()
+        assert second.token == first.token + 1
+
+        assert not first.renew()
+        with pytest.raises(NotLeader):
+            first.ensure()
+        assert second.renew()
+
+    def test_release_hands_over_immediately(self):
+        """Test that a clean shutdown does not wait for expiry"""
+        first, second = self._lease('node-a'), self._lease('node-b')
+        first.try_acquire()
+        first.release()
+
+        assert second.try_acquire()
+        assert LoopLease.objects.get(room='main').holder == 'node-b'
+
+    def test_stale_leader_cannot_start_a_round(self):
+        """Test that take-off is fenced by the lease token"""
+        stale, current = self._lease('node-a'), self._lease('node-b')
+        stale.try_acquire()
+        self.clock.current += timedelta(seconds=6)
+        current.try_acquire()
+        round_obj = RoundsEngine.get_current_round()
+
+        clock = FakeClock()
+        loop = RoundLoop(channel_layer=FakeChannelLayer(), now=clock.now, sleep=clock.sleep, lease=stale)
+        with pytest.raises(NotLeader):
+            async_to_sync(loop.run)(rounds=1)
+
+        round_obj.refresh_from_db()
+        assert round_obj.state == 'PRE_ROUND'
+
+    def test_one_open_round_per_room(self):
+        """Test that a second open round in a room is refused"""
+        open_round = RoundsEngine.get_current_round()
+
+        with pytest.raises(IntegrityError), transaction.atomic():
+            RoundsEngine.create_round()
+        assert RoundsEngine.get_current_round().id == open_round.id
+        assert RoundsEngine.create_round('vip').room == 'vip'
+
+    def test_standby_takes_over_and_resumes(self):
+        """Test that only the leader plays, and a standby resumes after it"""
+        clock = FakeClock()
+
+        def loop_factory(room, lease):
+            return RoundLoop(room, channel_layer=FakeChannelLayer(), now=clock.now, sleep=clock.sleep,
+                             pre_round_duration=0, tick_interval=1.0, crash_pause=0, lease=lease)
+
+        leader = self._lease('node-a')
+        leader.try_acquire()
+        standby = self._lease('node-b')
+
+        async def standby_for_a_moment():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    lead('main', rounds=1, lease=standby, poll_interval=0.01, loop_factory=loop_factory), 0.05
+                )
+        async_to_sync(standby_for_a_moment)()
+        assert not Round.objects.filter(state='CRASHED').exists()
+
+        # The leader dies mid-flight; the standby resumes the persisted round
+        round_obj = RoundsEngine.get_current_round()
+        RoundsEngine.start_round(round_obj, started_at=clock.now() - timedelta(minutes=5))
+        self.clock.current += timedelta(seconds=6)
+        async_to_sync(lead)('main', rounds=1, lease=standby, poll_interval=0.01, loop_factory=loop_factory)
+
+        round_obj.refresh_from_db()
+        assert round_obj.state == 'CRASHED'
+        assert Round.objects.filter(room='main', state='PRE_ROUND').count() == 1
+        assert LoopLease.objects.get(room='main').expires_at is None
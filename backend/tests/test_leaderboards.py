@@ -0,0 +1,125 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from games import leaderboards
+from games.models import LeaderboardStat
+
+
+@pytest.mark.django_db
+class TestLeaderboards(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.carol = User.objects.create_user(username='carol', password='testpass123')
+    
+    def test_cashouts_and_losses_feed_all_windows(self):
+        """Test that events update daily, weekly and all-time rows"""
+        leaderboards.record_cashout(self.alice.id, Decimal('10.00'), Decimal('50.00'), Decimal('5.00'))
+        leaderboards.record_losses([(self.alice.id, Decimal('20.00'))])
+        
+        rows = LeaderboardStat.objects.filter(user=self.alice)
+        assert rows.count() == 3
+        for row in rows:
+            assert row.total_won == Decimal('50.00')
+            assert row.best_multiplier == Decimal('5.00')
+            assert row.profit == Decimal('20.00')
+    
+    def test_top_and_rank(self):
+        """Test top-N ordering and my-rank lookups"""
+        leaderboards.record_cashout(self.alice.id, Decimal('10.00'), Decimal('20.00'), Decimal('2.00'))
+        leaderboards.record_cashout(self.bob.id, Decimal('10.00'), Decimal('90.00'), Decimal('9.00'))
+        leaderboards.record_cashout(self.carol.id, Decimal('10.00'), Decimal('20.00'), Decimal('2.00'))
+        
+        entries = leaderboards.top('wins', 'daily', limit=10)
+        assert [e['username'] for e in entries] == ['bob', 'alice', 'carol']
+        assert [e['rank'] for e in entries] == [1, 2, 2]
+        
+        assert leaderboards.rank(self.bob.id, 'multiplier', 'weekly')['rank'] == 1
+        assert leaderboards.rank(self.carol.id, 'profit', 'all_time')['rank'] == 2
+    
+    def test_rank_count_is_index_only(self):
+        """Test that counting the rows ahead never reads the table"""
+        if connection.vendor != 'sqlite':
+            pytest.skip('Checks the SQLite query plan')
+        start = leaderboards.period_start('daily')
+
+        for board in leaderboards.BOARDS:
+            ahead = leaderboards.ahead_of(board, 'daily', start, Decimal('10.00'))
+            with connection.cursor() as cursor:
+                sql, params = ahead.values('pk').query.sql_with_params()
+                cursor.execute(f'EXPLAIN QUERY PLAN SELECT COUNT(*) FROM ({sql})', params)
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+            assert 'COVERING INDEX' in plan, plan
+    
+    def test_windows_roll_over(self):
+        """Test that yesterday's daily scores do not count today"""
+        yesterday = timezone.now() - timedelta(days=1)
+        leaderboards.record_cashout(self.alice.id, Decimal('10.00'), Decimal('50.00'), Decimal('5.00'), when=yesterday)
+        
+        assert leaderboards.top('wins', 'daily') == []
+        assert leaderboards.rank(self.alice.id, 'wins', 'daily') is None
+        assert leaderboards.rank(self.alice.id, 'wins', 'all_time')['rank'] == 1
+    
+    def test_bulk_write_query_count_is_flat(self):
+        """Test that a settlement's rollup costs the same queries for 3 users or 30"""
+        def queries_for(users):
+            cashouts = [(u.id, Decimal('10.00'), Decimal('20.00'), Decimal('2.00')) for u in users[::2]]
+            losses = [(u.id, Decimal('10.00')) for u in users[1::2]]
+            with CaptureQueriesContext(connection) as ctx:
+                leaderboards.record_results(cashouts, losses)
+            return len(ctx.captured_queries)
+        
+        few = queries_for([self.alice, self.bob, self.carol])
+        many = User.objects.bulk_create([User(username=f'bulk{i}') for i in range(30)])
+        assert few == 3
+        assert queries_for(list(User.objects.filter(username__startswith='bulk'))) == few
+        
+        row = LeaderboardStat.objects.get(user=self.bob, window='all_time')
+        assert row.profit == Decimal('-10.00')
+        assert row.total_won == Decimal('0.00')
+        assert LeaderboardStat.objects.filter(window='daily').count() == 3 + len(many)
+    
+    def test_rank_reads_refreshed_column(self):
+        """Test that refreshed ranks are read back in a single lookup"""
+        leaderboards.record_cashout(self.alice.id, Decimal('10.00'), Decimal('20.00'), Decimal('2.00'))
+        leaderboards.record_cashout(self.bob.id, Decimal('10.00'), Decimal('90.00'), Decimal('9.00'))
+        leaderboards.record_cashout(self.carol.id, Decimal('10.00'), Decimal('20.00'), Decimal('2.00'))
+        
+        assert leaderboards.refresh_ranks() == 9
+        with self.assertNumQueries(1):
+            assert leaderboards.rank(self.carol.id, 'wins', 'daily')['rank'] == 2
+        assert leaderboards.rank(self.bob.id, 'profit', 'weekly')['rank'] == 1
+    
+    def test_prune_drops_expired_periods(self):
+        """Test that old daily and weekly rows are deleted and all-time rows kept"""
+        long_ago = timezone.now() - timedelta(weeks=20)
+        leaderboards.record_cashout(self.alice.id, Decimal('10.00'), Decimal('50.00'), Decimal('5.00'), when=long_ago)
+        leaderboards.record_cashout(self.alice.id, Decimal('10.00'), Decimal('50.00'), Decimal('5.00'))
+        
+        assert leaderboards.prune() == 2
+        assert sorted(LeaderboardStat.objects.values_list('window', flat=True)) == ['all_time', 'daily', 'weekly']
+    
+    def test_endpoints(self):
+        """Test the top-N and my-rank endpoints"""
+        leaderboards.record_cashout(self.alice.id, Decimal('10.00'), Decimal('50.00'), Decimal('5.00'))
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.alice)}')
+        
+        response = client.get('/api/games/leaderboards/wins/daily/')
+        assert response.status_code == 200
+        assert response.json()['entries'][0]['username'] == 'alice'
+        
+        response = client.get('/api/games/leaderboards/profit/all_time/me/')
+        assert response.status_code == 200
+        assert response.json()['entry']['score'] == '40.00'
+        
+        response = client.get('/api/games/leaderboards/losses/daily/')
+        assert response.status_code == 404
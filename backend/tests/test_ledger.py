@@ -1,8 +1,16 @@
+import io
+import json
+import os
+import tempfile
 import pytest
 from decimal import Decimal
 from django.contrib.auth.models import User
-from django.test import TestCase
-from games.models import UserProfile, LedgerEntry
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, Client
+from games.models import Bet, UserProfile, LedgerEntry
+from games.reconciliation import reconcile_user
+from games.services import RoundsEngine
 
 
 @pytest.mark.django_db
@@ -120,3 +128,124 @@ class TestLedgerIntegrity(TestCase):
         # Verify ledger entry was created
         final_count = LedgerEntry.objects.filter(user=self.user).count()
         assert final_count == initial_count + 1
+
+
+@pytest.mark.django_db
+class TestLedgerReconciliation(TestCase):
+    def setUp(self):
+        """Set up a user whose ledger chain ends at their balance"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.profile = UserProfile.objects.create(
+            user=self.user,
+            balance_tnd=Decimal('900.00')
+        )
+        self.bet = Bet.objects.create(
+            user=self.user,
+            round=RoundsEngine.create_round(),
+            amount_tnd=Decimal('100.00'),
+            status='LOST'
+        )
+        LedgerEntry.objects.create(
+            user=self.user,
+            type='DEPOSIT',
+            amount_tnd=Decimal('1000.00'),
+            balance_before=Decimal('0.00'),
+            balance_after=Decimal('1000.00')
+        )
+        LedgerEntry.objects.create(
+            user=self.user,
+            type='BET_PLACED',
+            amount_tnd=Decimal('-100.00'),
+            balance_before=Decimal('1000.00'),
+            balance_after=Decimal('900.00'),
+            meta={'bet_id': self.bet.id}
+        )
+    
+    def test_consistent_ledger_has_no_drift(self):
+        """Test that a continuous chain ending at the balance reconciles cleanly"""
+        count, drifts = reconcile_user(self.user.id, self.profile.balance_tnd)
+        
+        assert count == 2
+        assert drifts == []
+    
+    def test_chain_must_start_at_the_opening_balance(self):
+        """Test that a first entry not starting from zero is reported"""
+        LedgerEntry.objects.filter(type='DEPOSIT').delete()
+        
+        _, drifts = reconcile_user(self.user.id, self.profile.balance_tnd)
+        
+        assert [(d['kind'], d['found']) for d in drifts] == [('opening_mismatch', '1000.00')]
+    
+    def test_balance_without_ledger_is_reported(self):
+        """Test that a nonzero balance with no entries is not reported as clean"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        
+        _, drifts = reconcile_user(other.id, Decimal('250.00'))
+        assert [(d['kind'], d['found']) for d in drifts] == [('missing_ledger', '250.00')]
+        assert reconcile_user(other.id, Decimal('0.00')) == (0, [])
+    
+    def test_drift_is_reported(self):
+        """Test that chain breaks, balance mismatches and missing entries are found"""
+        LedgerEntry.objects.create(
+            user=self.user,
+            type='DEPOSIT',
+            amount_tnd=Decimal('50.00'),
+            balance_before=Decimal('950.00'),
+            balance_after=Decimal('1000.00')
+        )
+        Bet.objects.create(
+            user=self.user,
+            round=self.bet.round,
+            amount_tnd=Decimal('10.00'),
+            status='CASHED_OUT'
+        )
+        
+        _, drifts = reconcile_user(self.user.id, self.profile.balance_tnd)
+        
+        kinds = sorted(drift['kind'] for drift in drifts)
+        assert kinds == ['balance_mismatch', 'chain_break', 'missing_bet_placed', 'missing_bet_won']
+    
+    def test_registered_users_reconcile_cleanly(self):
+        """Test that the signup grant opens a new account's ledger chain"""
+        response = Client().post('/api/auth/register/', {
+            'username': 'newplayer',
+            'email': 'new@example.com',
+            'password': 'Sup3r-secret-pw',
+            'password2': 'Sup3r-secret-pw',
+        }, content_type='application/json')
+        assert response.status_code == 201
+        user = User.objects.select_related('profile').get(username='newplayer')
+        
+        assert reconcile_user(user.id, user.profile.balance_tnd) == (1, [])
+        with tempfile.TemporaryDirectory() as tmp:
+            out = io.StringIO()
+            call_command('reconcile_ledger', workers=0, checkpoint=os.path.join(tmp, 'checkpoint.json'),
+                         stdout=out, stderr=io.StringIO())
+        assert out.getvalue() == ''
+    
+    def test_command_writes_drift_and_checkpoint(self):
+        """Test the command output and resumable checkpoint"""
+        self.profile.balance_tnd = Decimal('1.00')
+        self.profile.save()
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, 'checkpoint.json')
+            out = io.StringIO()
+            
+            with self.assertRaises(CommandError):
+                call_command('reconcile_ledger', workers=0, checkpoint=checkpoint, stdout=out, stderr=io.StringIO())
+            
+            drifts = [json.loads(line) for line in out.getvalue().splitlines()]
+            assert [drift['kind'] for drift in drifts] == ['balance_mismatch']
+            
+            with open(checkpoint) as fh:
+                assert json.load(fh) == {'last_user_id': self.user.id}
+            
+            # Resuming past the last user finds nothing left to check
+            out = io.StringIO()
+            call_command('reconcile_ledger', workers=0, checkpoint=checkpoint, stdout=out, stderr=io.StringIO())
+            assert out.getvalue() == ''
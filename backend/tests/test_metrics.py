@@ -0,0 +1,126 @@
+import pytest
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from core import metrics
+from core.authentication import tokens_for
+from games.models import Bet, Round, UserProfile
+from games.services import RoundsEngine
+from tests.test_rounds import make_loop
+
+
+def sample(name, **labels):
+    """Value of one sample in the rendered exposition, or None"""
+    prefix = name + ('{%s}' % ','.join(f'{k}="{v}"' for k, v in labels.items()) if labels else '')
+    for line in metrics.REGISTRY.render().splitlines():
+        if line.startswith(prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+class TestRegistry(TestCase):
+    def test_histogram_exposition(self):
+        """Test cumulative buckets, sum and count"""
+        histogram = metrics.Histogram('demo_seconds', 'Demo', ('view',), buckets=(0.1, 1.0))
+        histogram.observe(0.05, 'a')
+        histogram.observe(0.5, 'a')
+        histogram.observe(5, 'a')
+
+        lines = histogram.render()
+        assert lines[:2] == ['# HELP demo_seconds Demo', '# TYPE demo_seconds histogram']
+        assert lines[2:] == [
+            'demo_seconds_bucket{view="a",le="0.1"} 1',
+            'demo_seconds_bucket{view="a",le="1"} 2',
+            'demo_seconds_bucket{view="a",le="+Inf"} 3',
+            'demo_seconds_sum{view="a"} 5.55',
+            'demo_seconds_count{view="a"} 3',
+        ]
+
+    def test_label_values_are_escaped(self):
+        """Test quoting of label values"""
+        gauge = metrics.Gauge('demo', 'Demo', ('name',))
+        gauge.set(1, 'say "hi"\n')
+        assert gauge.render()[-1] == 'demo{name="say \\"hi\\"\\n"} 1'
+
+
+@pytest.mark.django_db
+class TestMetricsEndpoint(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = UserProfile.objects.create(user=self.user, balance_tnd=Decimal('1000.00'))
+        self.token = tokens_for(self.user)['access']
+
+    def test_disabled_by_default(self):
+        """Test that /metrics does not exist unless enabled"""
+        assert Client().get('/metrics').status_code == 404
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape-secret')
+    def test_requires_token(self):
+        """Test the scrape token"""
+        client = Client()
+        assert client.get('/metrics').status_code == 401
+        response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert 'db_pool_connections{state="open"}' in response.content.decode()
+        assert 'db_pool_connections{state="queued"}' in response.content.decode()
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_records_latency_and_queries_per_view(self):
+        """Test that hot-path views are labelled separately with their query counts"""
+        metrics._install_query_counter(None, connection)
+        self.addCleanup(connection.execute_wrappers.remove, metrics._count_query)
+        before = sample('http_request_queries_count', view='balance', method='GET') or 0
+
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        assert client.get('/api/games/balance/').status_code == 200
+        client.get('/api/games/ledger/')
+
+        assert sample('http_request_queries_count', view='balance', method='GET') == before + 1
+        assert sample('http_request_queries_sum', view='balance', method='GET') >= 1
+        assert sample('http_request_duration_seconds_count', view='ledger', method='GET', status='2xx') >= 1
+
+
+@pytest.mark.django_db
+class TestRoundLoopMetrics(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        caches['flight'].clear()
+        patcher = mock.patch('games.loop.db_sync_to_async', sync_to_async)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        UserProfile.objects.create(user=user, balance_tnd=Decimal('1000.00'))
+        seed = RoundsEngine.generate_server_seed()
+        round_obj = Round.objects.create(
+            server_seed_hash=RoundsEngine.compute_hash(seed),
+            server_seed_revealed=seed,
+            crash_multiplier=Decimal('1.50'),
+            state='PRE_ROUND'
+        )
+        for _ in range(3):
+            Bet.objects.create(user=user, round=round_obj, amount_tnd=Decimal('10.00'), status='PENDING')
+
+    def test_records_phases_and_settlement(self):
+        """Test phase durations, broadcasts and settlement batch sizes"""
+        phases = {phase: sample('round_phase_duration_seconds_count', room='main', phase=phase) or 0
+                  for phase in ('pre_round', 'flying', 'crashed')}
+        settled = sample('round_settlement_bets_sum', room='main') or 0
+        crashes = sample('channel_layer_send_seconds_count', room='main', event='round.crash') or 0
+
+        loop, _ = make_loop()
+        async_to_sync(loop.run)(rounds=1)
+
+        for phase, count in phases.items():
+            assert sample('round_phase_duration_seconds_count', room='main', phase=phase) == count + 1
+        assert sample('round_settlement_bets_sum', room='main') == settled + 3
+        assert sample('channel_layer_send_seconds_count', room='main', event='round.crash') == crashes + 1
+        assert sample('round_tick_lag_seconds_count', room='main') >= 1
@@ -0,0 +1,162 @@
+import pytest
+import requests
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from rest_framework_simplejwt.tokens import AccessToken
+from payments import payouts
+from payments.models import PayoutRequest
+from games.models import UserProfile, LedgerEntry
+from games.reconciliation import reconcile_user
+
+
+@pytest.mark.django_db
+class TestPayouts(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = UserProfile.objects.create(user=self.user, balance_tnd=Decimal('0.00'))
+        LedgerEntry.objects.create(
+            user=self.user, type='DEPOSIT', amount_tnd=Decimal('500.00'),
+            balance_before=Decimal('0.00'), balance_after=Decimal('500.00')
+        )
+        self.profile.balance_tnd = Decimal('500.00')
+        self.profile.save()
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.provider = mock.Mock()
+        self.provider.create_payout.side_effect = lambda withdrawals: {
+            'id': 'batch-1',
+            'withdrawals': [{'id': f'w{i}'} for i in range(len(withdrawals))],
+        }
+        patcher = mock.patch('payments.payouts.rates.estimate', side_effect=lambda amount, currency: {
+            'estimated_amount': amount / 1000,
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _request(self, amount, method='crypto', currency='btc'):
+        return payouts.request_payout(self.user.id, Decimal(amount), method, 'dest', currency=currency)
+
+    def test_request_debits_balance_with_ledger_entry(self):
+        """Test that a payout request reserves funds atomically"""
+        response = self.client.post('/api/deposits/payouts/', {
+            'amount_tnd': '120.00', 'method': 'crypto', 'currency': 'BTC', 'destination': 'bc1q'
+        }, content_type='application/json')
+
+        assert response.status_code == 201
+        assert response.json()['currency'] == 'btc'
+        self.profile.refresh_from_db()
+        assert self.profile.balance_tnd == Decimal('380.00')
+        entry = LedgerEntry.objects.get(type='WITHDRAWAL')
+        assert entry.amount_tnd == Decimal('-120.00')
+        assert entry.meta['payout_id'] == response.json()['id']
+        assert reconcile_user(self.user.id, self.profile.balance_tnd) == (2, [])
+
+    def test_request_rejects_insufficient_balance(self):
+        """Test that an overdraft creates nothing"""
+        response = self.client.post('/api/deposits/payouts/', {
+            'amount_tnd': '900.00', 'method': 'bank', 'destination': 'IBAN'
+        }, content_type='application/json')
+
+        assert response.status_code == 400
+        assert not PayoutRequest.objects.exists()
+        assert not LedgerEntry.objects.filter(type='WITHDRAWAL').exists()
+
+    def test_process_batches_by_method_and_currency(self):
+        """Test one provider call per crypto currency and bulk status updates"""
+        btc = [self._request('50.00'), self._request('60.00')]
+        eth = self._request('70.00', currency='eth')
+        bank = self._request('80.00', method='bank', currency='')
+
+        summary = payouts.process_payouts(client=self.provider)
+
+        assert summary == {'claimed': 4, 'completed': 3, 'released': 0, 'failed': 0, 'manual': 1, 'batches': 2}
+        assert self.provider.create_payout.call_count == 2
+        btc_call = next(
+            call.args[0] for call in self.provider.create_payout.call_args_list
+            if call.args[0][0]['currency'] == 'btc'
+        )
+        assert [w['amount'] for w in btc_call] == [0.05, 0.06]
+
+        for payout in btc + [eth]:
+            payout.refresh_from_db()
+            assert payout.status == 'completed'
+            assert payout.meta['provider_batch_id'] == 'batch-1'
+        bank.refresh_from_db()
+        assert bank.status == 'processing'
+
+        # Nothing left to claim
+        assert payouts.process_payouts(client=self.provider)['claimed'] == 0
+        assert payouts.mark_completed([bank.id]) == 1
+
+    def test_batch_without_a_rate_is_released(self):
+        """Test that a group failing before the provider call goes back to pending"""
+        payout = self._request('50.00')
+
+        with mock.patch('payments.payouts.rates.estimate', return_value=None):
+            summary = payouts.process_payouts(client=self.provider)
+
+        assert summary['released'] == 1
+        self.provider.create_payout.assert_not_called()
+        payout.refresh_from_db()
+        assert payout.status == 'pending'
+        assert payout.processed_at is None
+
+    def test_failed_submission_is_held_for_review(self):
+        """Test that a provider error after sending is neither retried nor refundable by the user"""
+        payout = self._request('50.00')
+        self.provider.create_payout.side_effect = requests.Timeout('read timed out')
+
+        summary = payouts.process_payouts(client=self.provider)
+
+        assert (summary['released'], summary['failed']) == (0, 1)
+        payout.refresh_from_db()
+        assert payout.status == 'failed'
+        assert payout.meta['provider_error'] == 'read timed out'
+        assert payouts.process_payouts(client=self.provider)['claimed'] == 0
+        assert self.client.post(f'/api/deposits/payouts/{payout.id}/cancel/').status_code == 404
+
+        # An operator who finds it unpaid rejects it, which refunds it once
+        payouts.refund_payout(payout.id, reason='Not sent')
+        self.profile.refresh_from_db()
+        assert self.profile.balance_tnd == Decimal('500.00')
+
+    def test_processing_payouts_are_not_refunded(self):
+        """Test that a payout that may be on its way cannot be rejected or completed twice"""
+        bank = self._request('80.00', method='bank', currency='')
+        payouts.process_payouts(client=self.provider)
+
+        with pytest.raises(payouts.PayoutError):
+            payouts.refund_payout(bank.id)
+        assert payouts.mark_completed([bank.id]) == 1
+        assert payouts.mark_completed([bank.id]) == 0
+        assert not LedgerEntry.objects.filter(type='REFUND').exists()
+
+    def test_completion_skips_payouts_changed_since_the_claim(self):
+        """Test that the final switch to completed only applies to rows still processing"""
+        btc = [self._request('50.00'), self._request('60.00')]
+        claimed = payouts.claim_pending()
+        PayoutRequest.objects.filter(id=btc[1].id).update(status='failed')
+
+        assert payouts.submit_crypto_batch(self.provider, 'btc', claimed) == 'completed'
+
+        assert list(PayoutRequest.objects.order_by('id').values_list('status', flat=True)) == ['completed', 'failed']
+        btc[0].refresh_from_db()
+        assert btc[0].meta['provider_withdrawal_id'] == 'w0'
+
+    def test_cancel_refunds_once(self):
+        """Test that cancelling refunds the reservation exactly once"""
+        payout = self._request('100.00')
+
+        response = self.client.post(f'/api/deposits/payouts/{payout.id}/cancel/')
+        assert response.status_code == 200
+        assert response.json()['status'] == 'cancelled'
+        assert self.client.post(f'/api/deposits/payouts/{payout.id}/cancel/').status_code == 404
+
+        self.profile.refresh_from_db()
+        assert self.profile.balance_tnd == Decimal('500.00')
+        assert LedgerEntry.objects.filter(type='REFUND').count() == 1
+        assert reconcile_user(self.user.id, self.profile.balance_tnd) == (3, [])
+        with pytest.raises(payouts.PayoutError):
+            payouts.refund_payout(payout.id)
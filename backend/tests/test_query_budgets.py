@@ -0,0 +1,19 @@
+import pytest
+from django.db import connection
+from django.test import TransactionTestCase
+from benchmarks.money_paths import Volume, load_baseline, measure
+
+
+@pytest.mark.django_db
+class TestMoneyPathQueryBudgets(TransactionTestCase):
+    # No outer test transaction, so atomic blocks do not add savepoint queries the benchmark never sees
+    def test_query_counts_match_baseline(self):
+        """Test that no money path issues more queries than its stored baseline"""
+        baseline = load_baseline().get(connection.vendor, {}).get(Volume().key)
+        if baseline is None:
+            pytest.skip(f'No {connection.vendor} baseline; run python -m benchmarks.money_paths --update-baseline')
+
+        results = measure(Volume(), repeat=1)
+
+        assert {name: r['queries'] for name, r in results.items()} == \
+            {name: baseline[name]['queries'] for name in results}
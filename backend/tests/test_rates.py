@@ -0,0 +1,93 @@
+import pytest
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from games.models import UserProfile
+from payments import rates
+
+
+class FakeProvider:
+    """Provider stand-in quoting 0.00002 BTC-style units per USD"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def get_estimate(self, amount, currency_from, currency_to, fallback=True):
+        self.calls += 1
+        return {'estimated_amount': float(amount) * 0.00002}
+    
+    def get_available_currencies(self, fallback=True):
+        return ['btc', 'eth']
+
+
+@pytest.mark.django_db
+@override_settings(RATES_TTL=60, RATES_STALE_TTL=900)
+class TestRateCache(TestCase):
+    def setUp(self):
+        """Start from an empty cache with a fake provider"""
+        cache.clear()
+        self.provider = FakeProvider()
+        patcher = mock.patch('payments.rates.get_nowpayments_client', return_value=self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _age_entries(self, seconds):
+        for currency in rates.SUPPORTED_CURRENCIES:
+            key = rates.RATE_KEY.format(currency=currency)
+            entry = cache.get(key)
+            entry['fetched_at'] -= seconds
+            cache.set(key, entry)
+    
+    def test_refresh_populates_cache(self):
+        """Test that a refresh caches every supported rate and the currency list"""
+        refreshed = rates.refresh_rates()
+        
+        assert set(refreshed) == set(rates.SUPPORTED_CURRENCIES)
+        assert rates.get_rate('btc') == Decimal('0.00002')
+        assert rates.get_available_currencies() == ['btc', 'eth']
+    
+    def test_estimate_reads_cache_without_provider_call(self):
+        """Test that deposit estimates come from the cache"""
+        rates.refresh_rates()
+        calls = self.provider.calls
+        
+        estimate = rates.estimate(Decimal('100.00'), 'btc')
+        
+        assert estimate['estimated_amount'] == Decimal('0.00200000')
+        assert self.provider.calls == calls
+    
+    def test_stale_rates_are_served_and_revalidated(self):
+        """Test stale-while-revalidate behaviour"""
+        rates.refresh_rates()
+        self._age_entries(120)
+        
+        with mock.patch('payments.rates._revalidate_in_background') as revalidate:
+            assert rates.get_rate('btc') == Decimal('0.00002')
+        
+        revalidate.assert_called()
+    
+    def test_expired_rates_are_not_served(self):
+        """Test that rates past the stale window are treated as missing"""
+        rates.refresh_rates()
+        self._age_entries(1000)
+        
+        assert rates.get_rate('btc') is None
+        assert rates.estimate(Decimal('100.00'), 'btc') is None
+    
+    def test_balance_includes_crypto_equivalents(self):
+        """Test that /api/games/balance/ fills crypto_equivalents from the cache"""
+        rates.refresh_rates()
+        user = User.objects.create_user(username='rateuser', password='testpass123')
+        UserProfile.objects.create(user=user, balance_tnd=Decimal('500.00'))
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        calls = self.provider.calls
+        
+        response = client.get('/api/games/balance/')
+        
+        assert response.status_code == 200
+        equivalents = {row['currency']: row for row in response.json()['crypto_equivalents']}
+        assert equivalents['btc']['amount'] == '0.01000000'
+        assert self.provider.calls == calls
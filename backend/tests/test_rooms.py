@@ -0,0 +1,117 @@
+import pytest
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from core.authentication import tokens_for
+from games import history
+from games.models import Bet, UserProfile
+from games.routing import websocket_urlpatterns
+from games.services import RoundsEngine
+from games.supervisor import Supervisor, assign_rooms
+from tests.test_rounds import make_loop
+
+
+@pytest.mark.django_db
+@override_settings(GAME_ROOMS=['main', 'vip'])
+class TestRooms(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        caches['flight'].clear()
+        patcher = mock.patch('games.loop.db_sync_to_async', sync_to_async)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        UserProfile.objects.create(user=self.user, balance_tnd=Decimal('1000.00'))
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {tokens_for(self.user)['access']}")
+
+    def test_rooms_have_independent_rounds(self):
+        """Test that each room has its own current round"""
+        main = RoundsEngine.get_current_round()
+        vip = RoundsEngine.get_current_round('vip')
+
+        assert main.id != vip.id
+        assert (main.room, vip.room) == ('main', 'vip')
+        assert RoundsEngine.get_current_round('vip').id == vip.id
+
+    def test_bets_are_placed_in_the_requested_room(self):
+        """Test room-scoped bet placement and unknown rooms"""
+        response = self.client.post('/api/games/bets/', {'amount_tnd': '10.00', 'room': 'vip'},
+                                    content_type='application/json')
+
+        assert response.status_code == 201
+        assert response.data['room'] == 'vip'
+        bet = Bet.objects.get(id=response.data['id'])
+        assert bet.round.room == 'vip'
+        assert bet.round_id == RoundsEngine.get_current_round('vip').id
+
+        response = self.client.post('/api/games/bets/', {'amount_tnd': '10.00', 'room': 'nope'},
+                                    content_type='application/json')
+        assert response.status_code == 400
+
+    def test_room_loops_are_isolated(self):
+        """Test that each room's loop broadcasts to its own group and keeps its own history"""
+        main_loop, main_layer = make_loop(pre_round_duration=0, tick_interval=1.0, crash_pause=0)
+        vip_loop, vip_layer = make_loop(room='vip', pre_round_duration=0, tick_interval=1.0, crash_pause=0)
+
+        async_to_sync(main_loop.run)(rounds=1)
+        async_to_sync(vip_loop.run)(rounds=2)
+
+        assert {group for group, _ in main_layer.events} == {'rounds'}
+        assert {group for group, _ in vip_layer.events} == {'rounds.vip'}
+        assert len(cache.get(history.HISTORY_KEY.format(room='main'))) == 1
+        assert len(cache.get(history.HISTORY_KEY.format(room='vip'))) == 2
+
+        response = self.client.get('/api/games/rounds/history/?room=vip')
+        assert len(response.json()) == 2
+        assert self.client.get('/api/games/rounds/history/?room=nope').status_code == 404
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+    def test_websocket_rejects_unknown_room(self):
+        """Test that only configured rooms accept connections"""
+        async def connect(path):
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        assert async_to_sync(connect)('/ws/rounds/nope/') is False
+
+
+class FakeProcess:
+    def __init__(self, target, args, name):
+        self.args = args
+        self.alive = False
+        self.exitcode = None
+
+    def start(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+class TestSupervisor(SimpleTestCase):
+    def test_assign_rooms_round_robin(self):
+        """Test that rooms are spread evenly and no worker is idle"""
+        assert assign_rooms(['a', 'b', 'c', 'd', 'e'], 2) == [['a', 'c', 'e'], ['b', 'd']]
+        assert assign_rooms(['a', 'b'], 8) == [['a'], ['b']]
+
+    def test_restarts_exited_workers(self):
+        """Test that a dead worker is restarted with the same rooms"""
+        supervisor = Supervisor(['main', 'vip', 'eu'], 2, metrics_port=9100,
+                                context=mock.Mock(Process=FakeProcess))
+        supervisor.start()
+        assert [worker.args for worker in supervisor.workers] == [(['main', 'eu'], 9100), (['vip'], 9101)]
+
+        supervisor.workers[1].alive = False
+        supervisor.workers[1].exitcode = 1
+        assert supervisor.check() == [1]
+        assert supervisor.workers[1].is_alive()
+        assert supervisor.workers[1].args == (['vip'], 9101)
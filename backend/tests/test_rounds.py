@@ -0,0 +1,263 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.test import TestCase, Client
+from django.utils import timezone
+from games.loop import RoundLoop
+from games.models import Bet, Round, UserProfile
+from games.services import RoundsEngine
+from games.verification import MAX_BATCH, clear_cache, verify_batch
+
+
+class FakeChannelLayer:
+    def __init__(self):
+        self.events = []
+
+    async def group_send(self, group, message):
+        self.events.append((group, message))
+
+
+class FakeClock:
+    """Time that only moves when the loop sleeps"""
+
+    def __init__(self):
+        self.current = timezone.now()
+
+    def now(self):
+        return self.current
+
+    async def sleep(self, seconds):
+        self.current += timedelta(seconds=seconds)
+
+
+def make_loop(**kwargs):
+    clock = FakeClock()
+    layer = FakeChannelLayer()
+    loop = RoundLoop(channel_layer=layer, now=clock.now, sleep=clock.sleep, **kwargs)
+    return loop, layer
+
+
+@pytest.mark.django_db
+class TestRoundLoop(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        caches['flight'].clear()
+        # Run the loop's database calls on the test thread, inside the test transaction
+        patcher = mock.patch('games.loop.db_sync_to_async', sync_to_async)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        UserProfile.objects.create(user=self.user, balance_tnd=Decimal('1000.00'))
+        seed = RoundsEngine.generate_server_seed()
+        self.round = Round.objects.create(
+            server_seed_hash=RoundsEngine.compute_hash(seed),
+            server_seed_revealed=seed,
+            crash_multiplier=Decimal('1.50'),
+            state='PRE_ROUND'
+        )
+
+    def test_plays_a_full_round(self):
+        """Test phases, auto-cashout, settlement and broadcasts"""
+        auto = Bet.objects.create(user=self.user, round=self.round, amount_tnd=Decimal('10.00'),
+                                  auto_cashout_multiplier=Decimal('1.20'), status='PENDING')
+        manual = Bet.objects.create(user=self.user, round=self.round, amount_tnd=Decimal('10.00'),
+                                    status='PENDING')
+        loop, layer = make_loop()
+
+        async_to_sync(loop.run)(rounds=1)
+
+        types = [message['type'] for _, message in layer.events]
+        assert types[0] == 'round.pre'
+        assert types[-1] == 'round.crash'
+        assert set(types[1:-1]) == {'round.tick'}
+        ticks = [message['data']['multiplier'] for _, message in layer.events[1:-1]]
+        assert ticks == sorted(ticks) and ticks[-1] < 1.5
+        assert layer.events[-1][1]['data']['server_seed'] == self.round.server_seed_revealed
+
+        self.round.refresh_from_db()
+        auto.refresh_from_db()
+        manual.refresh_from_db()
+        assert self.round.state == 'CRASHED'
+        assert auto.status == 'CASHED_OUT'
+        assert auto.win_amount_tnd == Decimal('12.00')
+        assert manual.status == 'LOST'
+
+    def test_records_round_timeline(self):
+        """Test the stored timeline and its admin rendering"""
+        Bet.objects.create(user=self.user, round=self.round, amount_tnd=Decimal('10.00'),
+                           auto_cashout_multiplier=Decimal('1.20'), status='PENDING')
+        Bet.objects.create(user=self.user, round=self.round, amount_tnd=Decimal('10.00'), status='PENDING')
+        loop, _ = make_loop()
+
+        async_to_sync(loop.run)(rounds=1)
+
+        self.round.refresh_from_db()
+        events = self.round.timeline['events']
+        assert [e[1] for e in events] == [
+            'created', 'betting_closed', 'flying', 'auto_cashout', 'crash_reached', 'crashed',
+            'settlement_start', 'settlement_end', 'crash_frame_first', 'crash_frame_last',
+        ]
+        counts = {e[1]: e[2] for e in events if len(e) > 2}
+        # Settlement persists the auto-cashout as well as the loss
+        assert counts['flying'] == 2 and counts['auto_cashout'] == 1 and counts['settlement_end'] == 2
+        offsets = [e[0] for e in events[1:]]
+        assert offsets == sorted(offsets)
+
+        admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(f'/admin/games/round/{self.round.id}/change/')
+        assert response.status_code == 200
+        assert b'settlement_end' in response.content
+
+    def test_resumes_a_flying_round(self):
+        """Test that a round left FLYING skips the pre-round phase"""
+        self.round.state = 'FLYING'
+        self.round.start_time = timezone.now() - timedelta(minutes=5)
+        self.round.save()
+        loop, layer = make_loop()
+
+        async_to_sync(loop.run)(rounds=1)
+
+        assert [message['type'] for _, message in layer.events] == ['round.crash']
+
+
+@pytest.mark.django_db
+class TestRoundHistoryEndpoints(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        patcher = mock.patch('games.loop.db_sync_to_async', sync_to_async)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        loop, _ = make_loop(pre_round_duration=0, tick_interval=1.0, crash_pause=0)
+        async_to_sync(loop.run)(rounds=3)
+        self.crashed = list(Round.objects.filter(state='CRASHED').order_by('-id'))
+        self.pending = RoundsEngine.get_current_round()
+        self.client = Client()
+
+    def test_history_is_newest_first(self):
+        """Test the history list and its limit"""
+        response = self.client.get('/api/games/rounds/history/?limit=2')
+
+        assert response.status_code == 200
+        assert [r['round_id'] for r in response.json()] == [r.id for r in self.crashed[:2]]
+        assert response['Cache-Control'].startswith('public, max-age=')
+
+    def test_history_rebuilds_after_cache_loss(self):
+        """Test that a cache miss rebuilds the buffer from the database"""
+        cache.clear()
+        response = self.client.get('/api/games/rounds/history/')
+        assert len(response.json()) == 3
+
+    def test_proof_is_immutable_and_verifiable(self):
+        """Test proof contents, immutable caching and conditional GETs"""
+        round_obj = self.crashed[0]
+        response = self.client.get(f'/api/games/rounds/{round_obj.id}/proof/')
+
+        assert response.status_code == 200
+        proof = response.json()
+        assert proof['server_seed'] == round_obj.server_seed_revealed
+        assert RoundsEngine.verify_round(
+            proof['server_seed'], proof['server_seed_hash'], Decimal(proof['crash_multiplier'])
+        )
+        assert 'immutable' in response['Cache-Control']
+
+        again = self.client.get(f'/api/games/rounds/{round_obj.id}/proof/',
+                                HTTP_IF_NONE_MATCH=response['ETag'])
+        assert again.status_code == 304
+
+    def test_no_proof_before_crash(self):
+        """Test that seeds of unfinished rounds are never served"""
+        response = self.client.get(f'/api/games/rounds/{self.pending.id}/proof/')
+
+        assert response.status_code == 404
+        assert response['Cache-Control'] == 'no-store'
+
+
+@pytest.mark.django_db
+class TestBatchVerification(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        clear_cache()
+        self.rounds = []
+        for _ in range(5):
+            round_obj = RoundsEngine.create_round()
+            round_obj.state = 'CRASHED'
+            round_obj.save()
+            self.rounds.append(round_obj)
+        self.open_round = RoundsEngine.create_round()
+        self.client = Client()
+
+    def _verify(self, body):
+        return self.client.post('/api/games/rounds/verify/', body, content_type='application/json')
+
+    def test_batch_matches_single_verification(self):
+        """Test that the batch path agrees with verify_round"""
+        triples = []
+        for round_obj in self.rounds:
+            triples.append((round_obj.server_seed_revealed, round_obj.server_seed_hash, round_obj.crash_multiplier))
+            triples.append((round_obj.server_seed_revealed, round_obj.server_seed_hash,
+                            round_obj.crash_multiplier + Decimal('0.50')))
+            triples.append((round_obj.server_seed_revealed, '0' * 64, round_obj.crash_multiplier))
+
+        for triple, (hash_valid, multiplier_valid, _) in zip(triples, verify_batch(triples)):
+            assert (hash_valid and multiplier_valid) == RoundsEngine.verify_round(*triple)
+
+    def test_verify_by_ids_and_range(self):
+        """Test stored rounds by id list and by range"""
+        ids = [r.id for r in self.rounds] + [self.open_round.id, 999999]
+        response = self._verify({'round_ids': ids})
+
+        assert response.status_code == 200
+        assert response.data['summary'] == {'total': 7, 'valid': 5, 'invalid': 0, 'unverifiable': 2}
+        assert response.data['results'][-2]['error'] == 'not_crashed'
+        assert response.data['results'][-1]['error'] == 'not_found'
+
+        response = self._verify({'from_round': self.rounds[0].id, 'to_round': self.rounds[-1].id})
+        assert response.data['summary']['valid'] == 5
+
+    def test_results_are_cached_per_round(self):
+        """Test that repeat verifications skip the database"""
+        ids = [r.id for r in self.rounds]
+        self._verify({'round_ids': ids})
+
+        with self.assertNumQueries(0):
+            response = self._verify({'round_ids': ids})
+        assert response.data['summary']['valid'] == 5
+
+    def test_client_supplied_rounds(self):
+        """Test verification of seeds supplied by the client"""
+        good = self.rounds[0]
+        response = self._verify({'rounds': [
+            {'server_seed': good.server_seed_revealed, 'server_seed_hash': good.server_seed_hash,
+             'crash_multiplier': str(good.crash_multiplier)},
+            {'server_seed': 'forged', 'server_seed_hash': good.server_seed_hash,
+             'crash_multiplier': str(good.crash_multiplier)},
+        ]})
+
+        assert response.status_code == 200
+        assert [r['valid'] for r in response.data['results']] == [True, False]
+
+    def test_rejects_bad_requests(self):
+        """Test malformed bodies and oversized ranges"""
+        assert self._verify({}).status_code == 400
+        assert self._verify({'rounds': [{'server_seed': 'x'}]}).status_code == 400
+        assert self._verify({'from_round': 1, 'to_round': MAX_BATCH + 1}).status_code == 400
+
+    def test_rejects_out_of_range_multipliers(self):
+        """Test that huge or sub-1 multipliers are refused instead of overflowing"""
+        good = self.rounds[0]
+        for multiplier in ('1e400', '-5', '0.5', '1000000.01', 'nan'):
+            response = self._verify({'rounds': [{
+                'server_seed': good.server_seed_revealed, 'server_seed_hash': good.server_seed_hash,
+                'crash_multiplier': multiplier,
+            }]})
+            assert response.status_code == 400, multiplier
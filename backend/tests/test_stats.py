@@ -0,0 +1,122 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, Client
+from rest_framework_simplejwt.tokens import AccessToken
+from core.authentication import tokens_for
+from games.models import Bet, UserProfile, UserStats
+from games.services import RoundsEngine
+from games.stats import record_bet_placed, record_bet_won, record_round_streaks
+from games.tasks import settle_round_bets
+
+
+@pytest.mark.django_db
+class TestUserStats(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.round = RoundsEngine.create_round()
+    
+    def test_incremental_updates(self):
+        """Test that place/win/loss events maintain the rollup"""
+        record_bet_placed(self.user.id, Decimal('100.00'))
+        record_bet_placed(self.user.id, Decimal('50.00'))
+        record_bet_placed(self.user.id, Decimal('10.00'))
+        record_bet_won(self.user.id, Decimal('250.00'), Decimal('2.50'))
+        record_bet_won(self.user.id, Decimal('60.00'), Decimal('1.20'))
+        for status_ in ['CASHED_OUT', 'CASHED_OUT', 'LOST']:
+            Bet.objects.create(user=self.user, round=self.round, amount_tnd=Decimal('10.00'), status=status_)
+        record_round_streaks(self.round.id)
+        
+        stats = UserStats.objects.get(pk=self.user.id)
+        assert stats.total_bets == 3
+        assert stats.total_wagered == Decimal('160.00')
+        assert stats.total_won == Decimal('310.00')
+        assert stats.wins == 2
+        assert stats.biggest_win == Decimal('250.00')
+        assert stats.biggest_multiplier == Decimal('2.50')
+        assert stats.current_streak == 0
+        assert stats.best_streak == 2
+        assert stats.total_profit == Decimal('150.00')
+    
+    def test_rebuild_matches_bets(self):
+        """Test that the rebuild command backfills stats from existing bets"""
+        for status_, win, multiplier in [
+            ('LOST', None, None),
+            ('CASHED_OUT', Decimal('30.00'), Decimal('3.00')),
+            ('CASHED_OUT', Decimal('15.00'), Decimal('1.50')),
+        ]:
+            Bet.objects.create(
+                user=self.user,
+                round=self.round,
+                amount_tnd=Decimal('10.00'),
+                status=status_,
+                win_amount_tnd=win,
+                cashed_out_multiplier=multiplier
+            )
+        
+        call_command('rebuild_user_stats', stdout=open('/dev/null', 'w'))
+        
+        stats = UserStats.objects.get(pk=self.user.id)
+        assert stats.total_bets == 3
+        assert stats.total_wagered == Decimal('30.00')
+        assert stats.total_won == Decimal('45.00')
+        assert stats.wins == 2
+        assert stats.biggest_win == Decimal('30.00')
+        assert stats.biggest_multiplier == Decimal('3.00')
+        assert stats.current_streak == 2
+        assert stats.best_streak == 2
+    
+    def test_several_bets_in_one_round_match_the_rebuild(self):
+        """Test that settlement and the rebuild count streaks in the same bet order"""
+        previous = RoundsEngine.create_round('vip')
+        Bet.objects.create(user=self.user, round=previous, amount_tnd=Decimal('10.00'), status='CASHED_OUT')
+        record_round_streaks(previous.id)
+
+        UserProfile.objects.create(user=self.user, balance_tnd=Decimal('100.00'))
+        # Placed as: won, lost, won, won; the loss is settled last
+        for status_ in ['CASHED_OUT', 'ACTIVE', 'CASHED_OUT', 'CASHED_OUT']:
+            Bet.objects.create(user=self.user, round=self.round, amount_tnd=Decimal('10.00'), status=status_)
+        RoundsEngine.crash_round(self.round)
+        settle_round_bets(self.round.id)
+
+        settled = UserStats.objects.get(pk=self.user.id)
+        assert (settled.current_streak, settled.best_streak) == (2, 2)
+
+        call_command('rebuild_user_stats', stdout=open('/dev/null', 'w'))
+        rebuilt = UserStats.objects.get(pk=self.user.id)
+        assert (rebuilt.current_streak, rebuilt.best_streak) == (settled.current_streak, settled.best_streak)
+    
+    def test_stats_endpoint_reads_rollup(self):
+        """Test that /api/stats/ serves the rollup with a single stats query"""
+        record_bet_placed(self.user.id, Decimal('100.00'))
+        record_bet_won(self.user.id, Decimal('200.00'), Decimal('2.00'))
+        Bet.objects.create(user=self.user, round=self.round, amount_tnd=Decimal('100.00'), status='CASHED_OUT')
+        record_round_streaks(self.round.id)
+        
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {tokens_for(self.user)['access']}")
+        
+        # The user comes from the token claims, so the rollup is the only query
+        with self.assertNumQueries(1):
+            response = client.get('/api/stats/')
+        
+        assert response.status_code == 200
+        assert response.data['total_bets'] == 1
+        assert response.data['win_rate'] == 100.0
+        assert response.data['total_profit'] == '100.00'
+        assert response.data['current_streak'] == 1
+    
+    def test_stats_endpoint_for_new_user(self):
+        """Test that users without bets get empty stats"""
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        
+        response = client.get('/api/stats/')
+        
+        assert response.status_code == 200
+        assert response.data['total_bets'] == 0
+        assert response.data['average_bet'] == '0.00'
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+from config.asgi_ws import health_check
+
+
+def call_http(app, path):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async_to_sync(app)({'type': 'http', 'method': 'GET', 'path': path}, None, send)
+    return messages[0]['status'], messages[1]['body']
+
+
+class TestWebSocketWorker(SimpleTestCase):
+    def test_startup_skips_http_and_payments_stacks(self):
+        """Test that the websocket entry point loads neither admin, payments nor requests"""
+        probe = (
+            "import sys, config.asgi_ws\n"
+            "print(','.join(m for m in ('payments', 'requests', 'django.contrib.admin', 'twisted', "
+            "'rest_framework.serializers') if m in sys.modules))\n"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='config.settings_ws', PYTHONWARNINGS='ignore')
+        result = subprocess.run([sys.executable, '-c', probe], env=env, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(__file__)))
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == ''
+
+    def test_health_check(self):
+        """Test the HTTP health probe served by websocket workers"""
+        assert call_http(health_check, '/api/health/') == (200, b'{"status":"ok"}')
+        assert call_http(health_check, '/api/games/balance/')[0] == 404